@@ -3,11 +3,17 @@
 from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
+from threadpoolctl import threadpool_limits
 
 def create_app():
     load_dotenv()
+    # BLAS/OpenMP a un hilo en el proceso web (p. ej. las predicciones): el límite
+    # es global al proceso, así que se fija una vez aquí y no en cada petición.
+    # Los procesos de entrenamiento fijan el suyo al arrancar.
+    threadpool_limits(limits=1)
     app = Flask(__name__)
-    CORS(app, resources={r"/api/*": {"origins": "*"}})
+    # La cabecera del cursor de paginación debe ser legible desde el navegador
+    CORS(app, resources={r"/api/*": {"origins": "*", "expose_headers": ["X-Siguiente-Cursor", "Content-Disposition", "Content-Range", "Accept-Ranges", "ETag"]}})
     
     from app.routes.dataset_routes import dataset_bp
     # ✅ CORRECCIÓN: Volvemos a la URL original para que todo funcione como antes.
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,3 +9,72 @@ class Config:
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
     PORT = int(os.getenv("PORT", 5000))
     DEBUG = os.getenv("DEBUG", "False").lower() == "true"
+
+    # --- Caché local de datasets (memoria + disco) ---
+    DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", os.path.join(tempfile.gettempdir(), "criminality_datasets"))
+    DATASET_CACHE_MEMORIA_MB = int(os.getenv("DATASET_CACHE_MEMORIA_MB", 512))
+    DATASET_CACHE_DISCO_MB = int(os.getenv("DATASET_CACHE_DISCO_MB", 4096))
+    # Con un valor > 0, /descargar redirige a una URL firmada de Storage válida esos segundos
+    # en vez de pasar los bytes por el backend
+    DESCARGA_URL_FIRMADA_SEGUNDOS = int(os.getenv("DESCARGA_URL_FIRMADA_SEGUNDOS", 0))
+    # Columnas de texto con como mucho esta proporción de valores distintos se cargan como `category`
+    ESQUEMA_MAX_PROPORCION_CATEGORIAS = float(os.getenv("ESQUEMA_MAX_PROPORCION_CATEGORIAS", 0.5))
+    # Compresión del t-digest con el que la limpieza estima medianas y cuartiles (más = más preciso)
+    LIMPIEZA_TDIGEST_COMPRESION = int(os.getenv("LIMPIEZA_TDIGEST_COMPRESION", 500))
+
+    # --- Perfil de los datasets ---
+    # 'exacto', 'aproximado' (una pasada por bloques con sketches) o 'auto' (aproximado a partir de PERFIL_FILAS_APROXIMADO)
+    PERFIL_MODO = os.getenv("PERFIL_MODO", "auto")
+    PERFIL_FILAS_APROXIMADO = int(os.getenv("PERFIL_FILAS_APROXIMADO", 5_000_000))
+    PERFIL_FILAS_POR_BLOQUE = int(os.getenv("PERFIL_FILAS_POR_BLOQUE", 262144))
+    PERFIL_HLL_PRECISION = int(os.getenv("PERFIL_HLL_PRECISION", 14))
+    PERFIL_BLOOM_TASA_FALSOS_POSITIVOS = float(os.getenv("PERFIL_BLOOM_TASA_FALSOS_POSITIVOS", 0.01))
+    PERFIL_BLOOM_MAX_MB = int(os.getenv("PERFIL_BLOOM_MAX_MB", 64))
+    PERFIL_TDIGEST_COMPRESION = int(os.getenv("PERFIL_TDIGEST_COMPRESION", 200))
+    PERFIL_CACHE_MAX = int(os.getenv("PERFIL_CACHE_MAX", 32))  # perfiles leídos que se mantienen en memoria
+    # Con más columnas numéricas no se guarda la matriz de correlación, solo los pares más fuertes
+    CORRELACION_MAX_COLUMNAS_MATRIZ = int(os.getenv("CORRELACION_MAX_COLUMNAS_MATRIZ", 50))
+    CORRELACION_PARES_GUARDADOS = int(os.getenv("CORRELACION_PARES_GUARDADOS", 100))
+    CORRELACION_TOP_PARES = int(os.getenv("CORRELACION_TOP_PARES", 20))
+
+    # --- Cola de entrenamientos (pool de procesos) ---
+    ENTRENAMIENTO_MAX_PROCESOS = int(os.getenv("ENTRENAMIENTO_MAX_PROCESOS", 2))
+    ENTRENAMIENTO_HILOS_POR_PROCESO = int(os.getenv("ENTRENAMIENTO_HILOS_POR_PROCESO", 2))
+    # Cada cuántos segundos mira un entrenamiento si se pidió su cancelación desde otro worker web
+    CANCELACION_CONSULTA_SEGUNDOS = float(os.getenv("CANCELACION_CONSULTA_SEGUNDOS", 5))
+    # Cada cuántos segundos se guarda en la base de datos el progreso por época
+    PROGRESO_GUARDADO_SEGUNDOS = float(os.getenv("PROGRESO_GUARDADO_SEGUNDOS", 15))
+
+    # --- Clientes HTTP y Supabase ---
+    HTTP_TIMEOUT_CONEXION = float(os.getenv("HTTP_TIMEOUT_CONEXION", 5))
+    HTTP_TIMEOUT_LECTURA = float(os.getenv("HTTP_TIMEOUT_LECTURA", 60))
+    HTTP_REINTENTOS = int(os.getenv("HTTP_REINTENTOS", 3))
+    HTTP_BACKOFF_SEGUNDOS = float(os.getenv("HTTP_BACKOFF_SEGUNDOS", 0.5))
+    HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", 4))
+    HTTP_POOL_CONEXIONES = int(os.getenv("HTTP_POOL_CONEXIONES", 10))
+    SUPABASE_TIMEOUT_DB = int(os.getenv("SUPABASE_TIMEOUT_DB", 30))
+    SUPABASE_TIMEOUT_STORAGE = int(os.getenv("SUPABASE_TIMEOUT_STORAGE", 120))
+
+    # --- Importancia de features por permutación ---
+    IMPORTANCIA_MAX_FILAS = int(os.getenv("IMPORTANCIA_MAX_FILAS", 2000))
+    IMPORTANCIA_REPETICIONES = int(os.getenv("IMPORTANCIA_REPETICIONES", 10))
+    IMPORTANCIA_PRESUPUESTO_SEGUNDOS = float(os.getenv("IMPORTANCIA_PRESUPUESTO_SEGUNDOS", 60))
+    IMPORTANCIA_MAX_HILOS = int(os.getenv("IMPORTANCIA_MAX_HILOS", 2))
+
+    # --- Modelos entrenados (predicción) ---
+    MODELOS_CACHE_MAX = int(os.getenv("MODELOS_CACHE_MAX", 8))
+
+    # --- Almacén de features preparadas (memoria + disco) ---
+    FEATURES_CACHE_MEMORIA = int(os.getenv("FEATURES_CACHE_MEMORIA", 4))
+    FEATURES_CACHE_DISCO_MB = int(os.getenv("FEATURES_CACHE_DISCO_MB", 2048))
+
+    # --- Resúmenes de resultados guardados en cada experimento ---
+    RESULTADOS_BINS_ERRORES = int(os.getenv("RESULTADOS_BINS_ERRORES", 30))
+    RESULTADOS_MAX_PUNTOS_DISPERSION = int(os.getenv("RESULTADOS_MAX_PUNTOS_DISPERSION", 2000))
+    RESULTADOS_PUNTOS_ROC = int(os.getenv("RESULTADOS_PUNTOS_ROC", 200))
+
+    # --- Dashboard ---
+    ESTADISTICAS_TTL_SEGUNDOS = float(os.getenv("ESTADISTICAS_TTL_SEGUNDOS", 10))
+
+    # --- Barridos de hiperparámetros ---
+    BARRIDO_MAX_PRUEBAS = int(os.getenv("BARRIDO_MAX_PRUEBAS", 50))
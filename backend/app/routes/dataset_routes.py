@@ -1,15 +1,29 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, redirect, Response
+from app.config import Config
 from app.services.supabase_service import supabase
 from app.services.limpieza_service import limpiar_dataset
-from app.services.analisis_service import (
-    obtener_dataframe_crudo,
-    calcular_correlacion,
-    distribucion_clases,
-    estadisticas_dataset,
-    obtener_columnas
+from app.services.cache_service import dataset_cache
+from app.services.features_service import feature_store
+from app.services import http_service
+from app.services.ingesta_service import ingerir_csv
+from app.services.analisis_service import obtener_pagina
+from app.services.estadisticas_service import invalidar_estadisticas
+from app.services.perfil_service import (
+    MODOS_PERFIL,
+    serializar_perfil,
+    obtener_correlacion,
+    obtener_perfil,
+    invalidar_perfil,
 )
-import pandas as pd
-import io
+from app.utils.correlacion_utils import METODOS_CORRELACION
+from app.utils.file_utils import (
+    BUCKET_DATASETS,
+    es_columnar,
+    parquet_a_csv_en_bloques,
+    ruta_en_storage,
+    url_columnar,
+)
+import os
 import requests
 from datetime import datetime
 from uuid import UUID
@@ -17,6 +31,10 @@ import uuid
 
 dataset_bp = Blueprint("dataset_bp", __name__)
 
+COLUMNAS_LISTADO = "id, nombre, archivo_url, filas, columnas, fecha_subida, usuario_id, es_limpio, dataset_original_id"
+MAX_FILAS_POR_PAGINA = 1000
+FORMATOS_CORRELACION = ("matriz", "pares")
+
 
 # =============================================================================
 # SECCIÓN 1: RUTAS CRUD PARA DATASETS
@@ -43,31 +61,39 @@ def handle_datasets():
             if not all([nombre, archivo_url, usuario_id]):
                 return jsonify({"error": "Faltan datos en el JSON (nombre, archivo_url, usuario_id)"}), 400
 
-            # El backend descarga el archivo desde la URL para analizarlo
-            resp = requests.get(archivo_url)
-            resp.raise_for_status() # Lanza un error si la descarga falla
-            df = pd.read_csv(io.BytesIO(resp.content))
-            filas, columnas = df.shape
+            modo_perfil = data.get("modo_perfil")
+            if modo_perfil is not None and modo_perfil not in MODOS_PERFIL:
+                return jsonify({"error": f"modo_perfil no válido: '{modo_perfil}'. Usa uno de {list(MODOS_PERFIL)}"}), 400
+
+            # Descarga y conversión a Parquet en streaming; el perfil es exacto o,
+            # en archivos grandes, por bloques (ver ingesta_service)
+            ingesta = ingerir_csv(archivo_url, modo_perfil)
             
             # Construye el objeto para insertar en la base de datos
             nuevo_dataset = {
                 "nombre": nombre,
                 "archivo_url": archivo_url,
-                "filas": int(filas),
-                "columnas": int(columnas),
+                "filas": ingesta["filas"],
+                "columnas": ingesta["columnas"],
                 "fecha_subida": datetime.utcnow().isoformat(),
                 "usuario_id": usuario_id,
-                "es_limpio": False
+                "es_limpio": False,
+                "perfil": serializar_perfil(ingesta["perfil"])
             }
 
             result = supabase.table("datasets").insert(nuevo_dataset).execute()
             if result.data:
+                invalidar_estadisticas()
+                if ingesta["ruta_parquet"]:
+                    dataset_cache.importar(result.data[0]["id"], url_columnar(archivo_url), ingesta["ruta_parquet"])
                 return jsonify(result.data[0]), 201
             
             return jsonify({"error": "No se pudo insertar el registro en la base de datos", "details": str(result.get("error"))}), 500
 
         except requests.exceptions.RequestException as e:
             return jsonify({"error": f"El backend no pudo descargar el archivo desde la URL: {e}"}), 500
+        except ValueError as ve: # CSV mal formado o con otra codificación
+            return jsonify({"error": str(ve)}), 400
         except Exception as e:
             print(f"🚨 ERROR en POST /datasets: {e}")
             return jsonify({"error": "Ocurrió un error inesperado al crear el dataset", "details": str(e)}), 500
@@ -75,7 +101,8 @@ def handle_datasets():
     # --- Lógica para LISTAR todos los datasets (GET) ---
     if request.method == "GET":
         try:
-            response = supabase.table("datasets").select("*").execute()
+            # El perfil no se incluye: puede ser pesado y el listado no lo usa
+            response = supabase.table("datasets").select(COLUMNAS_LISTADO).execute()
             return jsonify(response.data or []), 200
         except Exception as e:
             print(f"🚨 ERROR en GET /datasets: {e}")
@@ -90,6 +117,10 @@ def eliminar_dataset(dataset_id):
     """
     try:
         result = supabase.table("datasets").delete().eq("id", dataset_id).execute()
+        dataset_cache.invalidar(dataset_id)
+        feature_store.invalidar(dataset_id)
+        invalidar_perfil(dataset_id)
+        invalidar_estadisticas()
         if result.data:
             return jsonify({"status": "ok", "message": "Registro de dataset eliminado correctamente"}), 200
         return jsonify({"error": "No se encontró el registro del dataset para eliminar"}), 404
@@ -105,8 +136,10 @@ def eliminar_dataset(dataset_id):
 @dataset_bp.route("/datasets/<dataset_id>/descargar", methods=["GET"])
 def descargar_dataset(dataset_id):
     """
-    Busca un dataset por su ID, descarga el archivo CSV desde Supabase Storage 
-    y lo envía al usuario.
+    Busca un dataset por su ID y envía su archivo CSV al usuario sin cargarlo
+    en memoria: el CSV original se reenvía desde Storage por bloques (con
+    soporte de Range y ETag, así las descargas se pueden reanudar) o, si está
+    configurado, se redirige a una URL firmada de Storage.
     """
     try:
         # 1. Buscar la URL del archivo en la base de datos
@@ -119,20 +152,47 @@ def descargar_dataset(dataset_id):
         if not archivo_url:
             return jsonify({"error": "El registro del dataset no tiene una URL de archivo"}), 404
 
-        # 2. Descargar el archivo desde Supabase Storage
-        nombre_archivo = archivo_url.split('/')[-1]
-        
-        file_bytes = supabase.storage.from_("datasets").download(nombre_archivo)
-        
-        if file_bytes is None:
-            raise Exception("No se pudo descargar el archivo desde Storage.")
-        
-        # 3. Enviar el archivo al frontend
-        return send_file(
-            io.BytesIO(file_bytes),
+        ruta_archivo = ruta_en_storage(archivo_url)
+        nombre_archivo = ruta_archivo.split('/')[-1]
+
+        # 2a. Datasets guardados en Parquet: se genera el CSV al vuelo, por bloques.
+        # El archivo en caché se nombra por el hash de su contenido, que sirve de ETag.
+        if es_columnar(archivo_url):
+            ruta_local = dataset_cache.obtener_ruta_columnar(dataset_id, archivo_url)
+            nombre_csv = os.path.splitext(nombre_archivo)[0] + ".csv"
+            respuesta = Response(
+                parquet_a_csv_en_bloques(ruta_local),
+                mimetype='text/csv',
+                headers={"Content-Disposition": f'attachment; filename="{nombre_csv}"'}
+            )
+            respuesta.set_etag(os.path.basename(ruta_local))
+            return respuesta.make_conditional(request)
+
+        # 2b. Redirigir a una URL firmada: los bytes no pasan por el backend
+        if Config.DESCARGA_URL_FIRMADA_SEGUNDOS > 0:
+            firmada = supabase.storage.from_(BUCKET_DATASETS).create_signed_url(
+                ruta_archivo, Config.DESCARGA_URL_FIRMADA_SEGUNDOS, options={"download": nombre_archivo}
+            )
+            return redirect(firmada.get("signedURL") or firmada.get("signedUrl"), code=302)
+
+        # 2c. Reenviar el CSV original desde Storage por bloques
+        resp = http_service.abrir_proxy(archivo_url, request.headers)
+        if resp.status_code == 404:
+            resp.close()
+            return jsonify({"error": "El archivo del dataset no existe en Storage"}), 404
+        if resp.status_code >= 400 and resp.status_code != 416:  # 416: rango fuera del archivo, se reenvía
+            resp.close()
+            resp.raise_for_status()
+
+        # 3. Enviar el archivo al frontend con el estado (200/206/304/416) y las cabeceras de Storage
+        cabeceras = {nombre: resp.headers[nombre] for nombre in http_service.CABECERAS_RESPUESTA_PROXY if nombre in resp.headers}
+        cabeceras["Content-Disposition"] = f'attachment; filename="{nombre_archivo}"'
+        return Response(
+            http_service.iterar_bloques(resp),
+            status=resp.status_code,
             mimetype='text/csv',
-            as_attachment=True,
-            download_name=f"{nombre_archivo}"
+            headers=cabeceras,
+            direct_passthrough=True
         )
 
     except Exception as e:
@@ -151,24 +211,32 @@ def limpiar_dataset_route(dataset_id):
             
         dataset_limpio_info = limpiar_dataset(dataset_id, operaciones)
         return jsonify(dataset_limpio_info), 200
+    except ValueError as ve: # Pipeline de operaciones mal formado
+        return jsonify({"error": str(ve)}), 400
     except Exception as e:
         print(f"🔥🔥🔥 ERROR EN RUTA /limpiar: {e} 🔥🔥🔥")
         return jsonify({"error": str(e)}), 500
 
-def handle_analisis_route(analysis_function, dataset_id):
-    """Función auxiliar para evitar repetir código en las rutas de análisis."""
+def handle_analisis_route(seccion_perfil, dataset_id):
+    """
+    Función auxiliar para evitar repetir código en las rutas de análisis.
+    Sirve la sección pedida del perfil precalculado, sin leer el archivo.
+    Con ?modo=exacto se fuerza el perfil exacto si el guardado es aproximado.
+    """
+    modo = request.args.get("modo")
+    if modo is not None and modo not in MODOS_PERFIL:
+        return jsonify({"error": f"Modo no válido: '{modo}'. Usa uno de {list(MODOS_PERFIL)}"}), 400
     try:
-        df = obtener_dataframe_crudo(dataset_id)
-        resultado = analysis_function(df)
-        return jsonify(resultado), 200
+        perfil = obtener_perfil(dataset_id, modo)
+        return jsonify(perfil[seccion_perfil]), 200
     except Exception as e:
-        # El print ya se hace en el servicio, aquí solo devolvemos el error
+        print(f"🚨 ERROR en análisis '{seccion_perfil}': {e}")
         return jsonify({"error": f"Error al procesar la solicitud: {e}"}), 500
 
 # --- Rutas de Análisis ---
 @dataset_bp.route("/datasets/<dataset_id>/columnas", methods=["GET"])
 def columnas_route(dataset_id): 
-    return handle_analisis_route(obtener_columnas, dataset_id)
+    return handle_analisis_route("columnas", dataset_id)
 
 @dataset_bp.route("/datasets/<dataset_id>/vista-previa", methods=["GET"])
 def vista_previa(dataset_id): 
@@ -180,27 +248,21 @@ def vista_previa(dataset_id):
     """
     try:
         # 1. Obtener parámetros de paginación de la URL
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 100, type=int)
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 100, type=int), 1), MAX_FILAS_POR_PAGINA)
 
-        # 2. Obtener el DataFrame completo
-        df = obtener_dataframe_crudo(dataset_id)
-        
-        # 3. Calcular totales y offsets usando el DataFrame completo
-        total_filas = len(df)
-        total_paginas = (total_filas + per_page - 1) // per_page 
-
-        # 4. Calcular los índices de inicio y fin para el slice
+        # 2. Leer solo la página pedida; el total sale de los metadatos del Parquet
         start_index = (page - 1) * per_page
-        end_index = min(start_index + per_page, total_filas)
+        df_paginado, total_filas = obtener_pagina(dataset_id, start_index, per_page)
 
-        # 5. Cortar el DataFrame para la página actual
-        df_paginado = df.iloc[start_index:end_index]
+        # 3. Calcular totales y el fin real de la página
+        total_paginas = (total_filas + per_page - 1) // per_page 
+        end_index = min(start_index + per_page, total_filas)
         
-        # 6. ✅ CORRECCIÓN: Reemplazar NaN por el string '[NULL]' para el frontend
+        # 4. ✅ CORRECCIÓN: Reemplazar NaN por el string '[NULL]' para el frontend
         datos_paginados = df_paginado.fillna('[NULL]').to_dict(orient='records')
 
-        # 7. Construir la respuesta paginada con metadatos correctos
+        # 5. Construir la respuesta paginada con metadatos correctos
         respuesta = {
             "metadata": {
                 "page": page,
@@ -222,12 +284,32 @@ def vista_previa(dataset_id):
 
 @dataset_bp.route("/datasets/<dataset_id>/estadisticas", methods=["GET"])
 def estadisticas_route(dataset_id): 
-    return handle_analisis_route(estadisticas_dataset, dataset_id)
+    return handle_analisis_route("estadisticas", dataset_id)
 
 @dataset_bp.route("/datasets/<dataset_id>/distribucion-clases", methods=["GET"])
 def distribucion_clases_route(dataset_id): 
-    return handle_analisis_route(distribucion_clases, dataset_id)
+    return handle_analisis_route("distribucion_clases", dataset_id)
 
 @dataset_bp.route("/datasets/<dataset_id>/correlacion", methods=["GET"])
 def correlacion(dataset_id): 
-    return handle_analisis_route(calcular_correlacion, dataset_id)
+    """
+    Correlación entre las columnas numéricas.
+    - ?metodo=pearson (por defecto) | spearman
+    - ?formato=matriz (por defecto, {columna: {columna: r}}) | pares (los ?top= pares con mayor |r|)
+    """
+    metodo = request.args.get("metodo", "pearson")
+    formato = request.args.get("formato", "matriz")
+    top = request.args.get("top", Config.CORRELACION_TOP_PARES, type=int)
+    modo = request.args.get("modo")
+    if metodo not in METODOS_CORRELACION:
+        return jsonify({"error": f"Método no válido: '{metodo}'. Usa uno de {list(METODOS_CORRELACION)}"}), 400
+    if formato not in FORMATOS_CORRELACION:
+        return jsonify({"error": f"Formato no válido: '{formato}'. Usa uno de {list(FORMATOS_CORRELACION)}"}), 400
+    if modo is not None and modo not in MODOS_PERFIL:
+        return jsonify({"error": f"Modo no válido: '{modo}'. Usa uno de {list(MODOS_PERFIL)}"}), 400
+    try:
+        top = min(max(top, 1), Config.CORRELACION_PARES_GUARDADOS)
+        return jsonify(obtener_correlacion(dataset_id, metodo, formato, top, modo)), 200
+    except Exception as e:
+        print(f"🚨 ERROR en /correlacion: {e}")
+        return jsonify({"error": f"Error al procesar la solicitud: {e}"}), 500
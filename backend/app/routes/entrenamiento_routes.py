@@ -1,7 +1,17 @@
 # En app/routes/entrenamiento_routes.py
 
-from flask import Blueprint, request, jsonify
-from app.services.entrenamiento_service import iniciar_nuevo_entrenamiento
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from app.services.supabase_service import supabase
+from app.services.entrenamiento_service import (
+    iniciar_nuevo_entrenamiento,
+    cancelar_entrenamiento,
+    canal_progreso,
+    ESTADOS_TERMINALES
+)
+from app.services.barrido_service import gestor_barridos, resumen_barrido
+from app.services.estimadores_service import listar_algoritmos
+import json
+import queue
 
 entrenamiento_bp = Blueprint("entrenamiento_bp", __name__)
 
@@ -9,7 +19,8 @@ entrenamiento_bp = Blueprint("entrenamiento_bp", __name__)
 def iniciar_entrenamiento_route():
     """
     Recibe la configuración del frontend, la pasa al servicio de entrenamiento
-    y devuelve el nuevo experimento creado.
+    y devuelve al instante el experimento creado con estado 'en_cola'.
+    El entrenamiento corre en segundo plano; su avance se consulta en GET /<id>.
     """
     try:
         configuracion = request.get_json()
@@ -18,11 +29,151 @@ def iniciar_entrenamiento_route():
 
         nuevo_experimento = iniciar_nuevo_entrenamiento(configuracion)
         
-        return jsonify(nuevo_experimento), 201
+        return jsonify(nuevo_experimento), 202
 
     except ValueError as ve: # ✅ Captura errores de validación específicos
         print(f"🔥 Error de validación del usuario: {ve}")
         return jsonify({"error": str(ve)}), 400 # Devuelve un error 400 claro
     except Exception as e:
         print(f"🚨 ERROR en la ruta de entrenamiento: {e}")
-        return jsonify({"error": "Ocurrió un error interno en el servidor"}), 500
\ No newline at end of file
+        return jsonify({"error": "Ocurrió un error interno en el servidor"}), 500
+
+
+@entrenamiento_bp.route("/barridos", methods=["POST"])
+def iniciar_barrido_route():
+    """
+    Lanza un barrido de hiperparámetros: crea una prueba (experimento) por
+    combinación del espacio de búsqueda y devuelve al instante el barrido con
+    sus pruebas en estado 'en_cola'. Cada prueba se sigue como cualquier
+    entrenamiento (GET /<id>, /<id>/stream).
+    """
+    try:
+        configuracion = request.get_json()
+        if not configuracion:
+            return jsonify({"error": "No se recibió ninguna configuración"}), 400
+        return jsonify(gestor_barridos.iniciar(configuracion)), 202
+    except ValueError as ve:
+        print(f"🔥 Error de validación del barrido: {ve}")
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        print(f"🚨 ERROR en iniciar_barrido_route: {e}")
+        return jsonify({"error": "Ocurrió un error interno en el servidor"}), 500
+
+
+@entrenamiento_bp.route("/barridos/<barrido_id>", methods=["GET"])
+def estado_barrido_route(barrido_id):
+    """Estado de cada prueba del barrido, sus métricas y la mejor prueba hasta ahora."""
+    try:
+        barrido = resumen_barrido(barrido_id)
+        if barrido is None:
+            return jsonify({"error": "Barrido no encontrado"}), 404
+        return jsonify(barrido), 200
+    except Exception as e:
+        print(f"🚨 ERROR en estado_barrido_route: {e}")
+        return jsonify({"error": "No se pudo obtener el estado del barrido"}), 500
+
+
+@entrenamiento_bp.route("/barridos/<barrido_id>/cancelar", methods=["POST"])
+def cancelar_barrido_route(barrido_id):
+    """Cancela las pruebas del barrido que aún no han terminado."""
+    try:
+        cancelados = gestor_barridos.cancelar(barrido_id)
+        return jsonify({"status": "ok", "pruebas_canceladas": cancelados}), 200
+    except Exception as e:
+        print(f"🚨 ERROR en cancelar_barrido_route: {e}")
+        return jsonify({"error": "No se pudo cancelar el barrido"}), 500
+
+
+@entrenamiento_bp.route("/algoritmos", methods=["GET"])
+def algoritmos_route():
+    """Algoritmos de sklearn disponibles por tipo de modelo y cuáles pueden continuar un experimento."""
+    return jsonify(listar_algoritmos()), 200
+
+
+@entrenamiento_bp.route("/<experimento_id>", methods=["GET"])
+def estado_entrenamiento_route(experimento_id):
+    """Devuelve el estado actual de un entrenamiento (para hacer polling)."""
+    try:
+        response = supabase.table("experimentos").select("id, estado, fecha_creacion, tiempo_total, metricas").eq("id", experimento_id).single().execute()
+        if not response.data:
+            return jsonify({"error": "Experimento no encontrado"}), 404
+
+        experimento = response.data
+        estado = {
+            "id": experimento["id"],
+            "estado": experimento["estado"],
+            "terminado": experimento["estado"] in ESTADOS_TERMINALES,
+            "fecha_creacion": experimento.get("fecha_creacion"),
+            "tiempo_total": experimento.get("tiempo_total")
+        }
+        if experimento["estado"] == "error":
+            metricas = experimento.get("metricas")
+            if isinstance(metricas, str):
+                metricas = json.loads(metricas)
+            estado["error"] = (metricas or {}).get("error")
+        return jsonify(estado), 200
+    except Exception as e:
+        print(f"🚨 ERROR en estado_entrenamiento_route: {e}")
+        return jsonify({"error": "No se pudo obtener el estado del entrenamiento"}), 500
+
+
+@entrenamiento_bp.route("/<experimento_id>/cancelar", methods=["POST"])
+def cancelar_entrenamiento_route(experimento_id):
+    """
+    Cancela un entrenamiento. Si aún estaba en cola no llega a ejecutarse; si
+    ya estaba entrenando, se detiene en la siguiente época o fase. Funciona
+    desde cualquier worker: la petición queda guardada en el experimento.
+    """
+    try:
+        resultado = cancelar_entrenamiento(experimento_id)
+        if resultado is None:
+            return jsonify({"error": "El entrenamiento no existe o ya terminó"}), 404
+        if resultado == "cancelado":
+            return jsonify({"status": "ok", "estado": "cancelado"}), 200
+        return jsonify({"status": "ok", "message": "Cancelación solicitada"}), 202
+    except Exception as e:
+        print(f"🚨 ERROR en cancelar_entrenamiento_route: {e}")
+        return jsonify({"error": "No se pudo cancelar el entrenamiento"}), 500
+
+
+def _evento_sse(evento: dict) -> str:
+    return f"event: {evento['tipo']}\ndata: {json.dumps(evento)}\n\n"
+
+
+@entrenamiento_bp.route("/<experimento_id>/stream", methods=["GET"])
+def stream_entrenamiento_route(experimento_id):
+    """
+    Server-Sent Events con el progreso del entrenamiento: estado, cambios de
+    fase y métricas de cada época. Al conectarse se reenvía lo ya ocurrido.
+    Si el entrenamiento no corre en este servidor (o ya terminó), se envía
+    solo su estado actual desde la base de datos y se cierra el stream.
+    """
+    suscripcion = canal_progreso.suscribir(experimento_id)
+
+    def generar():
+        if suscripcion is None:
+            response = supabase.table("experimentos").select("estado").eq("id", experimento_id).execute()
+            if not response.data:
+                yield _evento_sse({"tipo": "error", "error": "Experimento no encontrado"})
+                return
+            yield _evento_sse({"tipo": "estado", "estado": response.data[0]["estado"]})
+            return
+
+        try:
+            while True:
+                try:
+                    evento = suscripcion.get(timeout=15)
+                except queue.Empty:
+                    yield ": ping\n\n"  # mantiene viva la conexión a través de proxies
+                    continue
+                yield _evento_sse(evento)
+                if evento["tipo"] == "estado" and evento["estado"] in ESTADOS_TERMINALES:
+                    return
+        finally:
+            canal_progreso.desuscribir(experimento_id, suscripcion)
+
+    return Response(
+        stream_with_context(generar()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,9 +1,28 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request, send_file
 from app.services.supabase_service import supabase
+from app.services.estadisticas_service import invalidar_estadisticas
+from app.services.resultados_service import descargar_resultados, eliminar_resultados
+from app.services.modelos_service import eliminar_modelo, modelos_cache, predecir_filas, FILAS_POR_LOTE_PREDICCION
+import pandas as pd
+import base64
 import json
+import uuid
+from datetime import datetime
 
 experimentos_bp = Blueprint("experimentos_bp", __name__)
 
+# Columnas que se pueden pedir con ?campos=a,b,c
+COLUMNAS_EXPERIMENTO = [
+    'id', 'nombre', 'dataset_id', 'barrido_id', 'estado', 'tipo_problema', 'fecha_creacion', 'tiempo_total',
+    'configuracion', 'metricas', 'metricas_por_epoca', 'matriz_confusion', 'curva_roc', 'importancia_features',
+    'distribucion_errores', 'predicciones_vs_reales', 'tiempo_por_epoca'
+]
+# Los listados solo traen campos escalares; las visualizaciones se piden con GET /<id>
+CAMPOS_LISTADO = ['id', 'nombre', 'dataset_id', 'barrido_id', 'estado', 'tipo_problema', 'fecha_creacion', 'tiempo_total', 'metricas']
+LIMITE_LISTADO_POR_DEFECTO = 50
+LIMITE_LISTADO_MAXIMO = 200
+CABECERA_CURSOR = "X-Siguiente-Cursor"
+
 # --- Función Auxiliar para parsear JSON ---
 def parse_experimento(experimento_data):
     if not experimento_data:
@@ -25,28 +44,94 @@ def parse_experimento(experimento_data):
                 
     return parsed_experimento
 
+def _campos_pedidos(por_defecto: list, obligatorios: list = ()) -> str:
+    """Proyección de ?campos=; solo se aceptan columnas conocidas."""
+    parametro = request.args.get("campos")
+    campos = [c.strip() for c in parametro.split(",") if c.strip()] if parametro else list(por_defecto)
+    desconocidos = [c for c in campos if c not in COLUMNAS_EXPERIMENTO]
+    if desconocidos:
+        raise ValueError(f"Campos desconocidos: {desconocidos}")
+    campos += [c for c in obligatorios if c not in campos]
+    return ", ".join(campos)
+
+def _limite_pedido(por_defecto: int) -> int:
+    try:
+        limite = int(request.args.get("limite", por_defecto))
+    except ValueError:
+        raise ValueError("'limite' debe ser un número entero")
+    return max(1, min(limite, LIMITE_LISTADO_MAXIMO))
+
+def _codificar_cursor(experimento: dict) -> str:
+    crudo = json.dumps([experimento["fecha_creacion"], experimento["id"]])
+    return base64.urlsafe_b64encode(crudo.encode("utf-8")).decode("ascii")
+
+def _decodificar_cursor(cursor: str):
+    # El cursor viene del cliente y acaba dentro del filtro de PostgREST: solo
+    # se aceptan una fecha ISO y un UUID, reescritos ya validados
+    try:
+        fecha, experimento_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(fecha).isoformat(), str(uuid.UUID(experimento_id))
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Cursor no válido")
+
+def _pagina_experimentos(por_defecto_limite: int):
+    """
+    Página de experimentos del más reciente al más antiguo. La paginación es
+    por cursor (keyset) sobre (fecha_creacion, id): ?cursor= continúa justo
+    después del último experimento de la página anterior, sin OFFSET.
+    Devuelve (experimentos, cursor de la página siguiente o None).
+    """
+    limite = _limite_pedido(por_defecto_limite)
+    consulta = (supabase.table("experimentos")
+                .select(_campos_pedidos(CAMPOS_LISTADO, obligatorios=["id", "fecha_creacion"]))
+                .order("fecha_creacion", desc=True)
+                .order("id", desc=True))
+    cursor = request.args.get("cursor")
+    if cursor:
+        fecha, experimento_id = _decodificar_cursor(cursor)
+        consulta = consulta.or_(f'fecha_creacion.lt."{fecha}",and(fecha_creacion.eq."{fecha}",id.lt."{experimento_id}")')
+
+    # Una fila de más indica si hay página siguiente
+    filas = consulta.limit(limite + 1).execute().data or []
+    siguiente = _codificar_cursor(filas[limite - 1]) if len(filas) > limite else None
+    return [parse_experimento(exp) for exp in filas[:limite]], siguiente
+
+def _respuesta_pagina(experimentos: list, siguiente: str):
+    respuesta = jsonify(experimentos)
+    if siguiente:
+        respuesta.headers[CABECERA_CURSOR] = siguiente
+    return respuesta, 200
+
 # --- SOLUCIÓN: Ruta de "recientes" ---
 # Esta ruta estática debe ir ANTES de la ruta dinámica "<experimento_id>"
 @experimentos_bp.route("/recientes", methods=["GET"])
 def obtener_experimentos_recientes():
     """
-    Devuelve los 5 experimentos más recientes para el dashboard.
+    Devuelve los experimentos más recientes para el dashboard (5 por defecto),
+    solo con los campos del listado. Admite ?campos= y ?limite=.
     """
     try:
-        response = supabase.table("experimentos").select("*").order("fecha_creacion", desc=True).limit(5).execute()
-        experimentos_list = [parse_experimento(exp) for exp in response.data]
-        return jsonify(experimentos_list or []), 200
+        experimentos_list, siguiente = _pagina_experimentos(5)
+        return _respuesta_pagina(experimentos_list, siguiente)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Exception as e:
         print(f"🚨 ERROR en obtener_experimentos_recientes: {e}")
         return jsonify({"error": "No se pudieron obtener los experimentos recientes"}), 500
 
-# --- Ruta para OBTENER TODOS los experimentos ---
+# --- Ruta para LISTAR los experimentos (paginado) ---
 @experimentos_bp.route("/", methods=["GET"])
 def listar_experimentos():
+    """
+    Lista experimentos del más reciente al más antiguo con los campos del
+    listado (?campos= para elegir otros), de ?limite= en ?limite=. Si hay más,
+    la cabecera X-Siguiente-Cursor trae el valor de ?cursor= para la siguiente página.
+    """
     try:
-        response = supabase.table("experimentos").select("*").order("fecha_creacion", desc=True).execute()
-        experimentos_list = [parse_experimento(exp) for exp in response.data]
-        return jsonify(experimentos_list or []), 200
+        experimentos_list, siguiente = _pagina_experimentos(LIMITE_LISTADO_POR_DEFECTO)
+        return _respuesta_pagina(experimentos_list, siguiente)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Exception as e:
         print(f"🚨 ERROR en listar_experimentos: {e}")
         return jsonify({"error": "No se pudieron obtener los experimentos"}), 500
@@ -56,14 +141,18 @@ def listar_experimentos():
 # Esta ruta dinámica va DESPUÉS de "/recientes"
 @experimentos_bp.route("/<experimento_id>", methods=["GET"])
 def obtener_experimento(experimento_id):
+    """Detalle completo de un experimento, con las visualizaciones (o solo ?campos=)."""
     try:
-        response = supabase.table("experimentos").select("*").eq("id", experimento_id).single().execute()
+        campos = _campos_pedidos(COLUMNAS_EXPERIMENTO) if request.args.get("campos") else "*"
+        response = supabase.table("experimentos").select(campos).eq("id", experimento_id).single().execute()
         
         if response.data:
             experimento_parsed = parse_experimento(response.data)
             return jsonify(experimento_parsed), 200
         else:
             return jsonify({"error": "Experimento no encontrado"}), 404
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Exception as e:
         # Este es el error que estabas viendo
         print(f"🚨 ERROR en obtener_experimento: {e}")
@@ -75,9 +164,75 @@ def obtener_experimento(experimento_id):
 def eliminar_experimento(experimento_id):
     try:
         result = supabase.table("experimentos").delete().eq("id", experimento_id).execute()
+        modelos_cache.invalidar(experimento_id)
+        invalidar_estadisticas()
         if result.data:
+            # Artefactos en Storage: igual que al subirlos, un fallo no impide la operación
+            for eliminar, nombre in ((eliminar_modelo, "el modelo"), (eliminar_resultados, "los resultados")):
+                try:
+                    eliminar(experimento_id)
+                except Exception as storage_err:
+                    print(f"⚠️ No se pudo eliminar {nombre} del experimento {experimento_id}: {storage_err}")
             return jsonify({"status": "ok", "message": "Experimento eliminado"}), 200
         return jsonify({"error": "No se encontró el experimento para eliminar"}), 404
     except Exception as e:
         print(f"🚨 ERROR en eliminar_experimento: {e}")
-        return jsonify({"error": "Ocurrió un error al eliminar"}), 500
\ No newline at end of file
+        return jsonify({"error": "Ocurrió un error al eliminar"}), 500
+
+
+# --- Ruta para DESCARGAR los resultados a resolución completa ---
+@experimentos_bp.route("/<experimento_id>/resultados", methods=["GET"])
+def descargar_resultados_experimento(experimento_id):
+    """
+    Devuelve el .npz con los arrays completos (reales, predicciones, fpr, tpr)
+    que en la fila del experimento solo están resumidos.
+    """
+    try:
+        contenido = descargar_resultados(experimento_id)
+    except Exception as e:
+        print(f"⚠️ No se pudieron descargar los resultados de {experimento_id}: {e}")
+        return jsonify({"error": "El experimento no tiene resultados completos guardados"}), 404
+    return send_file(contenido, mimetype="application/octet-stream", as_attachment=True,
+                     download_name=f"resultados_{experimento_id}.npz")
+
+
+# --- Ruta para PREDECIR con el modelo de un experimento ---
+@experimentos_bp.route("/<experimento_id>/predecir", methods=["POST"])
+def predecir_experimento(experimento_id):
+    """
+    Puntúa filas nuevas con el modelo guardado del experimento.
+    - JSON: {"filas": [{columna: valor, ...}, ...]}
+    - multipart/form-data: un CSV en el campo "archivo" (se lee por bloques).
+    Devuelve {"predicciones": [...]} en el mismo orden que las filas.
+    """
+    try:
+        response = supabase.table("experimentos").select("estado").eq("id", experimento_id).execute()
+        if not response.data:
+            return jsonify({"error": "Experimento no encontrado"}), 404
+        if response.data[0]["estado"] != "completado":
+            return jsonify({"error": "El experimento no ha terminado de entrenar"}), 409
+
+        try:
+            artefacto = modelos_cache.obtener(experimento_id)
+        except Exception as e:
+            print(f"⚠️ No se pudo cargar el modelo de {experimento_id}: {e}")
+            return jsonify({"error": "El experimento no tiene un modelo guardado"}), 404
+
+        if "archivo" in request.files:
+            predicciones = []
+            for bloque in pd.read_csv(request.files["archivo"].stream, chunksize=FILAS_POR_LOTE_PREDICCION):
+                predicciones += predecir_filas(artefacto, bloque)
+        else:
+            data = request.get_json(silent=True) or {}
+            filas = data.get("filas")
+            if not isinstance(filas, list) or not filas:
+                return jsonify({"error": "Envía un JSON con 'filas' (lista de objetos) o un CSV en 'archivo'"}), 400
+            predicciones = predecir_filas(artefacto, pd.DataFrame(filas))
+
+        return jsonify({"predicciones": predicciones, "total": len(predicciones)}), 200
+
+    except ValueError as ve: # Columnas faltantes o datos inválidos
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        print(f"🚨 ERROR en predecir_experimento: {e}")
+        return jsonify({"error": "Ocurrió un error al predecir"}), 500
@@ -1,32 +1,34 @@
 import pandas as pd
-import io
-import requests
+from app.config import Config
 from app.services.supabase_service import supabase
+from app.services.cache_service import dataset_cache
+from app.utils.correlacion_utils import (
+    METODOS_CORRELACION,
+    AcumuladorCorrelacion,
+    matriz_a_dict,
+    pares_mas_fuertes,
+)
+from app.utils.file_utils import leer_esquema, leer_pagina_parquet
+import pyarrow as pa
 import numpy as np # Importamos numpy para manejar tipos de datos
 
 # =============================================================================
 # 1️⃣ Obtener DataFrame "Crudo" (Sin modificar)
 # =============================================================================
-def obtener_dataframe_crudo(dataset_id: str) -> pd.DataFrame:
+def obtener_dataframe_crudo(dataset_id: str, columnas: list = None) -> pd.DataFrame:
     """
-    Descarga el archivo CSV desde Supabase y lo carga en un DataFrame de Pandas,
+    Descarga el dataset desde Supabase y lo carga en un DataFrame de Pandas,
     manteniendo los datos en su estado original (con valores nulos).
+    Se lee desde la copia columnar (Parquet); con `columnas` solo se cargan esas.
+    El resultado pasa por la caché local de datasets, así que varias peticiones
+    sobre el mismo dataset cuestan una sola descarga. El DataFrame devuelto es
+    compartido: quien necesite modificarlo debe trabajar sobre una copia.
     """
     try:
-        dataset_res = supabase.table("datasets").select("archivo_url").eq("id", dataset_id).single().execute()
-        if not dataset_res.data:
-            raise ValueError(f"❌ Dataset con ID '{dataset_id}' no encontrado.")
-
-        archivo_url = dataset_res.data.get("archivo_url")
-        if not archivo_url:
-            raise ValueError("❌ El registro del dataset no tiene una URL de archivo.")
-
-        resp = requests.get(archivo_url)
-        resp.raise_for_status()
-
-        df = pd.read_csv(io.BytesIO(resp.content))
+        archivo_url = obtener_archivo_url(dataset_id)
+        df = dataset_cache.obtener(dataset_id, archivo_url, columnas)
         
-        if df.empty:
+        if len(df) == 0:
             raise ValueError("⚠️ El dataset está vacío o no se pudo leer correctamente.")
         
         return df
@@ -36,6 +38,36 @@ def obtener_dataframe_crudo(dataset_id: str) -> pd.DataFrame:
         # Re-lanzamos la excepción para que la ruta la capture y envíe un error 500
         raise
 
+def obtener_archivo_url(dataset_id: str) -> str:
+    """Busca la URL del archivo del dataset (se memoriza: los datasets no cambian)."""
+    archivo_url = dataset_cache.url_de(dataset_id)
+    if archivo_url:
+        return archivo_url
+
+    dataset_res = supabase.table("datasets").select("archivo_url").eq("id", dataset_id).single().execute()
+    if not dataset_res.data:
+        raise ValueError(f"❌ Dataset con ID '{dataset_id}' no encontrado.")
+
+    archivo_url = dataset_res.data.get("archivo_url")
+    if not archivo_url:
+        raise ValueError("❌ El registro del dataset no tiene una URL de archivo.")
+
+    dataset_cache.recordar_url(dataset_id, archivo_url)
+    return archivo_url
+
+def obtener_esquema(dataset_id: str) -> pa.Schema:
+    """Devuelve el esquema (nombres y tipos) del dataset sin leer sus datos."""
+    archivo_url = obtener_archivo_url(dataset_id)
+    return leer_esquema(dataset_cache.obtener_ruta_columnar(dataset_id, archivo_url))
+
+def obtener_pagina(dataset_id: str, inicio: int, cantidad: int):
+    """
+    Devuelve (DataFrame con `cantidad` filas desde `inicio`, total de filas)
+    leyendo del Parquet local solo los grupos de filas de esa página.
+    """
+    archivo_url = obtener_archivo_url(dataset_id)
+    return leer_pagina_parquet(dataset_cache.obtener_ruta_columnar(dataset_id, archivo_url), inicio, cantidad)
+
 # =============================================================================
 # 2️⃣ Funciones de Análisis (Reciben el DataFrame "Crudo")
 # =============================================================================
@@ -67,12 +99,14 @@ def estadisticas_dataset(df: pd.DataFrame) -> dict:
         print(f"🚨 [ERROR] en estadisticas_dataset: {e}")
         raise
 
+CUANTILES_COLUMNA = [0.25, 0.5, 0.75]
+
 def obtener_columnas(df: pd.DataFrame) -> list:
     """
     ✅ CORREGIDO:
     Obtiene información detallada de cada columna.
     - Incluye 'valores_completos' para el gráfico de barras.
-    - Para columnas numéricas, añade 'min', 'max' y 'promedio'.
+    - Para columnas numéricas, añade 'min', 'max', 'promedio' y 'cuantiles'.
     """
     try:
         total_filas = len(df)
@@ -93,6 +127,9 @@ def obtener_columnas(df: pd.DataFrame) -> list:
                 col_info["min"] = float(df[c].min())
                 col_info["max"] = float(df[c].max())
                 col_info["promedio"] = float(df[c].mean())
+                if not pd.api.types.is_bool_dtype(df[c]):
+                    cuartiles = df[c].quantile(CUANTILES_COLUMNA)
+                    col_info["cuantiles"] = {f"p{int(q * 100)}": float(v) for q, v in cuartiles.items()}
 
             info_columnas.append(col_info)
             
@@ -101,14 +138,41 @@ def obtener_columnas(df: pd.DataFrame) -> list:
         print(f"🚨 [ERROR] en obtener_columnas: {e}")
         raise
 
-def calcular_correlacion(df: pd.DataFrame) -> dict:
-    """Calcula la matriz de correlación para las columnas numéricas."""
+FILAS_POR_BLOQUE_CORRELACION = 65536
+
+def resumen_correlacion(columnas: list, acumulador: AcumuladorCorrelacion) -> dict:
+    """
+    {'matriz': {col: {col: r}}, 'pares': [pares con mayor |r|]}. Con demasiadas
+    columnas la matriz se sustituye por un mensaje: solo se guardan los pares.
+    """
+    r = acumulador.matriz()
+    if not columnas:
+        matriz = {"mensaje": "No hay columnas numéricas para calcular correlación."}
+    elif len(columnas) > Config.CORRELACION_MAX_COLUMNAS_MATRIZ:
+        matriz = {"mensaje": f"Hay {len(columnas)} columnas numéricas: la matriz no se guarda, pide formato=pares."}
+    else:
+        matriz = matriz_a_dict(columnas, r)
+    return {"matriz": matriz, "pares": pares_mas_fuertes(columnas, r, acumulador.n, Config.CORRELACION_PARES_GUARDADOS)}
+
+def calcular_correlacion(df: pd.DataFrame, metodo: str = "pearson") -> dict:
+    """
+    Calcula la correlación entre las columnas numéricas, por bloques de filas y
+    con pares completos (los nulos no se rellenan). Spearman usa rangos promedio
+    de cada columna sobre todos sus valores no nulos: sin nulos coincide con
+    DataFrame.corr(method='spearman'); con nulos no, porque pandas ordena cada
+    par solo con sus filas completas (ver app/utils/correlacion_utils.py).
+    """
     try:
+        if metodo not in METODOS_CORRELACION:
+            raise ValueError(f"Método de correlación no válido: '{metodo}'")
         df_numerico = df.select_dtypes(include=np.number)
-        if df_numerico.empty:
-            return {"mensaje": "No hay columnas numéricas para calcular correlación."}
-        # Rellenar nulos con 0 solo para el cálculo de correlación, no modifica el df original
-        return df_numerico.fillna(0).corr().round(4).to_dict()
+        if metodo == "spearman":
+            df_numerico = df_numerico.rank()
+        columnas = list(df_numerico.columns)
+        acumulador = AcumuladorCorrelacion(len(columnas))
+        for inicio in range(0, len(df_numerico), FILAS_POR_BLOQUE_CORRELACION):
+            acumulador.actualizar(df_numerico.iloc[inicio:inicio + FILAS_POR_BLOQUE_CORRELACION].to_numpy(dtype=np.float64))
+        return resumen_correlacion(columnas, acumulador)
     except Exception as e:
         print(f"🚨 [ERROR] en calcular_correlacion: {e}")
         raise
@@ -0,0 +1,292 @@
+# app/services/barrido_service.py
+
+import itertools
+import json
+import math
+import random
+import threading
+import uuid
+from datetime import datetime
+
+from app.config import Config
+from app.services.supabase_service import supabase
+from app.services.cola_service import ColaTrabajos
+from app.services.features_service import feature_store
+from app.services.estimadores_service import semilla_de
+from app.services.estadisticas_service import invalidar_estadisticas
+from app.services.entrenamiento_service import (
+    cola_entrenamientos,
+    canal_progreso,
+    validar_configuracion,
+    fila_experimento,
+    encolar_experimento,
+    cancelar_entrenamiento,
+    ESTADOS_TERMINALES
+)
+
+# =============================================================================
+# Barridos de hiperparámetros
+# =============================================================================
+# Una sola petición define un espacio de búsqueda (rejilla o aleatoria) y cada
+# combinación se registra como un experimento con `barrido_id`. Primero se
+# prepara el conjunto en el almacén de features con un trabajo del pool y, al
+# terminar, se encolan todas las pruebas, que lo leen ya hecho.
+#
+# Con `poda` las redes neuronales se detienen por successive halving asíncrono
+# (ASHA): al llegar a la época min_epocas * factor^k cada prueba compara su
+# mejor perdida_validacion con las de las pruebas que ya pasaron por ese
+# escalón, y solo sigue si queda en la mejor 1/factor parte.
+#
+# Configuración:
+#   {dataset_id, columnas_entrada, columna_objetivo, validacion_split, ...,
+#    'espacio': {'tasa_aprendizaje': [0.01, 0.001] | {'min': 1e-4, 'max': 1e-1, 'log': true}, ...},
+#    'busqueda': 'rejilla' | 'aleatoria', 'n_pruebas': 20, 'semilla': 42,
+#    'poda': {'min_epocas': 5, 'factor': 3}}
+# 'semilla' fija el muestreo de la búsqueda aleatoria y pasa a todas las
+# pruebas: mismo split de features, mismo barajado y mismo random_state.
+
+# Solo se barren parámetros del modelo: los de la preparación de datos son comunes
+PARAMETROS_BARRIBLES = ['tipo_modelo', 'tasa_aprendizaje', 'epocas', 'tamano_lote', 'paciencia', 'evaluar_cada',
+                        'algoritmo', 'n_estimadores', 'profundidad_maxima', 'max_iteraciones']
+CLAVES_BARRIDO = ['espacio', 'busqueda', 'n_pruebas', 'poda']
+
+
+def _valor_aleatorio(valores, rng: random.Random):
+    if isinstance(valores, list):
+        return rng.choice(valores)
+    minimo, maximo = valores['min'], valores['max']
+    if valores.get('log'):
+        valor = math.exp(rng.uniform(math.log(minimo), math.log(maximo)))
+    else:
+        valor = rng.uniform(minimo, maximo)
+    return int(round(valor)) if isinstance(minimo, int) and isinstance(maximo, int) else valor
+
+
+def generar_pruebas(espacio: dict, busqueda: str = 'rejilla', n_pruebas: int = None, semilla: int = 42) -> list:
+    """Combinaciones de hiperparámetros a probar, como lista de dicts."""
+    if not espacio:
+        raise ValueError("El barrido necesita un 'espacio' con al menos un parámetro.")
+    no_barribles = [p for p in espacio if p not in PARAMETROS_BARRIBLES]
+    if no_barribles:
+        raise ValueError(f"Parámetros no barribles: {no_barribles}. Permitidos: {PARAMETROS_BARRIBLES}")
+    for parametro, valores in espacio.items():
+        es_rango = isinstance(valores, dict) and 'min' in valores and 'max' in valores
+        if not (isinstance(valores, list) and valores) and not es_rango:
+            raise ValueError(f"'{parametro}' debe ser una lista de valores o un rango {{'min', 'max'}}.")
+        if es_rango and (valores['min'] > valores['max'] or (valores.get('log') and valores['min'] <= 0)):
+            raise ValueError(f"Rango no válido para '{parametro}'.")
+
+    if busqueda == 'rejilla':
+        rangos = [p for p, valores in espacio.items() if not isinstance(valores, list)]
+        if rangos:
+            raise ValueError(f"La búsqueda en rejilla necesita listas de valores; usa 'aleatoria' para rangos: {rangos}")
+        parametros = list(espacio)
+        pruebas = [dict(zip(parametros, combinacion)) for combinacion in itertools.product(*espacio.values())]
+    elif busqueda == 'aleatoria':
+        if not n_pruebas or n_pruebas < 1:
+            raise ValueError("La búsqueda aleatoria necesita 'n_pruebas'.")
+        rng = random.Random(semilla)
+        pruebas = [{p: _valor_aleatorio(valores, rng) for p, valores in espacio.items()} for _ in range(n_pruebas)]
+    else:
+        raise ValueError("'busqueda' debe ser 'rejilla' o 'aleatoria'.")
+
+    if len(pruebas) > Config.BARRIDO_MAX_PRUEBAS:
+        raise ValueError(f"El barrido tiene {len(pruebas)} pruebas; el máximo es {Config.BARRIDO_MAX_PRUEBAS}.")
+    return pruebas
+
+
+class PodaSucesiva:
+    """
+    Regla de poda que comparten las pruebas de un barrido. Se envía a cada
+    proceso del pool; los resultados por escalón viven en un dict del Manager
+    ({época del escalón: {experimento_id: mejor pérdida}}).
+    """
+
+    def __init__(self, resultados, lock, min_epocas: int, factor: int):
+        self.resultados = resultados
+        self.lock = lock
+        self.min_epocas = max(1, int(min_epocas))
+        self.factor = max(2, int(factor))
+
+    def escalones(self, hasta_epoca: int) -> list:
+        escalon, escalones = self.min_epocas, []
+        while escalon <= hasta_epoca:
+            escalones.append(escalon)
+            escalon *= self.factor
+        return escalones
+
+    def debe_podar(self, experimento_id: str, epoca: int, mejor_perdida: float) -> bool:
+        """
+        Registra la prueba en los escalones alcanzados (las épocas sin evaluar
+        cuentan en la siguiente evaluada) y devuelve True si no está en la
+        mejor 1/factor parte de alguno de ellos.
+        """
+        with self.lock:
+            for escalon in self.escalones(epoca):
+                perdidas = self.resultados.get(escalon, {})
+                if experimento_id in perdidas:
+                    continue
+                perdidas[experimento_id] = mejor_perdida
+                self.resultados[escalon] = perdidas  # el proxy solo ve asignaciones, no mutaciones
+                # La primera prueba de un escalón siempre sigue
+                n_siguen = max(1, len(perdidas) // self.factor)
+                if mejor_perdida > sorted(perdidas.values())[n_siguen - 1]:
+                    return True
+        return False
+
+
+def _preparar_features(dataset_id: str, columnas_entrada: list, columna_objetivo: str, validacion_split: float,
+                       semilla: int, cancelacion=None, eventos=None):
+    # Corre en el pool: deja el conjunto en el disco del almacén para todas las pruebas
+    feature_store.obtener(dataset_id, columnas_entrada, columna_objetivo, validacion_split, semilla=semilla)
+
+
+class GestorBarridos:
+    """Encola las pruebas de cada barrido cuando su conjunto está preparado."""
+
+    def __init__(self, cola: ColaTrabajos):
+        self.cola = cola
+        self._pendientes = {}  # barrido_id -> [(experimento_id, config)] aún sin encolar
+        self._lock = threading.Lock()
+
+    def iniciar(self, config: dict) -> dict:
+        validar_configuracion(config)
+        pruebas = generar_pruebas(config.get('espacio'), config.get('busqueda', 'rejilla'),
+                                  config.get('n_pruebas'), semilla_de(config))
+        poda = config.get('poda')
+        if poda is not None and not (isinstance(poda, dict) and poda.get('min_epocas') and poda.get('factor')):
+            raise ValueError("'poda' necesita 'min_epocas' y 'factor'.")
+
+        barrido_id = str(uuid.uuid4())
+        nombre = f"Barrido_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        barrido = {
+            'id': barrido_id,
+            'nombre': nombre,
+            'dataset_id': config.get('dataset_id'),
+            'configuracion': json.dumps(config),
+            'fecha_creacion': datetime.utcnow().isoformat()
+        }
+        result = supabase.table('barridos').insert(barrido).execute()
+        if not result.data: raise Exception("No se pudo registrar el barrido en la base de datos.")
+
+        base = {k: v for k, v in config.items() if k not in CLAVES_BARRIDO}
+        filas = []
+        for i, parametros in enumerate(pruebas, start=1):
+            config_prueba = {**base, **parametros}
+            filas.append(fila_experimento(config_prueba, nombre=f"{nombre}_prueba_{i:03d}", barrido_id=barrido_id))
+        # Un solo insert para todas las pruebas
+        result_pruebas = supabase.table('experimentos').insert(filas).execute()
+        if not result_pruebas.data: raise Exception("No se pudieron registrar las pruebas del barrido.")
+        invalidar_estadisticas()
+
+        with self._lock:
+            self._pendientes[barrido_id] = [(fila['id'], json.loads(fila['configuracion'])) for fila in filas]
+        for fila in filas:
+            canal_progreso.abrir(fila['id'])
+            canal_progreso.publicar(fila['id'], {'tipo': 'estado', 'estado': 'en_cola'})
+
+        future = self.cola.enviar(
+            self._id_preparacion(barrido_id), _preparar_features,
+            config.get('dataset_id'), config.get('columnas_entrada'), config.get('columna_objetivo'),
+            config.get('validacion_split', 0.2), semilla_de(config)
+        )
+        future.add_done_callback(lambda f: self._al_preparar(barrido_id, poda, f))
+        print(f"📥 Barrido {barrido_id} con {len(filas)} pruebas registrado.")
+        return {**result.data[0], 'experimentos': result_pruebas.data}
+
+    def _id_preparacion(self, barrido_id: str) -> str:
+        return f"barrido:{barrido_id}"
+
+    def _al_preparar(self, barrido_id: str, poda: dict, future):
+        with self._lock:
+            pendientes = self._pendientes.pop(barrido_id, None)
+        if not pendientes:
+            return  # se canceló mientras se preparaba
+
+        error = None if future.cancelled() else future.exception()
+        if error is not None:
+            print(f"🔥 No se pudo preparar el conjunto del barrido {barrido_id}: {error}")
+            for experimento_id, _ in pendientes:
+                self._marcar(experimento_id, 'error', error=str(error))
+            return
+
+        regla_poda = None
+        if poda is not None:
+            manager = self.cola.manager()
+            regla_poda = PodaSucesiva(manager.dict(), manager.Lock(), poda['min_epocas'], poda['factor'])
+        for experimento_id, config_prueba in pendientes:
+            encolar_experimento(experimento_id, config_prueba, regla_poda)
+
+    def _marcar(self, experimento_id: str, estado: str, error: str = None):
+        cambios = {'estado': estado}
+        if error is not None:
+            cambios['metricas'] = json.dumps({'error': error})
+        supabase.table('experimentos').update(cambios).eq('id', experimento_id).execute()
+        evento = {'tipo': 'estado', 'estado': estado}
+        if error is not None:
+            evento['error'] = error
+        canal_progreso.publicar(experimento_id, evento)
+
+    def cancelar(self, barrido_id: str) -> int:
+        """Cancela todas las pruebas del barrido que no hayan terminado. Devuelve cuántas."""
+        with self._lock:
+            pendientes = self._pendientes.pop(barrido_id, None)
+        if pendientes is not None:
+            # Aún se estaba preparando el conjunto: ninguna prueba llegó al pool
+            self.cola.cancelar(self._id_preparacion(barrido_id))
+            for experimento_id, _ in pendientes:
+                self._marcar(experimento_id, 'cancelado')
+            return len(pendientes)
+
+        cancelados = 0
+        for prueba in obtener_pruebas(barrido_id, 'id, estado'):
+            if prueba['estado'] not in ESTADOS_TERMINALES and cancelar_entrenamiento(prueba['id']) is not None:
+                cancelados += 1
+        return cancelados
+
+
+gestor_barridos = GestorBarridos(cola_entrenamientos)
+
+
+def obtener_pruebas(barrido_id: str, campos: str = 'id, nombre, estado, configuracion, metricas, tiempo_total') -> list:
+    response = supabase.table('experimentos').select(campos).eq('barrido_id', barrido_id).order('nombre').execute()
+    return response.data or []
+
+
+def _cargar(valor):
+    return json.loads(valor) if isinstance(valor, str) else valor
+
+
+def resumen_barrido(barrido_id: str) -> dict:
+    """Barrido con el estado de sus pruebas y la mejor (accuracy en clasificación, MSE en regresión)."""
+    response = supabase.table('barridos').select('*').eq('id', barrido_id).execute()
+    if not response.data:
+        return None
+    barrido = response.data[0]
+    barrido['configuracion'] = _cargar(barrido.get('configuracion'))
+
+    pruebas, conteo = [], {}
+    for prueba in obtener_pruebas(barrido_id):
+        config_prueba = _cargar(prueba.get('configuracion')) or {}
+        pruebas.append({
+            'id': prueba['id'],
+            'nombre': prueba['nombre'],
+            'estado': prueba['estado'],
+            'parametros': {p: config_prueba.get(p) for p in (barrido['configuracion'] or {}).get('espacio', {})},
+            'metricas': _cargar(prueba.get('metricas')),
+            'tiempo_total': prueba.get('tiempo_total')
+        })
+        conteo[prueba['estado']] = conteo.get(prueba['estado'], 0) + 1
+
+    def puntuacion(prueba):
+        metricas = prueba['metricas'] or {}
+        if metricas.get('accuracy') is not None:
+            return metricas['accuracy']
+        return -metricas['mse'] if metricas.get('mse') is not None else None
+
+    completadas = [p for p in pruebas if p['estado'] == 'completado' and puntuacion(p) is not None]
+    barrido['pruebas'] = pruebas
+    barrido['conteo_estados'] = conteo
+    barrido['terminado'] = all(p['estado'] in ESTADOS_TERMINALES for p in pruebas)
+    barrido['mejor_prueba'] = max(completadas, key=puntuacion)['id'] if completadas else None
+    return barrido
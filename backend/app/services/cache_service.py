@@ -0,0 +1,335 @@
+# app/services/cache_service.py
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import requests
+
+from app.config import Config
+from app.services import http_service
+from app.utils.file_utils import (
+    EXTENSION_COLUMNAR,
+    csv_a_parquet,
+    es_columnar,
+    inferir_esquema_compacto,
+    leer_parquet,
+    url_columnar,
+)
+
+# =============================================================================
+# Caché de datasets por proceso
+# =============================================================================
+# Dos niveles:
+#   1. Memoria: DataFrames ya parseados, LRU acotado por bytes.
+#   2. Disco:   archivos descargados, guardados por su hash SHA-256
+#               (direccionado por contenido) y con LRU por fecha de acceso.
+#               Los CSV se convierten a Parquet una sola vez (<hash>.parquet)
+#               para poder leer solo las columnas necesarias.
+# La clave lógica es (dataset_id, archivo_url); el índice en disco traduce esa
+# clave al hash del contenido, así dos datasets con el mismo archivo comparten
+# una sola copia.
+# Junto a cada Parquet se guarda su esquema compacto (<ruta>.esquema.json),
+# inferido la primera vez que se lee; todas las lecturas lo aplican.
+
+EXTENSION_ESQUEMA = ".esquema.json"
+VERSION_ESQUEMA = 1
+
+
+def _hash_texto(texto: str) -> str:
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+class DatasetCache:
+    def __init__(self, directorio: str, max_bytes_memoria: int, max_bytes_disco: int):
+        self.directorio = directorio
+        self.max_bytes_memoria = max_bytes_memoria
+        self.max_bytes_disco = max_bytes_disco
+        self._dir_objetos = os.path.join(directorio, "objetos")
+        self._dir_indice = os.path.join(directorio, "indice")
+        os.makedirs(self._dir_objetos, exist_ok=True)
+        os.makedirs(self._dir_indice, exist_ok=True)
+
+        self._memoria = OrderedDict()  # (dataset_id, archivo_url) -> (df, bytes)
+        self._bytes_memoria = 0
+        self._lock = threading.RLock()
+        self._locks_carga = {}  # clave -> RLock, para que solo un hilo descargue
+        self._urls = {}  # dataset_id -> archivo_url (los datasets no cambian tras subirse)
+        self._esquemas = {}  # ruta Parquet -> esquema compacto (el contenido de una ruta no cambia)
+
+    # -------------------------------------------------------------------------
+    # API pública
+    # -------------------------------------------------------------------------
+    def obtener(self, dataset_id: str, archivo_url: str, columnas: list = None) -> pd.DataFrame:
+        """
+        Devuelve el DataFrame del dataset. Si varias peticiones piden el mismo
+        dataset a la vez, solo una descarga y parsea el archivo; el resto espera
+        y reutiliza el resultado.
+        Con `columnas` solo se leen esas columnas del archivo columnar (si el
+        dataset completo ya está en memoria se proyecta desde ahí).
+        El DataFrame devuelto es compartido: NO debe modificarse in-place.
+        """
+        clave = (str(dataset_id), archivo_url)
+        df = self._leer_memoria(clave)
+        if df is not None:
+            return df[columnas] if columnas is not None else df
+
+        if columnas is not None:
+            ruta = self.obtener_ruta_columnar(dataset_id, archivo_url)
+            return leer_parquet(ruta, columnas, self.esquema_compacto(ruta))
+
+        with self._lock_de_carga(clave):
+            # Otro hilo pudo haberlo cargado mientras esperábamos
+            df = self._leer_memoria(clave)
+            if df is not None:
+                return df
+
+            ruta = self.obtener_ruta_columnar(dataset_id, archivo_url)
+            df = leer_parquet(ruta, esquema_compacto=self.esquema_compacto(ruta))
+            self._guardar_memoria(clave, df)
+            return df
+
+    def obtener_ruta_columnar(self, dataset_id: str, archivo_url: str) -> str:
+        """
+        Devuelve la ruta local de la versión Parquet del dataset. Orden de búsqueda:
+        caché local, copia columnar en Storage (subida en la ingesta) y, para
+        datasets antiguos sin ella, el CSV original convertido aquí una sola vez.
+        """
+        clave = (str(dataset_id), archivo_url)
+        with self._lock_de_carga(clave):
+            if es_columnar(archivo_url):
+                return self.obtener_ruta_local(dataset_id, archivo_url)
+
+            url_parquet = url_columnar(archivo_url)
+            ruta = self._ruta_desde_indice(self._ruta_indice(dataset_id, url_parquet))
+            if ruta:
+                os.utime(ruta)
+                return ruta
+
+            ruta_csv = self._ruta_desde_indice(self._ruta_indice(dataset_id, archivo_url))
+            if ruta_csv is None:
+                try:
+                    return self.obtener_ruta_local(dataset_id, url_parquet)
+                except requests.exceptions.HTTPError:
+                    pass  # Dataset anterior a la ingesta columnar
+                ruta_csv = self.obtener_ruta_local(dataset_id, archivo_url)
+
+            ruta = ruta_csv + EXTENSION_COLUMNAR
+            if not os.path.exists(ruta):
+                csv_a_parquet(ruta_csv, ruta)
+            os.utime(ruta)
+            return ruta
+
+    def ruta_en_cache(self, dataset_id: str, archivo_url: str):
+        """Ruta local del archivo si ya está en disco, o None (nunca descarga)."""
+        return self._ruta_desde_indice(self._ruta_indice(dataset_id, archivo_url))
+
+    def esquema_compacto(self, ruta_parquet: str) -> dict:
+        """
+        Esquema compacto del Parquet: de memoria, del archivo junto a él o, la
+        primera vez, inferido y guardado ahí.
+        """
+        with self._lock:
+            if ruta_parquet in self._esquemas:
+                return self._esquemas[ruta_parquet]
+
+        ruta_esquema = ruta_parquet + EXTENSION_ESQUEMA
+        esquema = None
+        try:
+            with open(ruta_esquema) as f:
+                guardado = json.load(f)
+            if guardado.get("version") == VERSION_ESQUEMA:
+                esquema = guardado["columnas"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+        if esquema is None:
+            esquema = inferir_esquema_compacto(ruta_parquet, Config.ESQUEMA_MAX_PROPORCION_CATEGORIAS)
+            self._escribir_atomico(ruta_esquema, json.dumps({"version": VERSION_ESQUEMA, "columnas": esquema}))
+
+        with self._lock:
+            self._esquemas[ruta_parquet] = esquema
+        return esquema
+
+    def obtener_ruta_local(self, dataset_id: str, archivo_url: str) -> str:
+        """Devuelve la ruta del archivo en disco, descargándolo si no está en caché."""
+        ruta_indice = self._ruta_indice(dataset_id, archivo_url)
+        with self._lock_de_carga((str(dataset_id), archivo_url)):
+            ruta = self._ruta_desde_indice(ruta_indice)
+            if ruta:
+                os.utime(ruta)  # Marca de acceso para el LRU en disco
+                return ruta
+
+            digest, ruta_temporal = self._descargar(archivo_url)
+            ruta = self._ruta_objeto(digest)
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            os.replace(ruta_temporal, ruta)
+            self._escribir_atomico(ruta_indice, digest)
+            self._evictar_disco(proteger=ruta)
+            return ruta
+
+    def importar(self, dataset_id: str, archivo_url: str, ruta_origen: str):
+        """
+        Registra en la caché un archivo que ya está en disco (p. ej. el que se
+        acaba de generar en la ingesta) para que la primera lectura no lo descargue.
+        El archivo de origen se mueve dentro de la caché.
+        """
+        sha = hashlib.sha256()
+        with open(ruta_origen, "rb") as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(bloque)
+        digest = sha.hexdigest()
+        ruta = self._ruta_objeto(digest)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        shutil.move(ruta_origen, ruta)
+        self._escribir_atomico(self._ruta_indice(dataset_id, archivo_url), digest)
+        self._evictar_disco(proteger=ruta)
+
+    def url_de(self, dataset_id: str):
+        with self._lock:
+            return self._urls.get(str(dataset_id))
+
+    def recordar_url(self, dataset_id: str, archivo_url: str):
+        with self._lock:
+            self._urls[str(dataset_id)] = archivo_url
+
+    def invalidar(self, dataset_id: str):
+        """Elimina de memoria y disco todo lo asociado a un dataset."""
+        dataset_id = str(dataset_id)
+        with self._lock:
+            self._urls.pop(dataset_id, None)
+            for clave in [c for c in self._memoria if c[0] == dataset_id]:
+                _, tamano = self._memoria.pop(clave)
+                self._bytes_memoria -= tamano
+
+        prefijo = _hash_texto(dataset_id) + "_"
+        digests = set()
+        for nombre in os.listdir(self._dir_indice):
+            if nombre.startswith(prefijo):
+                ruta_indice = os.path.join(self._dir_indice, nombre)
+                digest = self._leer_indice(ruta_indice)
+                if digest:
+                    digests.add(digest)
+                self._borrar(ruta_indice)
+
+        # Solo se borra el objeto si ningún otro dataset apunta a él
+        en_uso = {self._leer_indice(os.path.join(self._dir_indice, n)) for n in os.listdir(self._dir_indice)}
+        for digest in digests - en_uso:
+            ruta = self._ruta_objeto(digest)
+            for ruta_archivo in (ruta, ruta + EXTENSION_COLUMNAR):
+                self._borrar(ruta_archivo)
+                self._borrar(ruta_archivo + EXTENSION_ESQUEMA)
+                with self._lock:
+                    self._esquemas.pop(ruta_archivo, None)
+
+    # -------------------------------------------------------------------------
+    # Nivel memoria
+    # -------------------------------------------------------------------------
+    def _leer_memoria(self, clave):
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada is None:
+                return None
+            self._memoria.move_to_end(clave)
+            return entrada[0]
+
+    def _guardar_memoria(self, clave, df: pd.DataFrame):
+        tamano = int(df.memory_usage(deep=True).sum())
+        if tamano > self.max_bytes_memoria:
+            return  # Demasiado grande: se queda solo en disco
+        with self._lock:
+            if clave in self._memoria:
+                self._bytes_memoria -= self._memoria.pop(clave)[1]
+            self._memoria[clave] = (df, tamano)
+            self._bytes_memoria += tamano
+            while self._bytes_memoria > self.max_bytes_memoria and self._memoria:
+                _, (_, tamano_viejo) = self._memoria.popitem(last=False)
+                self._bytes_memoria -= tamano_viejo
+
+    def _lock_de_carga(self, clave) -> threading.RLock:
+        with self._lock:
+            return self._locks_carga.setdefault(clave, threading.RLock())
+
+    # -------------------------------------------------------------------------
+    # Nivel disco
+    # -------------------------------------------------------------------------
+    def _ruta_indice(self, dataset_id: str, archivo_url: str) -> str:
+        return os.path.join(self._dir_indice, f"{_hash_texto(str(dataset_id))}_{_hash_texto(archivo_url)}")
+
+    def _ruta_objeto(self, digest: str) -> str:
+        return os.path.join(self._dir_objetos, digest[:2], digest)
+
+    def _leer_indice(self, ruta_indice: str):
+        try:
+            with open(ruta_indice) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _ruta_desde_indice(self, ruta_indice: str):
+        digest = self._leer_indice(ruta_indice)
+        if digest:
+            ruta = self._ruta_objeto(digest)
+            if os.path.exists(ruta):
+                return ruta
+        return None
+
+    def _descargar(self, archivo_url: str):
+        """Descarga a un archivo temporal calculando el hash mientras llegan los bytes."""
+        fd, ruta_temporal = tempfile.mkstemp(dir=self.directorio, suffix=".descarga")
+        os.close(fd)
+        try:
+            digest = http_service.descargar_a_archivo(archivo_url, ruta_temporal)
+        except Exception:
+            self._borrar(ruta_temporal)
+            raise
+        return digest, ruta_temporal
+
+    def _escribir_atomico(self, ruta: str, contenido: str):
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta))
+        with os.fdopen(fd, "w") as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+
+    def _evictar_disco(self, proteger: str = None):
+        objetos = []
+        for raiz, _, archivos in os.walk(self._dir_objetos):
+            for nombre in archivos:
+                ruta = os.path.join(raiz, nombre)
+                try:
+                    st = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                objetos.append((st.st_mtime, st.st_size, ruta))
+
+        total = sum(tamano for _, tamano, _ in objetos)
+        for _, tamano, ruta in sorted(objetos):
+            if total <= self.max_bytes_disco:
+                break
+            if ruta == proteger:
+                continue
+            self._borrar(ruta)  # Las entradas de índice huérfanas se ignoran al leer
+            total -= tamano
+
+    @staticmethod
+    def _borrar(ruta: str):
+        try:
+            if os.path.isdir(ruta):
+                shutil.rmtree(ruta)
+            else:
+                os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+
+# --- Instancia compartida por todo el proceso ---
+dataset_cache = DatasetCache(
+    directorio=Config.DATASET_CACHE_DIR,
+    max_bytes_memoria=Config.DATASET_CACHE_MEMORIA_MB * 1024 * 1024,
+    max_bytes_disco=Config.DATASET_CACHE_DISCO_MB * 1024 * 1024,
+)
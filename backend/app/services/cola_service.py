@@ -0,0 +1,143 @@
+# app/services/cola_service.py
+
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# =============================================================================
+# Cola de trabajos en segundo plano (pool de procesos acotado)
+# =============================================================================
+# Los trabajos pesados (entrenamientos) se ejecutan en procesos aparte para que
+# PyTorch y scikit-learn no compitan por el GIL con los workers web. Se usa el
+# contexto "spawn": hacer fork de un proceso con hilos y clientes HTTP abiertos
+# no es seguro.
+
+
+class TrabajoCancelado(Exception):
+    """Lo lanza un trabajo cuando detecta que se pidió su cancelación."""
+
+
+class CancelacionPersistente:
+    """
+    Evento de cancelación que además consulta un indicador guardado fuera del
+    proceso (`consultar()`, p. ej. una columna de la base de datos) como mucho
+    cada `intervalo` segundos. Con varios workers web, la cancelación puede
+    llegar a uno que no tiene el trabajo en su pool: ese solo puede guardarla.
+    """
+
+    def __init__(self, evento, consultar, intervalo: float):
+        self.evento = evento
+        self.consultar = consultar
+        self.intervalo = intervalo
+        self._ultima_consulta = -math.inf
+        self._solicitada = False
+
+    def is_set(self) -> bool:
+        if self._solicitada or (self.evento is not None and self.evento.is_set()):
+            return True
+        ahora = time.monotonic()
+        if ahora - self._ultima_consulta >= self.intervalo:
+            self._ultima_consulta = ahora
+            try:
+                self._solicitada = bool(self.consultar())
+            except Exception as e:
+                print(f"⚠️ No se pudo consultar la cancelación del trabajo: {e}")
+        return self._solicitada
+
+
+def verificar_cancelacion(cancelacion):
+    """Punto de control para llamar entre fases/épocas de un trabajo."""
+    if cancelacion is not None and cancelacion.is_set():
+        raise TrabajoCancelado()
+
+
+class ColaTrabajos:
+    def __init__(self, max_procesos: int, inicializador=None, al_evento=None):
+        self.max_procesos = max_procesos
+        self.inicializador = inicializador
+        self.al_evento = al_evento  # al_evento(trabajo_id, evento), en este proceso
+        self._contexto = multiprocessing.get_context("spawn")
+        self._executor = None
+        self._manager = None
+        self._eventos = None
+        self._trabajos = {}  # trabajo_id -> (future, evento de cancelación)
+        self._lock = threading.Lock()
+
+    def _iniciar(self):
+        # Arranque perezoso: importar el módulo no debe lanzar procesos
+        if self._executor is None:
+            self._manager = self._contexto.Manager()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_procesos,
+                mp_context=self._contexto,
+                initializer=self.inicializador,
+            )
+            if self.al_evento is not None:
+                self._eventos = self._manager.Queue()
+                threading.Thread(target=self._reenviar_eventos, daemon=True).start()
+
+    def _reenviar_eventos(self):
+        # Los trabajos ponen (trabajo_id, evento) en la cola compartida
+        while True:
+            try:
+                trabajo_id, evento = self._eventos.get()
+                self.al_evento(trabajo_id, evento)
+            except (EOFError, BrokenPipeError):
+                return  # el Manager se cerró
+            except Exception as e:
+                print(f"⚠️ Error al reenviar un evento de la cola de trabajos: {e}")
+
+    def manager(self):
+        """Manager del pool, para crear estructuras compartidas entre trabajos (dict, Lock...)."""
+        with self._lock:
+            self._iniciar()
+            return self._manager
+
+    def enviar(self, trabajo_id: str, funcion, *args, al_fallar=None):
+        """
+        Encola `funcion(*args, cancelacion=<evento>, eventos=<cola>)`. El trabajo
+        debe consultar el evento con `verificar_cancelacion`; lo que ponga en
+        `eventos` como (trabajo_id, evento) llega a `al_evento` en este proceso.
+        `al_fallar(trabajo_id, error)` se llama en este proceso si el trabajo
+        muere sin gestionar su propio error (p. ej. el proceso hijo se cae).
+        """
+        with self._lock:
+            self._iniciar()
+            cancelacion = self._manager.Event()
+            future = self._executor.submit(funcion, *args, cancelacion=cancelacion, eventos=self._eventos)
+            self._trabajos[trabajo_id] = (future, cancelacion)
+
+        def _al_terminar(f):
+            with self._lock:
+                self._trabajos.pop(trabajo_id, None)
+            if f.cancelled():
+                return
+            error = f.exception()
+            if error is not None and al_fallar is not None:
+                al_fallar(trabajo_id, error)
+
+        future.add_done_callback(_al_terminar)
+        return future
+
+    def cancelar(self, trabajo_id: str) -> str:
+        """
+        Devuelve 'cancelado' si el trabajo seguía en cola (ya no se ejecutará),
+        'solicitado' si está en ejecución (se detendrá en su próximo punto de
+        control) o None si este proceso no lo conoce (puede estar en el pool
+        de otro worker: ver CancelacionPersistente).
+        """
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+        if trabajo is None:
+            return None
+        future, cancelacion = trabajo
+        if future.cancel():
+            return "cancelado"
+        cancelacion.set()
+        return "solicitado"
+
+    def en_curso(self, trabajo_id: str) -> bool:
+        with self._lock:
+            return trabajo_id in self._trabajos
@@ -1,107 +1,191 @@
 # --- Importaciones ---
 import torch
 import torch.nn as nn
+from app.config import Config
 from app.services.supabase_service import supabase
-from app.services.analisis_service import obtener_dataframe_crudo
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.linear_model import LogisticRegression, LinearRegression
-from sklearn.metrics import (
-    accuracy_score, mean_squared_error, r2_score,
-    recall_score, f1_score, roc_curve, roc_auc_score,
-    confusion_matrix,
-    precision_score
+from app.services.cola_service import CancelacionPersistente, ColaTrabajos, TrabajoCancelado, verificar_cancelacion
+from app.services.progreso_service import CanalProgreso, ReportadorProgreso
+from app.services.red_neuronal_service import (
+    NeuralNet,
+    entrenar_red_neuronal,
+    predecir,
+    salidas_a_etiquetas,
+    TAMANO_LOTE_POR_DEFECTO,
+    EVALUAR_CADA_POR_DEFECTO,
+    PACIENCIA_POR_DEFECTO
 )
-from sklearn.inspection import permutation_importance
+from app.services.features_service import feature_store
+from app.services.estadisticas_service import invalidar_estadisticas
+from app.services.importancia_service import calcular_importancia, agrupar_columnas
+from app.services.modelos_service import crear_artefacto, guardar_modelo, modelos_cache
+from app.services.estimadores_service import algoritmo_de, entrenar_estimador, semilla_de, validar_algoritmo
+from app.services.resultados_service import histograma_errores, muestrear_predicciones, reducir_curva_roc, guardar_resultados
+from app.utils.ml_utils import MatrizConfusion
+from sklearn.metrics import mean_squared_error, r2_score, roc_curve, roc_auc_score
 
 from datetime import datetime
+from threadpoolctl import threadpool_limits
+import copy
 import json
-import pandas as pd
 import numpy as np
 import uuid
 import time
 
-# --- Clase NeuralNet (Sin cambios) ---
-class NeuralNet(nn.Module):
-    def __init__(self, input_size, num_classes, is_regression=False):
-        super(NeuralNet, self).__init__()
-        self.network = nn.Sequential(
-            nn.Linear(input_size, 128),
-            nn.ReLU(),
-            nn.Dropout(0.5),
-            nn.Linear(128, 64),
-            nn.ReLU(),
-            nn.Dropout(0.3),
-            nn.Linear(64, 32),
-            nn.ReLU()
-        )
-        if is_regression:
-            self.output_layer = nn.Linear(32, 1)
-        else:
-            # Para clasificación binaria, la salida es 1, para multiclase es num_classes
-            self.output_layer = nn.Linear(32, num_classes if num_classes > 2 else 1)
-
-    def forward(self, x):
-        x = self.network(x)
-        return self.output_layer(x)
+# =============================================================================
+# Encolado: la petición HTTP solo registra el experimento y lo encola
+# =============================================================================
+ESTADOS_TERMINALES = ['completado', 'error', 'cancelado']
 
-def iniciar_nuevo_entrenamiento(config: dict):
+def _inicializar_proceso_entrenamiento():
+    # Cada proceso del pool usa un número acotado de hilos para no dejar sin CPU a la web
+    torch.set_num_threads(Config.ENTRENAMIENTO_HILOS_POR_PROCESO)
+    threadpool_limits(limits=Config.ENTRENAMIENTO_HILOS_POR_PROCESO)  # BLAS/OpenMP de numpy y sklearn
+
+# Los eventos de progreso de los procesos del pool se publican en el canal de este proceso
+canal_progreso = CanalProgreso(ESTADOS_TERMINALES)
+cola_entrenamientos = ColaTrabajos(Config.ENTRENAMIENTO_MAX_PROCESOS, inicializador=_inicializar_proceso_entrenamiento, al_evento=canal_progreso.publicar)
+
+def validar_configuracion(config: dict):
     if config.get('columna_objetivo') in config.get('columnas_entrada', []):
         raise ValueError("La columna objetivo no puede estar incluida en las columnas de entrada.")
+    semilla = config.get('semilla')
+    if semilla is not None and (not isinstance(semilla, int) or isinstance(semilla, bool) or semilla < 0):
+        raise ValueError("'semilla' debe ser un entero no negativo.")
+    validar_algoritmo(config)
+
+def _modelo_a_continuar(config: dict, columnas_modelo: list, clases) -> object:
+    """Copia del modelo de 'continuar_desde' (warm start); lanza ValueError si no es compatible."""
+    artefacto = modelos_cache.obtener(config['continuar_desde'])
+    if artefacto.get('tipo_modelo') != config['tipo_modelo'] or artefacto.get('algoritmo', algoritmo_de(artefacto)) != algoritmo_de(config):
+        raise ValueError("El experimento a continuar usa otro tipo de modelo o algoritmo.")
+    if artefacto['columnas_modelo'] != list(columnas_modelo) or artefacto.get('clases') != clases:
+        raise ValueError("El experimento a continuar se entrenó con otras columnas o clases.")
+    # Copia: el artefacto de la caché no debe cambiar al seguir entrenando
+    return copy.deepcopy(artefacto['modelo'])
+
+def fila_experimento(config: dict, nombre: str = None, barrido_id: str = None) -> dict:
+    """Registro inicial (estado 'en_cola') de un experimento para la tabla `experimentos`."""
+    fila = {
+        'id': str(uuid.uuid4()),
+        'nombre': nombre or f"Experimento_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        'dataset_id': config.get('dataset_id'),
+        'configuracion': json.dumps(config),
+        'estado': 'en_cola',
+        'fecha_creacion': datetime.utcnow().isoformat(),
+        'tipo_problema': 'indefinido'
+    }
+    if barrido_id is not None:
+        fila['barrido_id'] = barrido_id
+    return fila
+
+def encolar_experimento(experimento_id: str, config: dict, poda=None):
+    canal_progreso.abrir(experimento_id)
+    canal_progreso.publicar(experimento_id, {'tipo': 'estado', 'estado': 'en_cola'})
+    cola_entrenamientos.enviar(experimento_id, ejecutar_entrenamiento, experimento_id, config, poda, al_fallar=_marcar_fallido)
+    print(f"📥 Experimento {experimento_id} encolado.")
+
+def iniciar_nuevo_entrenamiento(config: dict):
+    """
+    Valida la configuración, crea el experimento con estado 'en_cola' y lo
+    encola. Devuelve el registro recién creado sin esperar al entrenamiento.
+    """
+    validar_configuracion(config)
+
+    experimento_en_cola = fila_experimento(config)
+    result = supabase.table('experimentos').insert(experimento_en_cola).execute()
+    if not result.data: raise Exception("No se pudo registrar el experimento en la base de datos.")
+    invalidar_estadisticas()
+
+    encolar_experimento(experimento_en_cola['id'], config)
+    return result.data[0]
+
+def cancelar_entrenamiento(experimento_id: str) -> str:
+    """
+    Cancela un experimento en cola o pide la detención de uno en ejecución.
+    La petición también se guarda en `experimentos.cancelacion_solicitada`:
+    con varios workers web el trabajo puede estar en el pool de otro proceso,
+    que la ve en su siguiente punto de control. Devuelve 'cancelado',
+    'solicitado' o None si el experimento no existe o ya terminó.
+    """
+    resultado = cola_entrenamientos.cancelar(experimento_id)
+    if resultado == 'cancelado':
+        supabase.table('experimentos').update({'estado': 'cancelado'}).eq('id', experimento_id).execute()
+        canal_progreso.publicar(experimento_id, {'tipo': 'estado', 'estado': 'cancelado'})
+        return resultado
 
+    if resultado is None:
+        response = supabase.table('experimentos').select('estado').eq('id', experimento_id).execute()
+        if not response.data or response.data[0]['estado'] in ESTADOS_TERMINALES:
+            return None
+        resultado = 'solicitado'
+    supabase.table('experimentos').update({'cancelacion_solicitada': True}).eq('id', experimento_id).execute()
+    return resultado
+
+def _cancelacion_solicitada(experimento_id: str) -> bool:
+    response = supabase.table('experimentos').select('cancelacion_solicitada').eq('id', experimento_id).execute()
+    return bool(response.data and response.data[0].get('cancelacion_solicitada'))
+
+def _marcar_fallido(experimento_id: str, error: Exception):
+    # El proceso hijo murió sin poder guardar su propio error
+    print(f"🔥 El trabajo del experimento {experimento_id} terminó de forma inesperada: {error}")
+    supabase.table('experimentos').update({
+        'estado': 'error',
+        'metricas': json.dumps({'error': str(error)})
+    }).eq('id', experimento_id).execute()
+    canal_progreso.publicar(experimento_id, {'tipo': 'estado', 'estado': 'error', 'error': str(error)})
+
+# =============================================================================
+# Ejecución (corre dentro de un proceso del pool)
+# =============================================================================
+def ejecutar_entrenamiento(experimento_id: str, config: dict, poda=None, cancelacion=None, eventos=None):
+    # `poda` (opcional, en barridos) decide tras cada época evaluada si la red deja de entrenar
+    # La cancelación puede llegar por el evento del pool o, desde otro worker web, por la base de datos
+    cancelacion = CancelacionPersistente(cancelacion, lambda: _cancelacion_solicitada(experimento_id), Config.CANCELACION_CONSULTA_SEGUNDOS)
     # --- Inicialización de variables de experimento ---
-    experimento_id = str(uuid.uuid4())
-    estado_experimento = 'iniciando'
+    estado_experimento = 'entrenando'
     tipo_problema_detectado = 'indefinido'
+    progreso = ReportadorProgreso(experimento_id, eventos)
+    supabase.table('experimentos').update({'estado': estado_experimento}).eq('id', experimento_id).execute()
+    progreso.estado(estado_experimento)
 
     try:
+        verificar_cancelacion(cancelacion)  # cancelado desde otro worker mientras estaba en cola
+
         # --- 1. Preparación de Datos ---
+        progreso.fase('preparacion')
         start_time = time.time()
         dataset_id = config.get('dataset_id')
         tipo_modelo_usuario = config.get('tipo_modelo')
         columna_objetivo = config.get('columna_objetivo')
         print(f"🚀 Iniciando entrenamiento para: {dataset_id} con {tipo_modelo_usuario}")
 
-        df = obtener_dataframe_crudo(dataset_id)
-        for col in df.select_dtypes(include=np.number).columns:
-            if df[col].isnull().sum() > 0: df[col].fillna(df[col].mean(), inplace=True)
-        
-        columnas_categoricas = [col for col in df.columns if df[col].dtype == 'object' and col != columna_objetivo]
-        if columnas_categoricas: df = pd.get_dummies(df, columns=columnas_categoricas, drop_first=True)
-        
-        columnas_disponibles = [col for col in config['columnas_entrada'] if col in df.columns]
-        X = df[columnas_disponibles].apply(pd.to_numeric, errors='coerce').fillna(0)
-        y_raw = df[columna_objetivo]
-
-        # --- 2. Detección y Validación del Tipo de Problema ---
-        es_clasificacion = (pd.api.types.is_string_dtype(y_raw) or 
-                            pd.api.types.is_categorical_dtype(y_raw) or 
-                           (pd.api.types.is_integer_dtype(y_raw) and y_raw.nunique() <= 30))
-        
+        # Preparación (imputación, one-hot, split, escalado) desde el almacén de features:
+        # solo se calcula la primera vez para cada dataset + columnas + split + semilla
+        conjunto = feature_store.obtener(dataset_id, config['columnas_entrada'], columna_objetivo, config.get('validacion_split', 0.2),
+                                         semilla=semilla_de(config))
+        X_train_scaled, X_test_scaled = conjunto['X_train'], conjunto['X_test']
+        y_train, y_test = conjunto['y_train'], conjunto['y_test']
+        es_clasificacion, num_clases = conjunto['es_clasificacion'], conjunto['num_clases']
+        columnas_modelo, dummies_por_feature = conjunto['columnas'], conjunto['dummies_por_feature']
+
+        # --- 2. Validación del Tipo de Problema ---
         tipo_problema_detectado = "clasificacion" if es_clasificacion else "regresion"
         print(f"🧠 Tipo de problema detectado: {tipo_problema_detectado.upper()}")
 
         if tipo_modelo_usuario in ['clasificacion', 'regresion'] and tipo_modelo_usuario != tipo_problema_detectado:
             raise ValueError(f"Conflicto de tipos. Seleccionaste '{tipo_modelo_usuario}' pero la columna objetivo parece ser de '{tipo_problema_detectado}'.")
 
-        le = LabelEncoder()
-        if es_clasificacion:
-            y = pd.Series(le.fit_transform(y_raw.fillna(y_raw.mode()[0])), name=columna_objetivo)
-            if y.nunique() < 2:
-                raise ValueError(f"La columna objetivo '{columna_objetivo}' debe tener al menos 2 clases para clasificar.")
-        else:
-            y = pd.to_numeric(y_raw, errors='coerce').fillna(y_raw.mean())
-
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=config.get('validacion_split', 0.2), random_state=42, stratify=y if es_clasificacion else None)
-        scaler = StandardScaler(); X_train_scaled = scaler.fit_transform(X_train); X_test_scaled = scaler.transform(X_test)
+        verificar_cancelacion(cancelacion)
 
         # --- 3. Entrenamiento del Modelo ---
-        modelo_entrenado, predicciones, train_predicciones, metricas_por_epoca, tiempos_por_epoca = None, None, None, [], []
+        progreso.fase('entrenamiento')
+        modelo_entrenado, predicciones, train_predicciones, metricas_por_epoca, tiempos_por_epoca, mejores_metricas = None, None, None, [], [], None
+        epoca_poda = None
 
         if tipo_modelo_usuario == 'red_neuronal':
             print("-> Entrenando Red Neuronal (PyTorch)...")
-            X_train_t = torch.tensor(X_train_scaled, dtype=torch.float32); X_test_t = torch.tensor(X_test_scaled, dtype=torch.float32)
-            num_classes = y.nunique()
+            X_train_t = torch.from_numpy(X_train_scaled.astype(np.float32)); X_test_t = torch.from_numpy(X_test_scaled.astype(np.float32))
+            num_classes = num_clases
             
             y_train_torch = torch.tensor(y_train.values, dtype=torch.long)
             y_test_torch = torch.tensor(y_test.values, dtype=torch.long)
@@ -118,104 +202,88 @@ def iniciar_nuevo_entrenamiento(config: dict):
             modelo_entrenado = NeuralNet(X_train_t.shape[1], num_classes, is_regression=not es_clasificacion)
             criterion = nn.BCEWithLogitsLoss() if es_clasificacion and num_classes == 2 else nn.CrossEntropyLoss() if es_clasificacion else nn.MSELoss()
             optimizer = torch.optim.Adam(modelo_entrenado.parameters(), lr=config.get('tasa_aprendizaje', 0.001))
+
+            mejor_perdida = float('inf')
+            def al_terminar_epoca(numero_epoca, tiempo, metricas_epoca):
+                nonlocal mejor_perdida, epoca_poda
+                progreso.epoca(numero_epoca, tiempo, metricas_epoca)
+                if poda is None or metricas_epoca is None:
+                    return False
+                mejor_perdida = min(mejor_perdida, metricas_epoca['perdida_validacion'])
+                if poda.debe_podar(experimento_id, numero_epoca, mejor_perdida):
+                    epoca_poda = numero_epoca
+                    return True
+                return False
             
-            for epoch in range(config.get('epocas', 100)):
-                epoch_start_time = time.time()
-                modelo_entrenado.train()
-                outputs = modelo_entrenado(X_train_t); loss = criterion(outputs, y_train_t)
-                optimizer.zero_grad(); loss.backward(); optimizer.step()
-                
-                modelo_entrenado.eval()
-                with torch.no_grad():
-                    train_outputs = modelo_entrenado(X_train_t)
-                    train_loss = criterion(train_outputs, y_train_t)
-                    val_outputs = modelo_entrenado(X_test_t)
-                    val_loss = criterion(val_outputs, y_test_t)
-                    
-                    epoca_metrics = {
-                        'epoca': epoch + 1, 
-                        'perdida_validacion': float(val_loss.item()),
-                        'perdida_entrenamiento': float(train_loss.item())
-                    }
-                    
-                    if es_clasificacion:
-                        train_labels, val_labels = None, None
-                        if num_classes == 2:
-                            train_labels = (torch.sigmoid(train_outputs) > 0.5).long().flatten()
-                            val_labels = (torch.sigmoid(val_outputs) > 0.5).long().flatten()
-                        else:
-                            _, train_labels = torch.max(train_outputs.data, 1)
-                            _, val_labels = torch.max(val_outputs.data, 1)
-                        
-                        epoca_metrics['precision_entrenamiento'] = precision_score(y_train, train_labels.numpy(), average='weighted', zero_division=0)
-                        epoca_metrics['precision_validacion'] = precision_score(y_test, val_labels.numpy(), average='weighted', zero_division=0)
-                    
-                    metricas_por_epoca.append(epoca_metrics)
-                
-                epoch_end_time = time.time()
-                tiempos_por_epoca.append(epoch_end_time - epoch_start_time)
+            # Mini-lotes + parada temprana; el modelo vuelve con los pesos de la mejor época
+            metricas_por_epoca, tiempos_por_epoca, mejores_metricas = entrenar_red_neuronal(
+                modelo_entrenado, criterion, optimizer, X_train_t, y_train_t, X_test_t, y_test_t,
+                es_clasificacion,
+                tamano_lote=int(config.get('tamano_lote') or TAMANO_LOTE_POR_DEFECTO),
+                epocas=config.get('epocas', 100),
+                evaluar_cada=int(config.get('evaluar_cada') or EVALUAR_CADA_POR_DEFECTO),
+                paciencia=int(config.get('paciencia', PACIENCIA_POR_DEFECTO)),
+                cancelacion=cancelacion,
+                al_terminar_epoca=al_terminar_epoca,
+                semilla=semilla_de(config)
+            )
             
-            with torch.no_grad():
-                # Predicciones finales sobre el conjunto de test
-                final_outputs = modelo_entrenado(X_test_t)
-                if es_clasificacion:
-                    if num_classes == 2: predicciones = (torch.sigmoid(final_outputs) > 0.5).long().flatten().numpy()
-                    else: _, predicciones = torch.max(final_outputs.data, 1); predicciones = predicciones.numpy()
-                else: predicciones = final_outputs.numpy().flatten()
-                
-                # Predicciones finales sobre el conjunto de entrenamiento
-                final_train_outputs = modelo_entrenado(X_train_t)
-                if es_clasificacion:
-                    if num_classes == 2: train_predicciones = (torch.sigmoid(final_train_outputs) > 0.5).long().flatten().numpy()
-                    else: _, train_predicciones = torch.max(final_train_outputs.data, 1); train_predicciones = train_predicciones.numpy()
-                else: train_predicciones = final_train_outputs.numpy().flatten()
-        
-        elif tipo_modelo_usuario == 'clasificacion':
-            print("-> Entrenando Clasificación (Scikit-learn)...")
-            modelo_entrenado = LogisticRegression(max_iter=1000, multi_class='ovr').fit(X_train_scaled, y_train)
-            predicciones = modelo_entrenado.predict(X_test_scaled)
-            train_predicciones = modelo_entrenado.predict(X_train_scaled)
+            # Predicciones finales sobre test y entrenamiento
+            final_outputs = predecir(modelo_entrenado, X_test_t)
+            final_train_outputs = predecir(modelo_entrenado, X_train_t)
+            if es_clasificacion:
+                predicciones = salidas_a_etiquetas(final_outputs).numpy()
+                train_predicciones = salidas_a_etiquetas(final_train_outputs).numpy()
+            else:
+                predicciones = final_outputs.numpy().flatten()
+                train_predicciones = final_train_outputs.numpy().flatten()
         
-        elif tipo_modelo_usuario == 'regresion':
-            print("-> Entrenando Regresión (Scikit-learn)...")
-            modelo_entrenado = LinearRegression().fit(X_train_scaled, y_train)
+        elif tipo_modelo_usuario in ['clasificacion', 'regresion']:
+            algoritmo = algoritmo_de(config)
+            print(f"-> Entrenando {tipo_modelo_usuario.capitalize()} (Scikit-learn, {algoritmo})...")
+            modelo_previo = _modelo_a_continuar(config, columnas_modelo, conjunto['clases']) if config.get('continuar_desde') else None
+            modelo_entrenado = entrenar_estimador(config, X_train_scaled, y_train, modelo_previo)
             predicciones = modelo_entrenado.predict(X_test_scaled)
             train_predicciones = modelo_entrenado.predict(X_train_scaled)
 
         end_time = time.time()
+        verificar_cancelacion(cancelacion)
         
         # --- 4. CÁLCULO CONDICIONAL DE MÉTRICAS ---
+        progreso.fase('metricas')
         print("-> Calculando métricas y visualizaciones...")
         metricas = {}
         matriz_confusion, curva_roc, importancia_features, distribucion_errores, predicciones_vs_reales = None, None, None, None, None
+        resultados_completos = {}  # arrays a resolución completa, para Storage
 
         if predicciones is not None:
             if es_clasificacion:
+                matriz_test = MatrizConfusion.desde_etiquetas(y_test.values, predicciones, num_clases)
                 metricas = {
-                    'accuracy': accuracy_score(y_test, predicciones),
-                    'precision': precision_score(y_test, predicciones, average='weighted', zero_division=0),
-                    'recall': recall_score(y_test, predicciones, average='weighted', zero_division=0),
-                    'f1_score': f1_score(y_test, predicciones, average='weighted', zero_division=0),
+                    'accuracy': matriz_test.accuracy(),
+                    'precision': matriz_test.precision(),
+                    'recall': matriz_test.recall(),
+                    'f1_score': matriz_test.f1(),
                 }
                 
                 if train_predicciones is not None:
-                    metricas['precision_entrenamiento'] = precision_score(y_train, train_predicciones, average='weighted', zero_division=0)
+                    metricas['precision_entrenamiento'] = MatrizConfusion.desde_etiquetas(y_train.values, train_predicciones, num_clases).precision()
                 metricas['precision_validacion'] = metricas['precision']
 
-                matriz_confusion = confusion_matrix(y_test, predicciones).tolist()
+                matriz_confusion = matriz_test.como_lista()
                 
-                if y.nunique() == 2:
+                if num_clases == 2:
                     print("-> Problema binario detectado. Calculando curva ROC...")
                     pred_prob = None
                     if hasattr(modelo_entrenado, 'predict_proba'):
                         pred_prob = modelo_entrenado.predict_proba(X_test_scaled)[:, 1]
                     elif tipo_modelo_usuario == 'red_neuronal':
-                        with torch.no_grad():
-                            pred_prob = torch.sigmoid(modelo_entrenado(X_test_t)).numpy().flatten()
+                        pred_prob = torch.sigmoid(final_outputs).numpy().flatten()
                     
                     if pred_prob is not None:
                         fpr, tpr, _ = roc_curve(y_test, pred_prob)
-                        curva_roc = {'auc': roc_auc_score(y_test, pred_prob), 'fpr': fpr.tolist(), 'tpr': tpr.tolist()}
+                        curva_roc = {'auc': roc_auc_score(y_test, pred_prob), **reducir_curva_roc(fpr, tpr)}
+                        resultados_completos.update(fpr=fpr, tpr=tpr)
             else: # REGRESSION
                 mse_validacion = mean_squared_error(y_test, predicciones)
                 r2 = r2_score(y_test, predicciones)
@@ -232,12 +300,15 @@ def iniciar_nuevo_entrenamiento(config: dict):
                     'r2_score': r2,
                 }
                 
-                distribucion_errores = (y_test.values - predicciones).tolist()
-                predicciones_vs_reales = [{'real': float(r), 'prediccion': float(p)} for r, p in zip(y_test.values, predicciones)]
+                # En la fila solo van resúmenes de tamaño fijo; los arrays completos van a Storage
+                distribucion_errores = histograma_errores(y_test.values - predicciones)
+                predicciones_vs_reales = muestrear_predicciones(y_test.values, predicciones)
+                resultados_completos.update(reales=y_test.values, predicciones=predicciones)
 
         # --- Añadir/Sobrescribir métricas finales de la Red Neuronal ---
         if metricas_por_epoca:
-            last_epoch_metrics = metricas_por_epoca[-1]
+            # Tras la parada temprana el modelo tiene los pesos de la mejor época, no de la última
+            last_epoch_metrics = mejores_metricas or metricas_por_epoca[-1]
             metricas['perdida_final'] = last_epoch_metrics.get('perdida_validacion')
 
             if es_clasificacion:
@@ -251,40 +322,58 @@ def iniciar_nuevo_entrenamiento(config: dict):
                 metricas['mse_validacion'] = last_epoch_metrics.get('perdida_validacion')
                 metricas['mse'] = last_epoch_metrics.get('perdida_validacion')
 
+        if epoca_poda is not None:
+            metricas['epoca_poda'] = epoca_poda
+
+        verificar_cancelacion(cancelacion)
+        progreso.fase('importancia')
         print("-> Calculando importancia de features...")
         try:
             if tipo_modelo_usuario != 'red_neuronal':
-                imps = permutation_importance(modelo_entrenado, X_test_scaled, y_test, n_repeats=10, random_state=42, n_jobs=-1)
-                importancia_features = [{'feature': f, 'importancia': float(imp)} for f, imp in zip(X.columns, imps.importances_mean)]
+                predecir_importancia = modelo_entrenado.predict
             else:
-                def scoring_func(estimator, X_perm, y_perm):
-                    tensor_X = torch.tensor(X_perm, dtype=torch.float32)
-                    with torch.no_grad():
-                        preds = estimator(tensor_X)
-                        if es_clasificacion:
-                            if y.nunique() == 2: preds_labels = (torch.sigmoid(preds) > 0.5).long().flatten()
-                            else: _, preds_labels = torch.max(preds.data, 1)
-                            return accuracy_score(y_perm, preds_labels.numpy())
-                        else:
-                            return -mean_squared_error(y_perm, preds.numpy().flatten())
-                
-                imps = permutation_importance(modelo_entrenado, X_test_scaled, y_test.values, scoring=scoring_func, n_repeats=10, random_state=42, n_jobs=-1)
-                importancia_features = [{'feature': f, 'importancia': float(imp)} for f, imp in zip(X.columns, imps.importances_mean)]
-            
-            importancia_features.sort(key=lambda x: x['importancia'], reverse=True)
+                def predecir_importancia(X_perm):
+                    salidas = predecir(modelo_entrenado, torch.from_numpy(X_perm))
+                    return salidas_a_etiquetas(salidas).numpy() if es_clasificacion else salidas.numpy().flatten()
+
+            # Misma puntuación que antes: accuracy; en regresión R² (sklearn) o -MSE (red neuronal)
+            if es_clasificacion:
+                def puntuar(y_real, y_pred): return MatrizConfusion.desde_etiquetas(y_real, y_pred, num_clases).accuracy()
+            elif tipo_modelo_usuario != 'red_neuronal':
+                puntuar = r2_score
+            else:
+                def puntuar(y_real, y_pred): return -mean_squared_error(y_real, y_pred)
+
+            importancia_features = calcular_importancia(
+                predecir_importancia, puntuar, X_test_scaled, y_test.values,
+                agrupar_columnas(columnas_modelo, dummies_por_feature),
+                max_filas=config.get('importancia_max_filas'),
+                presupuesto_segundos=config.get('importancia_presupuesto_segundos')
+            )
         except Exception as imp_err:
             print(f"⚠️ No se pudo calcular la importancia de features: {imp_err}")
             importancia_features = None
 
-        # --- 5. Guardar el experimento completo ---
+        # --- 5. Guardar el modelo con su preprocesado (para /predecir) ---
+        try:
+            guardar_modelo(experimento_id, crear_artefacto(
+                tipo_modelo_usuario, tipo_problema_detectado, modelo_entrenado, config['columnas_entrada'],
+                conjunto['medias_numericas'], dummies_por_feature, columnas_modelo, conjunto['scaler'],
+                clases=conjunto['clases'], algoritmo=algoritmo_de(config) if tipo_modelo_usuario != 'red_neuronal' else None
+            ))
+        except Exception as modelo_err:
+            print(f"⚠️ No se pudo guardar el modelo entrenado: {modelo_err}")
+
+        if resultados_completos:
+            try:
+                guardar_resultados(experimento_id, **resultados_completos)
+            except Exception as resultados_err:
+                print(f"⚠️ No se pudieron guardar los resultados completos: {resultados_err}")
+
+        # --- 6. Guardar el experimento completo ---
         estado_experimento = 'completado'
-        nuevo_experimento = {
-            'id': experimento_id,
-            'nombre': f"Experimento_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-            'dataset_id': dataset_id,
-            'configuracion': json.dumps(config),
+        experimento_completado = {
             'estado': estado_experimento,
-            'fecha_creacion': datetime.utcnow().isoformat(),
             'tipo_problema': tipo_problema_detectado,
             'metricas': json.dumps({k: float(v) if v is not None else None for k, v in metricas.items()}),
             'metricas_por_epoca': json.dumps(metricas_por_epoca),
@@ -297,26 +386,26 @@ def iniciar_nuevo_entrenamiento(config: dict):
             'tiempo_total': end_time - start_time
         }
 
-        result = supabase.table('experimentos').insert(nuevo_experimento).execute()
+        result = supabase.table('experimentos').update(experimento_completado).eq('id', experimento_id).execute()
         if not result.data: raise Exception("No se pudo guardar el experimento en la base de datos.")
         
         print("🎉 Entrenamiento condicional completado y guardado correctamente.")
-        return result.data[0]
+        progreso.estado(estado_experimento)
+
+    except TrabajoCancelado:
+        print(f"🛑 Entrenamiento del experimento {experimento_id} cancelado.")
+        supabase.table('experimentos').update({'estado': 'cancelado'}).eq('id', experimento_id).execute()
+        progreso.estado('cancelado')
 
     except Exception as e:
         print(f"🔥🔥🔥 Error detallado en el servicio de entrenamiento: {e}")
         # Guardar experimento con estado de error
         estado_experimento = 'error'
         experimento_fallido = {
-            'id': experimento_id,
             'nombre': f"Experimento Fallido - {datetime.now().strftime('%Y-%m-%d %H:%M')}",
-            'dataset_id': config.get('dataset_id'),
-            'configuracion': json.dumps(config),
             'estado': estado_experimento,
-            'fecha_creacion': datetime.utcnow().isoformat(),
             'tipo_problema': tipo_problema_detectado,
             'metricas': json.dumps({'error': str(e)})
         }
-        supabase.table('experimentos').insert(experimento_fallido).execute()
-        raise e
-
+        supabase.table('experimentos').update(experimento_fallido).eq('id', experimento_id).execute()
+        progreso.estado(estado_experimento, error=str(e))
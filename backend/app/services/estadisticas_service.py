@@ -0,0 +1,61 @@
+# app/services/estadisticas_service.py
+
+import threading
+import time
+
+from app.config import Config
+from app.services.supabase_service import supabase
+
+# =============================================================================
+# Estadísticas del dashboard
+# =============================================================================
+# Se calculan con consultas agregadas en la base de datos (conteos con filtro y
+# la fecha más reciente con ORDER BY ... LIMIT 1), sin traer filas. El
+# resultado se guarda ESTADISTICAS_TTL_SEGUNDOS y se invalida al crear o borrar
+# experimentos y datasets en este proceso; los cambios de estado (que ocurren
+# en el pool) y los de otros workers se ven al caducar el TTL.
+
+_cache = {'valor': None, 'expira': 0.0}
+_lock = threading.Lock()
+
+
+def _contar(consulta) -> int:
+    # Con count='exact' PostgREST devuelve el total en la cabecera; basta una fila
+    respuesta = consulta.limit(1).execute()
+    return respuesta.count if respuesta.count is not None else 0
+
+
+def calcular_estadisticas(estados_terminales: list) -> dict:
+    total_datasets = _contar(supabase.table('datasets').select('id', count='exact'))
+    total_experimentos = _contar(supabase.table('experimentos').select('id', count='exact'))
+    experimentos_activos = _contar(
+        supabase.table('experimentos').select('id', count='exact').not_.in_('estado', estados_terminales)
+    )
+
+    ultimo = supabase.table('experimentos').select('fecha_creacion').order('fecha_creacion', desc=True).limit(1).execute()
+    # Fecha en formato ISO tal como está en la base de datos; el frontend la interpreta
+    ultimo_entrenamiento = ultimo.data[0]['fecha_creacion'] if ultimo.data else "N/A"
+
+    return {
+        'total_datasets': total_datasets,
+        'total_experimentos': total_experimentos,
+        'experimentos_activos': experimentos_activos,
+        'ultimo_entrenamiento': ultimo_entrenamiento
+    }
+
+
+def obtener_estadisticas(estados_terminales: list) -> dict:
+    with _lock:
+        if _cache['valor'] is not None and time.time() < _cache['expira']:
+            return _cache['valor']
+
+    estadisticas = calcular_estadisticas(estados_terminales)
+    with _lock:
+        _cache['valor'] = estadisticas
+        _cache['expira'] = time.time() + Config.ESTADISTICAS_TTL_SEGUNDOS
+    return estadisticas
+
+
+def invalidar_estadisticas():
+    with _lock:
+        _cache['valor'] = None
@@ -0,0 +1,155 @@
+# app/services/estimadores_service.py
+
+from sklearn.ensemble import (
+    HistGradientBoostingClassifier,
+    HistGradientBoostingRegressor,
+    RandomForestClassifier,
+    RandomForestRegressor,
+)
+from sklearn.linear_model import LinearRegression, LogisticRegression, SGDClassifier, SGDRegressor
+from threadpoolctl import threadpool_limits
+
+from app.config import Config
+
+# =============================================================================
+# Registro de estimadores de scikit-learn
+# =============================================================================
+# 'tipo_modelo' (clasificacion/regresion) elige la familia y 'algoritmo' el
+# estimador dentro de ella. Cada entrenamiento tiene un presupuesto de hilos
+# (Config.ENTRENAMIENTO_HILOS_POR_PROCESO, o menos si la configuración pide
+# 'n_jobs'): los estimadores que paralelizan con joblib lo reciben como
+# n_jobs y los que usan OpenMP/BLAS (gradient boosting, lbfgs) quedan
+# limitados con threadpoolctl, así el pool no deja sin CPU al proceso web.
+#
+# Hiperparámetros opcionales de la configuración: 'n_estimadores',
+# 'profundidad_maxima' y 'max_iteraciones'. 'semilla' (por defecto SEMILLA)
+# fija el random_state y también el split de las features.
+#
+# Los algoritmos con warm_start pueden continuar el modelo de un experimento
+# anterior ('continuar_desde'): los bosques añaden 'n_estimadores' árboles,
+# el gradient boosting 'max_iteraciones' iteraciones y los lineales parten
+# de los coeficientes anteriores.
+
+SEMILLA = 42
+
+
+def semilla_de(config: dict) -> int:
+    """Semilla del experimento: 'semilla' de la configuración o SEMILLA."""
+    semilla = config.get('semilla')
+    return SEMILLA if semilla is None else semilla
+
+
+def _logistica(config: dict, n_jobs: int):
+    # lbfgs ajusta un único modelo multinomial para todas las clases (no uno por clase)
+    return LogisticRegression(max_iter=config.get('max_iteraciones', 1000))
+
+
+def _sgd_logistica(config: dict, n_jobs: int):
+    # Con varias clases entrena un clasificador por clase, en paralelo con n_jobs
+    return SGDClassifier(loss='log_loss', max_iter=config.get('max_iteraciones', 1000), n_jobs=n_jobs, random_state=semilla_de(config))
+
+
+def _bosque_clasificacion(config: dict, n_jobs: int):
+    return RandomForestClassifier(n_estimators=config.get('n_estimadores', 100), max_depth=config.get('profundidad_maxima'),
+                                  n_jobs=n_jobs, random_state=semilla_de(config))
+
+
+def _boosting_clasificacion(config: dict, n_jobs: int):
+    return HistGradientBoostingClassifier(max_iter=config.get('max_iteraciones', 100), max_depth=config.get('profundidad_maxima'),
+                                          random_state=semilla_de(config))
+
+
+def _lineal(config: dict, n_jobs: int):
+    return LinearRegression(n_jobs=n_jobs)
+
+
+def _sgd_regresion(config: dict, n_jobs: int):
+    return SGDRegressor(max_iter=config.get('max_iteraciones', 1000), random_state=semilla_de(config))
+
+
+def _bosque_regresion(config: dict, n_jobs: int):
+    return RandomForestRegressor(n_estimators=config.get('n_estimadores', 100), max_depth=config.get('profundidad_maxima'),
+                                 n_jobs=n_jobs, random_state=semilla_de(config))
+
+
+def _boosting_regresion(config: dict, n_jobs: int):
+    return HistGradientBoostingRegressor(max_iter=config.get('max_iteraciones', 100), max_depth=config.get('profundidad_maxima'),
+                                         random_state=semilla_de(config))
+
+
+# tipo_modelo -> algoritmo -> (constructor, parámetro que crece al continuar o None, admite warm_start)
+ALGORITMOS = {
+    'clasificacion': {
+        'logistica': (_logistica, None, True),
+        'sgd_logistica': (_sgd_logistica, None, True),
+        'bosque_aleatorio': (_bosque_clasificacion, ('n_estimators', 'n_estimadores', 100), True),
+        'gradient_boosting': (_boosting_clasificacion, ('max_iter', 'max_iteraciones', 100), True),
+    },
+    'regresion': {
+        'lineal': (_lineal, None, False),
+        'sgd': (_sgd_regresion, None, True),
+        'bosque_aleatorio': (_bosque_regresion, ('n_estimators', 'n_estimadores', 100), True),
+        'gradient_boosting': (_boosting_regresion, ('max_iter', 'max_iteraciones', 100), True),
+    },
+}
+ALGORITMO_POR_DEFECTO = {'clasificacion': 'logistica', 'regresion': 'lineal'}
+HIPERPARAMETROS_ENTEROS = ['n_estimadores', 'profundidad_maxima', 'max_iteraciones', 'n_jobs']
+
+
+def algoritmo_de(config: dict) -> str:
+    return config.get('algoritmo') or ALGORITMO_POR_DEFECTO[config['tipo_modelo']]
+
+
+def validar_algoritmo(config: dict):
+    """Comprueba algoritmo e hiperparámetros de los modelos de sklearn (lanza ValueError)."""
+    tipo_modelo = config.get('tipo_modelo')
+    if tipo_modelo not in ALGORITMOS:
+        return
+    algoritmo = algoritmo_de(config)
+    if algoritmo not in ALGORITMOS[tipo_modelo]:
+        raise ValueError(f"Algoritmo '{algoritmo}' no disponible para {tipo_modelo}. Opciones: {list(ALGORITMOS[tipo_modelo])}")
+    for parametro in HIPERPARAMETROS_ENTEROS:
+        valor = config.get(parametro)
+        if valor is not None and (not isinstance(valor, int) or isinstance(valor, bool) or valor < 1):
+            raise ValueError(f"'{parametro}' debe ser un entero positivo.")
+    if config.get('continuar_desde') and not ALGORITMOS[tipo_modelo][algoritmo][2]:
+        raise ValueError(f"El algoritmo '{algoritmo}' no puede continuar un modelo anterior.")
+
+
+def presupuesto_hilos(config: dict) -> int:
+    """Hilos para este entrenamiento: lo pedido en 'n_jobs', sin pasar del presupuesto por proceso."""
+    return max(1, min(config.get('n_jobs') or Config.ENTRENAMIENTO_HILOS_POR_PROCESO, Config.ENTRENAMIENTO_HILOS_POR_PROCESO))
+
+
+def entrenar_estimador(config: dict, X, y, modelo_previo=None):
+    """Crea (o continúa, con warm_start) y ajusta el estimador dentro del presupuesto de hilos."""
+    n_jobs = presupuesto_hilos(config)
+    constructor, ampliable, _ = ALGORITMOS[config['tipo_modelo']][algoritmo_de(config)]
+    modelo = constructor(config, n_jobs)
+
+    if modelo_previo is not None:
+        if type(modelo_previo) is not type(modelo):
+            raise ValueError(f"El modelo a continuar es un {type(modelo_previo).__name__}, no un {type(modelo).__name__}.")
+        modelo = modelo_previo
+        parametros = {'warm_start': True}
+        if 'n_jobs' in modelo.get_params():
+            parametros['n_jobs'] = n_jobs
+        if ampliable:
+            parametro_sklearn, parametro_config, por_defecto = ampliable
+            parametros[parametro_sklearn] = modelo.get_params()[parametro_sklearn] + config.get(parametro_config, por_defecto)
+        modelo.set_params(**parametros)
+
+    with threadpool_limits(limits=n_jobs):
+        return modelo.fit(X, y)
+
+
+def listar_algoritmos() -> dict:
+    """{tipo_modelo: {'por_defecto': ..., 'algoritmos': [...], 'continuables': [...]}} para el frontend."""
+    return {
+        tipo: {
+            'por_defecto': ALGORITMO_POR_DEFECTO[tipo],
+            'algoritmos': list(algoritmos),
+            'continuables': [nombre for nombre, (_, _, warm) in algoritmos.items() if warm],
+        }
+        for tipo, algoritmos in ALGORITMOS.items()
+    }
@@ -0,0 +1,213 @@
+# app/services/features_service.py
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler, LabelEncoder
+
+from app.config import Config
+from app.services.analisis_service import obtener_dataframe_crudo, obtener_esquema
+
+# =============================================================================
+# Almacén de features preparadas
+# =============================================================================
+# La preparación de un experimento (imputación por media, one-hot de las
+# columnas categóricas elegidas, codificación del objetivo, split y
+# StandardScaler) solo depende del dataset, las columnas, el split y la
+# semilla. Su resultado se guarda como artefacto (joblib) bajo esa clave, en
+# memoria y en disco, así que los experimentos que solo cambian el modelo o
+# sus hiperparámetros pasan directamente al entrenamiento. El disco se
+# comparte entre los procesos del pool de entrenamientos. Los datasets no
+# cambian tras subirse (limpiar uno crea otro), así que solo hay que invalidar
+# al eliminarlos: la clave empieza por un hash del dataset_id para encontrar sus
+# artefactos. La memoria de los procesos del pool no se toca; lo de un dataset
+# eliminado ya no se pide y sale de su LRU.
+
+VERSION_FEATURES = 1
+
+
+def _prefijo_dataset(dataset_id: str) -> str:
+    # Hash y no el id tal cual: la clave acaba en un nombre de archivo
+    return hashlib.sha1(str(dataset_id).encode("utf-8")).hexdigest()[:16] + "_"
+
+
+def clave_features(dataset_id: str, columnas_entrada: list, columna_objetivo: str, validacion_split: float, semilla: int) -> str:
+    datos = [VERSION_FEATURES, str(dataset_id), list(columnas_entrada), columna_objetivo, float(validacion_split), int(semilla)]
+    return _prefijo_dataset(dataset_id) + hashlib.sha1(json.dumps(datos).encode("utf-8")).hexdigest()
+
+
+def preparar_conjunto(dataset_id: str, columnas_entrada: list, columna_objetivo: str, validacion_split: float, semilla: int) -> dict:
+    """Lee solo las columnas del experimento y devuelve el conjunto listo para entrenar."""
+    # Copia: el DataFrame de la caché de datasets es compartido
+    columnas_necesarias = [c for c in obtener_esquema(dataset_id).names if c in columnas_entrada or c == columna_objetivo]
+    df = obtener_dataframe_crudo(dataset_id, columnas_necesarias).copy()
+    medias_numericas = {}
+    for col in df.select_dtypes(include=np.number).columns:
+        medias_numericas[col] = df[col].mean()
+        if df[col].isnull().sum() > 0: df[col] = df[col].fillna(medias_numericas[col])
+
+    # One-hot solo de las columnas de entrada categóricas, recordando qué dummies salen de cada una
+    columnas_categoricas = [col for col in df.columns if col in columnas_entrada and
+                            (df[col].dtype == 'object' or isinstance(df[col].dtype, pd.CategoricalDtype))]
+    bloques_dummies = {col: pd.get_dummies(df[col], prefix=col, drop_first=True) for col in columnas_categoricas}
+    dummies_por_feature = {col: list(bloque.columns) for col, bloque in bloques_dummies.items()}
+    if bloques_dummies: df = pd.concat([df.drop(columns=columnas_categoricas), *bloques_dummies.values()], axis=1)
+
+    columnas_disponibles = []
+    for col in columnas_entrada:
+        columnas_disponibles += dummies_por_feature.get(col, [col] if col in df.columns else [])
+    X = df[columnas_disponibles].apply(pd.to_numeric, errors='coerce').fillna(0)
+    y_raw = df[columna_objetivo]
+
+    # --- Detección del Tipo de Problema ---
+    es_clasificacion = (pd.api.types.is_string_dtype(y_raw) or
+                        pd.api.types.is_categorical_dtype(y_raw) or
+                       (pd.api.types.is_integer_dtype(y_raw) and y_raw.nunique() <= 30))
+
+    le = LabelEncoder()
+    if es_clasificacion:
+        y = pd.Series(le.fit_transform(y_raw.fillna(y_raw.mode()[0])), name=columna_objetivo)
+        if y.nunique() < 2:
+            raise ValueError(f"La columna objetivo '{columna_objetivo}' debe tener al menos 2 clases para clasificar.")
+    else:
+        y = pd.to_numeric(y_raw, errors='coerce').fillna(y_raw.mean())
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=validacion_split, random_state=semilla, stratify=y if es_clasificacion else None)
+    scaler = StandardScaler(); X_train_scaled = scaler.fit_transform(X_train); X_test_scaled = scaler.transform(X_test)
+
+    return {
+        'columnas': list(X.columns),
+        'X_train': X_train_scaled, 'X_test': X_test_scaled,
+        'y_train': y_train, 'y_test': y_test,
+        'es_clasificacion': es_clasificacion,
+        'num_clases': int(y.nunique()),
+        'clases': le.classes_.tolist() if es_clasificacion else None,
+        'scaler': scaler,
+        'medias_numericas': {col: media for col, media in medias_numericas.items() if col != columna_objetivo},
+        'dummies_por_feature': dummies_por_feature,
+    }
+
+
+class FeatureStore:
+    def __init__(self, directorio: str, max_memoria: int, max_bytes_disco: int):
+        self.directorio = directorio
+        self.max_memoria = max_memoria
+        self.max_bytes_disco = max_bytes_disco
+        os.makedirs(directorio, exist_ok=True)
+        self._memoria = OrderedDict()  # clave -> conjunto
+        self._lock = threading.Lock()
+        self._locks_carga = {}
+
+    def obtener(self, dataset_id: str, columnas_entrada: list, columna_objetivo: str,
+                validacion_split: float = 0.2, semilla: int = 42) -> dict:
+        """
+        Devuelve el conjunto preparado (memoria -> disco -> se calcula). Es
+        compartido: quien lo use no debe modificar sus arrays in-place.
+        """
+        clave = clave_features(dataset_id, columnas_entrada, columna_objetivo, validacion_split, semilla)
+        with self._lock:
+            if clave in self._memoria:
+                self._memoria.move_to_end(clave)
+                return self._memoria[clave]
+            lock_carga = self._locks_carga.setdefault(clave, threading.Lock())
+
+        with lock_carga:
+            with self._lock:
+                if clave in self._memoria:
+                    return self._memoria[clave]
+
+            ruta = self._ruta(clave)
+            conjunto = self._leer_disco(ruta)
+            if conjunto is None:
+                print(f"-> Preparando features (clave {clave[-8:]})...")
+                conjunto = preparar_conjunto(dataset_id, columnas_entrada, columna_objetivo, validacion_split, semilla)
+                self._escribir_disco(ruta, conjunto)
+            else:
+                print(f"-> Features reutilizadas del almacén (clave {clave[-8:]}).")
+
+            with self._lock:
+                self._memoria[clave] = conjunto
+                while len(self._memoria) > self.max_memoria:
+                    self._memoria.popitem(last=False)
+            return conjunto
+
+    def invalidar(self, dataset_id: str):
+        """Quita de memoria y de disco los conjuntos preparados de un dataset."""
+        prefijo = _prefijo_dataset(dataset_id)
+        with self._lock:
+            for clave in [c for c in self._memoria if c.startswith(prefijo)]:
+                del self._memoria[clave]
+                self._locks_carga.pop(clave, None)
+        for nombre in os.listdir(self.directorio):
+            if nombre.startswith(prefijo) and nombre.endswith(".joblib"):
+                try:
+                    os.remove(os.path.join(self.directorio, nombre))
+                except FileNotFoundError:
+                    pass
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, f"{clave}.joblib")
+
+    def _leer_disco(self, ruta: str):
+        try:
+            conjunto = joblib.load(ruta)
+            os.utime(ruta)  # Marca de acceso para el LRU en disco
+            return conjunto
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Artefacto de features ilegible, se regenera: {e}")
+            return None
+
+    def _escribir_disco(self, ruta: str, conjunto: dict):
+        fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+        os.close(fd)
+        try:
+            joblib.dump(conjunto, temporal)
+            os.replace(temporal, ruta)
+        except Exception as e:
+            # El almacén es una optimización: si no se puede escribir, se sigue sin él
+            print(f"⚠️ No se pudo guardar el artefacto de features: {e}")
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            return
+        self._evictar_disco(proteger=ruta)
+
+    def _evictar_disco(self, proteger: str):
+        archivos = []
+        for nombre in os.listdir(self.directorio):
+            if not nombre.endswith(".joblib"):
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                info = os.stat(ruta)
+            except FileNotFoundError:
+                continue
+            archivos.append((info.st_mtime, info.st_size, ruta))
+
+        total = sum(tamano for _, tamano, _ in archivos)
+        for _, tamano, ruta in sorted(archivos):
+            if total <= self.max_bytes_disco:
+                break
+            if ruta == proteger:
+                continue
+            try:
+                os.remove(ruta)
+                total -= tamano
+            except FileNotFoundError:
+                pass
+
+
+feature_store = FeatureStore(
+    os.path.join(Config.DATASET_CACHE_DIR, "features"),
+    max_memoria=Config.FEATURES_CACHE_MEMORIA,
+    max_bytes_disco=Config.FEATURES_CACHE_DISCO_MB * 1024 * 1024,
+)
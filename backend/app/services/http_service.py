@@ -0,0 +1,104 @@
+# app/services/http_service.py
+
+import hashlib
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.config import Config
+
+# =============================================================================
+# Capa de E/S HTTP compartida
+# =============================================================================
+# Todas las descargas pasan por aquí: una sesión por hilo (requests.Session no
+# es segura entre hilos) con su pool de conexiones keep-alive, timeouts
+# acotados y reintentos con backoff exponencial ante errores transitorios.
+# Las descargas van directas a disco por bloques, nunca a `resp.content`.
+
+ESTADOS_REINTENTABLES = (429, 500, 502, 503, 504)
+TAMANO_BLOQUE = 1024 * 1024
+
+# Cabeceras que se pasan tal cual entre el cliente y Storage al hacer de proxy
+CABECERAS_PETICION_PROXY = ("Range", "If-Range", "If-None-Match", "If-Modified-Since")
+CABECERAS_RESPUESTA_PROXY = ("Content-Length", "Content-Range", "Accept-Ranges", "ETag", "Last-Modified")
+
+_local = threading.local()
+
+
+def crear_sesion() -> requests.Session:
+    reintentos = Retry(
+        total=Config.HTTP_REINTENTOS,
+        backoff_factor=Config.HTTP_BACKOFF_SEGUNDOS,
+        status_forcelist=ESTADOS_REINTENTABLES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    adaptador = HTTPAdapter(max_retries=reintentos, pool_connections=Config.HTTP_POOL_HOSTS, pool_maxsize=Config.HTTP_POOL_CONEXIONES)
+    sesion = requests.Session()
+    sesion.mount("http://", adaptador)
+    sesion.mount("https://", adaptador)
+    return sesion
+
+
+def obtener_sesion() -> requests.Session:
+    """Sesión del hilo actual; se crea la primera vez y se reutiliza después."""
+    sesion = getattr(_local, "sesion", None)
+    if sesion is None:
+        sesion = _local.sesion = crear_sesion()
+    return sesion
+
+
+def timeout() -> tuple:
+    return (Config.HTTP_TIMEOUT_CONEXION, Config.HTTP_TIMEOUT_LECTURA)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    kwargs.setdefault("timeout", timeout())
+    return obtener_sesion().get(url, **kwargs)
+
+
+def descargar_a_archivo(url: str, ruta_destino: str) -> str:
+    """
+    Descarga `url` en `ruta_destino` por bloques y devuelve el SHA-256 del
+    contenido. Los reintentos de urllib3 cubren la conexión y los códigos de
+    estado; si la conexión se corta a mitad del cuerpo, se reintenta la
+    descarga completa con backoff.
+    """
+    intento = 0
+    while True:
+        sha = hashlib.sha256()
+        try:
+            with open(ruta_destino, "wb") as destino, get(url, stream=True) as resp:
+                resp.raise_for_status()
+                for bloque in resp.iter_content(chunk_size=TAMANO_BLOQUE):
+                    sha.update(bloque)
+                    destino.write(bloque)
+            return sha.hexdigest()
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.exceptions.Timeout):
+            intento += 1
+            if intento > Config.HTTP_REINTENTOS:
+                raise
+            time.sleep(Config.HTTP_BACKOFF_SEGUNDOS * (2 ** (intento - 1)))
+
+
+def abrir_proxy(url: str, cabeceras_cliente) -> requests.Response:
+    """
+    GET en streaming de `url` reenviando las cabeceras de rango y condicionales
+    del cliente, para que Storage responda 206/304/416 directamente. Se pide sin
+    compresión: así Content-Length y Content-Range valen para los bytes que se
+    reenvían. La respuesta debe cerrarse (lo hace `iterar_bloques`).
+    """
+    cabeceras = {nombre: cabeceras_cliente[nombre] for nombre in CABECERAS_PETICION_PROXY if nombre in cabeceras_cliente}
+    cabeceras["Accept-Encoding"] = "identity"
+    return get(url, headers=cabeceras, stream=True)
+
+
+def iterar_bloques(resp: requests.Response):
+    """Generador con el cuerpo de la respuesta en bloques de TAMANO_BLOQUE; la cierra al terminar."""
+    try:
+        yield from resp.iter_content(chunk_size=TAMANO_BLOQUE)
+    finally:
+        resp.close()
@@ -0,0 +1,95 @@
+# app/services/importancia_service.py
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.config import Config
+
+# =============================================================================
+# Importancia de features por permutación
+# =============================================================================
+# Sustituye a sklearn.inspection.permutation_importance:
+#   - Se trabaja sobre una muestra de filas del conjunto de test.
+#   - Las columnas dummy de un one-hot se permutan juntas y cuentan como su
+#     feature original.
+#   - Las repeticiones de una feature se apilan en un solo array y se predicen
+#     en una sola llamada (un solo forward de la red neuronal).
+#   - Las features se reparten entre un número acotado de hilos (NumPy y Torch
+#     sueltan el GIL) y hay un presupuesto de tiempo: las que no empiezan antes
+#     de agotarlo se omiten.
+
+
+def calcular_importancia(predecir, puntuar, X, y, grupos: dict, n_repeticiones: int = None,
+                         max_filas: int = None, presupuesto_segundos: float = None,
+                         max_hilos: int = None, semilla: int = 42) -> list:
+    """
+    `predecir(X) -> predicciones` y `puntuar(y_real, y_pred) -> float` (mayor es
+    mejor). `grupos` asigna a cada feature original los índices de sus columnas
+    en X. Devuelve [{'feature', 'importancia'}] ordenado de mayor a menor.
+    """
+    n_repeticiones = n_repeticiones or Config.IMPORTANCIA_REPETICIONES
+    max_filas = max_filas or Config.IMPORTANCIA_MAX_FILAS
+    presupuesto_segundos = presupuesto_segundos or Config.IMPORTANCIA_PRESUPUESTO_SEGUNDOS
+    max_hilos = max_hilos or Config.IMPORTANCIA_MAX_HILOS
+
+    rng = np.random.default_rng(semilla)
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    if len(X) > max_filas:
+        filas = rng.choice(len(X), size=max_filas, replace=False)
+        X, y = X[filas], y[filas]
+    n = len(X)
+
+    puntuacion_base = puntuar(y, predecir(X))
+    y_repetida = np.tile(y, n_repeticiones)
+    limite = time.time() + presupuesto_segundos
+    # Una semilla por feature: el resultado no depende del orden de los hilos
+    semillas = dict(zip(grupos, rng.integers(0, 2**32 - 1, size=len(grupos))))
+
+    def importancia_de(feature):
+        if time.time() > limite:
+            return feature, None
+        rng_feature = np.random.default_rng(semillas[feature])
+        columnas = grupos[feature]
+        apilado = np.tile(X, (n_repeticiones, 1))
+        for r in range(n_repeticiones):
+            orden = rng_feature.permutation(n)
+            bloque = slice(r * n, (r + 1) * n)
+            apilado[bloque, columnas] = X[np.ix_(orden, columnas)]
+        predicciones = np.asarray(predecir(apilado))
+        puntuaciones = [
+            puntuar(y_repetida[r * n:(r + 1) * n], predicciones[r * n:(r + 1) * n])
+            for r in range(n_repeticiones)
+        ]
+        return feature, float(puntuacion_base - np.mean(puntuaciones))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_hilos)) as executor:
+        resultados = list(executor.map(importancia_de, grupos))
+
+    omitidas = [f for f, imp in resultados if imp is None]
+    if omitidas:
+        print(f"⚠️ Presupuesto de importancia agotado: se omiten {len(omitidas)} features.")
+
+    importancia = [{'feature': f, 'importancia': imp} for f, imp in resultados if imp is not None]
+    importancia.sort(key=lambda x: x['importancia'], reverse=True)
+    return importancia
+
+
+def agrupar_columnas(columnas: list, dummies_por_feature: dict) -> dict:
+    """
+    Índices de columna de cada feature original. `dummies_por_feature` asigna
+    a cada columna categórica sus columnas dummy; el resto son una columna cada una.
+    """
+    posicion = {col: i for i, col in enumerate(columnas)}
+    grupos, agrupadas = {}, set()
+    for feature, dummies in dummies_por_feature.items():
+        indices = [posicion[d] for d in dummies if d in posicion]
+        if indices:
+            grupos[feature] = indices
+            agrupadas.update(dummies)
+    for col in columnas:
+        if col not in agrupadas:
+            grupos[col] = [posicion[col]]
+    return grupos
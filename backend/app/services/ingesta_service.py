@@ -0,0 +1,76 @@
+# app/services/ingesta_service.py
+
+import os
+import tempfile
+
+from app.config import Config
+from app.services import http_service
+from app.services.perfil_service import MODOS_PERFIL, calcular_perfil_archivo
+from app.services.supabase_service import supabase
+from app.utils.file_utils import (
+    BUCKET_DATASETS,
+    csv_a_parquet,
+    inferir_esquema_compacto,
+    ruta_en_storage,
+    url_columnar,
+)
+
+# =============================================================================
+# Ingesta de un CSV recién subido
+# =============================================================================
+# Nada del archivo pasa entero por memoria:
+#   1. La descarga va a disco por bloques.
+#   2. El CSV se convierte a Parquet bloque a bloque; de esa pasada salen el
+#      número de filas y columnas y la validación de estructura y codificación.
+#   3. El perfil se calcula sobre el Parquet en el modo pedido o, si no se
+#      pide ninguno, en Config.PERFIL_MODO. Con 'auto' es exacto por debajo de
+#      Config.PERFIL_FILAS_APROXIMADO filas y aproximado (por bloques, con
+#      sketches) a partir de ahí, así que solo los archivos grandes se perfilan
+#      sin cargarlos enteros.
+# El Parquet se sube a Storage junto al original y se devuelve su ruta local
+# para precargar la caché.
+
+
+def ingerir_csv(archivo_url: str, modo_perfil: str = None) -> dict:
+    """
+    Devuelve {'filas', 'columnas', 'perfil', 'ruta_parquet'}; 'ruta_parquet'
+    es None si no se pudo subir la versión columnar. Lanza ValueError si el archivo no es un CSV válido o el modo de
+    perfil no existe.
+    """
+    if modo_perfil is not None and modo_perfil not in MODOS_PERFIL:
+        raise ValueError(f"Modo de perfil no válido: '{modo_perfil}'. Usa uno de {list(MODOS_PERFIL)}")
+    fd, ruta_csv = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    fd, ruta_parquet = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    try:
+        try:
+            http_service.descargar_a_archivo(archivo_url, ruta_csv)  # Lanza un error si la descarga falla
+            filas, columnas = csv_a_parquet(ruta_csv, ruta_parquet)
+        finally:
+            os.remove(ruta_csv)
+
+        esquema = inferir_esquema_compacto(ruta_parquet, Config.ESQUEMA_MAX_PROPORCION_CATEGORIAS)
+        perfil = calcular_perfil_archivo(ruta_parquet, esquema, modo_perfil or Config.PERFIL_MODO)
+    except Exception:
+        os.remove(ruta_parquet)
+        raise
+
+    if not subir_version_columnar(ruta_parquet, archivo_url):
+        os.remove(ruta_parquet)
+        ruta_parquet = None
+    return {"filas": filas, "columnas": columnas, "perfil": perfil, "ruta_parquet": ruta_parquet}
+
+
+def subir_version_columnar(ruta_parquet: str, archivo_url: str) -> bool:
+    """
+    Sube el Parquet a Storage junto al archivo original. Un fallo aquí no
+    impide registrar el dataset: la caché convertirá el CSV cuando se lea.
+    """
+    try:
+        ruta_destino = ruta_en_storage(url_columnar(archivo_url))
+        supabase.storage.from_(BUCKET_DATASETS).upload(ruta_destino, ruta_parquet)
+        return True
+    except Exception as e:
+        print(f"⚠️ No se pudo subir la versión columnar de {archivo_url}: {e}")
+        return False
@@ -1,83 +1,445 @@
 # app/services/limpieza_service.py
 
+import os
+import tempfile
 import pandas as pd
 import numpy as np # Import numpy for NaN
-from io import BytesIO
+import pyarrow as pa
+import pyarrow.parquet as pq
+from app.config import Config
 from app.services.supabase_service import supabase
-from app.services.analisis_service import obtener_dataframe_crudo
+from app.services.cache_service import dataset_cache
+from app.services.analisis_service import obtener_archivo_url
+from app.services.estadisticas_service import invalidar_estadisticas
+from app.services.perfil_service import calcular_perfil_archivo, serializar_perfil
+from app.utils.file_utils import (
+    BUCKET_DATASETS,
+    EXTENSION_COLUMNAR,
+    FILAS_POR_GRUPO,
+    inferir_esquema_compacto,
+    leer_esquema,
+    leer_parquet_en_bloques,
+)
+from app.utils.sketch_utils import TDigest
 from datetime import datetime
 
+# =============================================================================
+# Limpieza por bloques con un pipeline de operaciones
+# =============================================================================
+# El dataset se recorre bloque a bloque desde su Parquet local y el resultado
+# se escribe bloque a bloque en otro Parquet en disco, así la memoria no
+# depende del tamaño del archivo.
+#
+# Las operaciones se aplican en el orden pedido y todas en la misma pasada.
+# Las que necesitan estadísticas globales (imputar, recortar atípicos) las
+# acumulan antes en pasadas por bloques que leen solo sus columnas: una por
+# etapa, donde una etapa agrupa las operaciones cuyas columnas no dependen de
+# otra operación con estadísticas aún sin calcular (normalmente basta una).
+# Esas estadísticas se toman sobre la columna completa, con las
+# transformaciones de celda previas (strip, conversión de tipo...) aplicadas
+# pero sin las eliminaciones de filas. La media es exacta (suma y conteo), la
+# moda también (conteo por valor); medianas y cuartiles salen de un t-digest.
+#
+# Ejemplo de `operaciones`:
+#   {"pipeline": [
+#       {"op": "strip"},
+#       {"op": "convertir_tipo", "columnas": ["edad"], "tipo": "numerico"},
+#       {"op": "imputar", "columnas": ["edad"], "estrategia": "mediana"},
+#       {"op": "recortar_atipicos", "columnas": ["edad"], "factor": 1.5},
+#       {"op": "eliminar_nulos"},
+#       {"op": "eliminar_duplicados"}
+#   ]}
+# Los flags antiguos ({"eliminar_duplicados": true, "eliminar_nulos": true})
+# se traducen a strip -> eliminar_duplicados -> eliminar_nulos.
+
+
+def _celdas_distintas(antes: pd.Series, despues: pd.Series) -> int:
+    """Cuenta las celdas cuyo valor cambió (dos nulos cuentan como iguales)."""
+    iguales = (antes == despues) | (antes.isna() & despues.isna())
+    return int((~iguales).sum())
+
+
+class Operacion:
+    """
+    Operación del pipeline. Las de celda implementan `transformar_columna`;
+    las de filas implementan `filtrar`. Cada una lleva la cuenta exacta de
+    filas eliminadas y celdas modificadas.
+    """
+    nombre = None
+    es_de_celda = True
+    requiere_estadisticas = False
+
+    def __init__(self, columnas: list = None, **parametros):
+        self.columnas = columnas
+        self.parametros = parametros
+        self.filas_eliminadas = 0
+        self.celdas_modificadas = 0
+
+    def columnas_de(self, esquema: pa.Schema) -> list:
+        return [c for c in (self.columnas or esquema.names) if c in esquema.names]
+
+    def tipo_salida(self, campo: pa.Field):
+        """Tipo Arrow de la columna tras la operación (None = sin cambios)."""
+        return None
+
+    def acumular(self, columna: str, serie: pd.Series):
+        """Recibe la columna bloque a bloque (solo si requiere_estadisticas)."""
+        pass
+
+    def finalizar(self):
+        """Calcula las estadísticas con lo acumulado, antes de la pasada de limpieza."""
+        pass
+
+    def transformar_columna(self, columna: str, serie: pd.Series) -> pd.Series:
+        return serie
+
+    def filtrar(self, bloque: pd.DataFrame, columnas: list) -> pd.DataFrame:
+        return bloque
+
+    def aplicar(self, bloque: pd.DataFrame, columnas: list) -> pd.DataFrame:
+        if not self.es_de_celda:
+            filas_antes = len(bloque)
+            bloque = self.filtrar(bloque, columnas)
+            self.filas_eliminadas += filas_antes - len(bloque)
+            return bloque
+        for col in columnas:
+            nueva = self.transformar_columna(col, bloque[col])
+            self.celdas_modificadas += _celdas_distintas(bloque[col], nueva)
+            bloque[col] = nueva
+        return bloque
+
+    def resumen(self) -> dict:
+        return {
+            "op": self.nombre,
+            "columnas": self.columnas,
+            "filas_eliminadas": self.filas_eliminadas,
+            "celdas_modificadas": self.celdas_modificadas,
+        }
+
+
+class QuitarEspacios(Operacion):
+    """Recorta espacios en las celdas de texto; las que quedan vacías pasan a NaN."""
+    nombre = "strip"
+
+    def columnas_de(self, esquema):
+        return [c for c in super().columnas_de(esquema)
+                if pa.types.is_string(esquema.field(c).type) or pa.types.is_large_string(esquema.field(c).type)]
+
+    def transformar_columna(self, columna, serie):
+        serie = serie.str.strip()
+        return serie.mask(serie == '', np.nan)
+
+
+class ConvertirTipo(Operacion):
+    """Convierte columnas a 'numerico', 'texto' o 'fecha'; lo que no se puede convertir queda nulo."""
+    nombre = "convertir_tipo"
+    TIPOS = {"numerico": pa.float64(), "texto": pa.string(), "fecha": pa.timestamp("ns")}
+
+    def __init__(self, columnas=None, tipo="numerico", **parametros):
+        if tipo not in self.TIPOS:
+            raise ValueError(f"Tipo de conversión no soportado: '{tipo}'. Usa uno de {list(self.TIPOS)}.")
+        super().__init__(columnas, tipo=tipo, **parametros)
+        self.tipo = tipo
+
+    def tipo_salida(self, campo):
+        return self.TIPOS[self.tipo]
+
+    def transformar_columna(self, columna, serie):
+        if self.tipo == "numerico":
+            return pd.to_numeric(serie, errors="coerce").astype("float64")
+        if self.tipo == "fecha":
+            return pd.to_datetime(serie, errors="coerce")
+        return serie.where(serie.isna(), serie.astype(str))
+
+
+class Imputar(Operacion):
+    """Rellena nulos con la media, la mediana o la moda de la columna."""
+    nombre = "imputar"
+    requiere_estadisticas = True
+    ESTRATEGIAS = ("media", "mediana", "moda")
+
+    def __init__(self, columnas=None, estrategia="media", **parametros):
+        if estrategia not in self.ESTRATEGIAS:
+            raise ValueError(f"Estrategia de imputación no soportada: '{estrategia}'. Usa una de {list(self.ESTRATEGIAS)}.")
+        super().__init__(columnas, estrategia=estrategia, **parametros)
+        self.estrategia = estrategia
+        self.acumulados = {}
+        self.valores = {}
+
+    def columnas_de(self, esquema):
+        columnas = super().columnas_de(esquema)
+        if self.estrategia == "moda":
+            return columnas
+        return [c for c in columnas if pa.types.is_integer(esquema.field(c).type) or pa.types.is_floating(esquema.field(c).type)]
+
+    def tipo_salida(self, campo):
+        # La media o la mediana de una columna entera no tiene por qué ser entera
+        return pa.float64() if self.estrategia != "moda" else None
+
+    def acumular(self, columna, serie):
+        serie = serie.dropna()
+        if self.estrategia == "media":
+            suma, cuenta = self.acumulados.get(columna, (0.0, 0))
+            self.acumulados[columna] = (suma + float(serie.sum()), cuenta + len(serie))
+        elif self.estrategia == "mediana":
+            self.acumulados.setdefault(columna, TDigest(Config.LIMPIEZA_TDIGEST_COMPRESION)).actualizar(serie.to_numpy(dtype=np.float64))
+        else:
+            conteos = self.acumulados.get(columna, pd.Series(dtype=np.int64))
+            self.acumulados[columna] = conteos.add(serie.astype(object).value_counts(), fill_value=0)
+
+    def finalizar(self):
+        for columna, acumulado in self.acumulados.items():
+            if self.estrategia == "media":
+                suma, cuenta = acumulado
+                valor = suma / cuenta if cuenta else np.nan
+            elif self.estrategia == "mediana":
+                valor = acumulado.cuantil(0.5)
+            elif len(acumulado):
+                # Como Series.mode(): con empate, el menor de los más frecuentes
+                candidatos = acumulado[acumulado == acumulado.max()].index
+                valor = pd.Series(candidatos).sort_values().iloc[0]
+            else:
+                valor = np.nan
+            self.valores[columna] = valor
+        self.acumulados = {}
+
+    def transformar_columna(self, columna, serie):
+        valor = self.valores.get(columna)
+        if valor is None or pd.isna(valor):
+            return serie
+        if self.estrategia != "moda":
+            serie = serie.astype("float64")
+        return serie.fillna(valor)
+
+
+class RecortarAtipicos(Operacion):
+    """Recorta los valores fuera de [Q1 - factor·IQR, Q3 + factor·IQR]."""
+    nombre = "recortar_atipicos"
+    requiere_estadisticas = True
+
+    def __init__(self, columnas=None, factor=1.5, **parametros):
+        super().__init__(columnas, factor=factor, **parametros)
+        self.factor = float(factor)
+        self.digests = {}
+        self.limites = {}
+
+    def columnas_de(self, esquema):
+        return [c for c in super().columnas_de(esquema)
+                if pa.types.is_integer(esquema.field(c).type) or pa.types.is_floating(esquema.field(c).type)]
+
+    def tipo_salida(self, campo):
+        return pa.float64()
+
+    def acumular(self, columna, serie):
+        self.digests.setdefault(columna, TDigest(Config.LIMPIEZA_TDIGEST_COMPRESION)).actualizar(serie.to_numpy(dtype=np.float64))
+
+    def finalizar(self):
+        for columna, digest in self.digests.items():
+            q1, q3 = digest.cuantil(0.25), digest.cuantil(0.75)
+            if q1 is None:
+                continue
+            iqr = q3 - q1
+            self.limites[columna] = (q1 - self.factor * iqr, q3 + self.factor * iqr)
+        self.digests = {}
+
+    def transformar_columna(self, columna, serie):
+        inferior, superior = self.limites.get(columna, (np.nan, np.nan))
+        if pd.isna(inferior) or pd.isna(superior):
+            return serie
+        return serie.astype("float64").clip(lower=inferior, upper=superior)
+
+
+class EliminarNulos(Operacion):
+    """Elimina las filas con algún nulo (en `columnas`, o en cualquiera si no se indican)."""
+    nombre = "eliminar_nulos"
+    es_de_celda = False
+
+    def filtrar(self, bloque, columnas):
+        return bloque.dropna(subset=columnas)
+
+
+class EliminarDuplicados(Operacion):
+    """
+    Elimina las filas que repiten una fila anterior (en `columnas`, o en todas).
+    Las huellas (hash de 64 bits de cada fila) ya vistas se guardan como uint64:
+    8 bytes por fila distinta en lugar de un objeto Python por fila. Es lo único
+    que crece con el número de filas. Una colisión del hash haría descartar una
+    fila distinta (probabilidad ~n²/2^65); drop_duplicates sobre todo el
+    DataFrame era exacto.
+
+    Las huellas van en tramos ordenados cuyos tamaños a lo sumo se duplican de
+    uno al siguiente, fusionados como en un contador binario: cada huella se
+    reordena O(log n) veces y una consulta mira O(log n) tramos, en lugar de
+    reordenar todas las vistas en cada bloque.
+    """
+    nombre = "eliminar_duplicados"
+    es_de_celda = False
+
+    def __init__(self, columnas=None, **parametros):
+        super().__init__(columnas, **parametros)
+        self.tramos = []  # arrays uint64 ordenados, del más grande al más pequeño
+
+    def filtrar(self, bloque, columnas):
+        huellas = pd.util.hash_pandas_object(bloque[columnas], index=False).to_numpy()
+        duplicadas = pd.Series(huellas).duplicated().to_numpy(copy=True)
+        for tramo in self.tramos:
+            posiciones = np.minimum(np.searchsorted(tramo, huellas), len(tramo) - 1)
+            duplicadas |= tramo[posiciones] == huellas
+        nuevas = np.sort(huellas[~duplicadas])
+        if len(nuevas):
+            self.tramos.append(nuevas)
+            while len(self.tramos) > 1 and len(self.tramos[-2]) <= 2 * len(self.tramos[-1]):
+                ultimo = self.tramos.pop()
+                self.tramos[-1] = np.sort(np.concatenate((self.tramos[-1], ultimo)))
+        return bloque[~duplicadas]
+
+
+OPERACIONES = {
+    clase.nombre: clase
+    for clase in (QuitarEspacios, ConvertirTipo, Imputar, RecortarAtipicos, EliminarNulos, EliminarDuplicados)
+}
+
+
+def construir_pipeline(operaciones: dict) -> list:
+    """Traduce la petición a la lista ordenada de operaciones."""
+    if "pipeline" in operaciones:
+        pasos = operaciones["pipeline"]
+    else:
+        # Formato antiguo: strip siempre, luego duplicados y nulos si se piden
+        pasos = [{"op": "strip"}]
+        if operaciones.get('eliminar_duplicados'):
+            pasos.append({"op": "eliminar_duplicados"})
+        if operaciones.get('eliminar_nulos'):
+            pasos.append({"op": "eliminar_nulos"})
+
+    pipeline = []
+    for paso in pasos:
+        paso = dict(paso)
+        nombre = paso.pop("op", None)
+        if nombre not in OPERACIONES:
+            raise ValueError(f"Operación de limpieza desconocida: '{nombre}'. Usa una de {list(OPERACIONES)}.")
+        pipeline.append(OPERACIONES[nombre](**paso))
+    return pipeline
+
+
+def _preparar_pipeline(pipeline: list, ruta_origen: str, esquema: pa.Schema):
+    """
+    Resuelve las columnas de cada operación según el tipo que tendrá la
+    columna en ese punto, ajusta las que necesitan estadísticas y devuelve
+    (columnas por operación, esquema de salida).
+    """
+    campos = {campo.name: campo for campo in esquema}
+    columnas_por_op = []
+    for op in pipeline:
+        columnas = op.columnas_de(pa.schema(list(campos.values())))
+        columnas_por_op.append(columnas)
+        for col in columnas:
+            tipo = op.tipo_salida(campos[col])
+            if tipo is not None:
+                campos[col] = pa.field(col, tipo)
+
+    pendientes = [i for i, op in enumerate(pipeline) if op.requiere_estadisticas and columnas_por_op[i]]
+    while pendientes:
+        # Entra en la etapa cada operación cuyas columnas no toca ninguna pendiente anterior
+        etapa, ocupadas = [], set()
+        for i in pendientes:
+            if not ocupadas & set(columnas_por_op[i]):
+                etapa.append(i)
+            ocupadas |= set(columnas_por_op[i])
+        _acumular_estadisticas(pipeline, columnas_por_op, etapa, ruta_origen)
+        pendientes = [i for i in pendientes if i not in etapa]
+
+    return columnas_por_op, pa.schema(list(campos.values()))
+
+
+def _acumular_estadisticas(pipeline: list, columnas_por_op: list, etapa: list, ruta_origen: str):
+    """Una pasada por bloques, solo con las columnas de la etapa, que ajusta sus operaciones."""
+    columnas = sorted({col for i in etapa for col in columnas_por_op[i]})
+    for bloque in leer_parquet_en_bloques(ruta_origen, columnas=columnas):
+        for i in etapa:
+            for col in columnas_por_op[i]:
+                serie = bloque[col]
+                for previa, columnas_previas in zip(pipeline[:i], columnas_por_op[:i]):
+                    if previa.es_de_celda and col in columnas_previas:
+                        serie = previa.transformar_columna(col, serie)
+                pipeline[i].acumular(col, serie)
+    for i in etapa:
+        pipeline[i].finalizar()
+
+
 def limpiar_dataset(dataset_id: str, operaciones: dict):
     """
-    ✅ ACTUALIZADO: Limpia el dataset, manejando whitespace y SIN One-Hot Encoding aquí.
+    Limpia el dataset por bloques aplicando el pipeline de operaciones y sube
+    el resultado como un dataset nuevo en Parquet. SIN One-Hot Encoding aquí.
     """
+    ruta_salida = None
     try:
-        df_original = obtener_dataframe_crudo(dataset_id)
-        df_limpio = df_original.copy()
+        ruta_origen = dataset_cache.obtener_ruta_columnar(dataset_id, obtener_archivo_url(dataset_id))
+        esquema = leer_esquema(ruta_origen)
 
-        filas_originales = len(df_limpio)
-        
         print(f"⚙️ Operaciones recibidas: {operaciones}")
+        pipeline = construir_pipeline(operaciones)
+        columnas_por_op, esquema_salida = _preparar_pipeline(pipeline, ruta_origen, esquema)
 
-        # --- PASO 0: Limpieza PREVIA de Whitespace ---
-        print("-> Aplicando limpieza de whitespace...")
-        # 1. Quitar espacios al inicio/final de todas las celdas de texto
-        for col in df_limpio.select_dtypes(include=['object', 'string']).columns:
-            df_limpio[col] = df_limpio[col].str.strip()
-            
-        # 2. Reemplazar celdas vacías ("") o solo con espacios (" ") por NaN real
-        df_limpio.replace(r'^\s*$', np.nan, regex=True, inplace=True)
+        fd, ruta_salida = tempfile.mkstemp(suffix=EXTENSION_COLUMNAR)
+        os.close(fd)
 
-        # --- Ahora calculamos nulos y duplicados DESPUÉS de limpiar espacios ---
-        duplicados_originales = int(df_limpio.duplicated().sum()) # Duplicados reales
-        nulos_originales = int(df_limpio.isnull().sum().sum())     # Nulos reales (incluye los convertidos)
+        filas_originales, filas_limpias = 0, 0
 
-        # --- PASO 1: Aplicar operaciones seleccionadas ---
-        if operaciones.get('eliminar_duplicados'):
-            print("-> Aplicando eliminación de duplicados...")
-            df_limpio.drop_duplicates(inplace=True)
+        with pq.ParquetWriter(ruta_salida, esquema_salida) as writer:
+            for bloque in leer_parquet_en_bloques(ruta_origen):
+                filas_originales += len(bloque)
 
-        if operaciones.get('eliminar_nulos'):
-            print("-> Aplicando eliminación de nulos (NaN)...")
-            df_limpio.dropna(inplace=True) # Ahora sí elimina los que eran solo espacios
+                for op, columnas in zip(pipeline, columnas_por_op):
+                    bloque = op.aplicar(bloque, columnas)
 
-        # --- PASO 2: Estadísticas Finales ---
-        filas_limpias = len(df_limpio)
-        filas_eliminadas = filas_originales - filas_limpias # Considera duplicados y nulos eliminados
+                filas_limpias += len(bloque)
+                if len(bloque):
+                    writer.write_table(pa.Table.from_pandas(bloque, schema=esquema_salida, preserve_index=False), row_group_size=FILAS_POR_GRUPO)
 
-        # --- PASO 3: Guardar y Subir ---
-        csv_buffer = BytesIO()
-        df_limpio.to_csv(csv_buffer, index=False)
-        csv_buffer.seek(0)
+        # --- Estadísticas Finales (exactas, por operación) ---
+        filas_eliminadas = filas_originales - filas_limpias
 
+        # --- Subir el Parquet (la descarga genera el CSV) ---
         dataset_original_info = supabase.table("datasets").select("nombre, usuario_id").eq("id", dataset_id).single().execute().data
         nombre_base = dataset_original_info["nombre"].rsplit('.', 1)[0]
-        nombre_archivo_limpio = f"{nombre_base}_limpio_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv"
-        bucket = supabase.storage.from_("datasets")
-        bucket.upload(nombre_archivo_limpio, csv_buffer.getvalue())
+        nombre_archivo_limpio = f"{nombre_base}_limpio_{datetime.now().strftime('%Y%m%d%H%M%S')}{EXTENSION_COLUMNAR}"
+        bucket = supabase.storage.from_(BUCKET_DATASETS)
+        bucket.upload(nombre_archivo_limpio, ruta_salida)
         archivo_url_limpio = bucket.get_public_url(nombre_archivo_limpio)
-        
+
+        # Perfil del resultado sobre el Parquet ya en disco, en Config.PERFIL_MODO
+        # (exacto salvo en archivos grandes); si falla, obtener_perfil lo calcula al pedirlo
+        perfil = None
+        try:
+            esquema_compacto = inferir_esquema_compacto(ruta_salida, Config.ESQUEMA_MAX_PROPORCION_CATEGORIAS)
+            perfil = calcular_perfil_archivo(ruta_salida, esquema_compacto, Config.PERFIL_MODO)
+        except Exception as perfil_err:
+            print(f"⚠️ No se pudo calcular el perfil del dataset limpio: {perfil_err}")
+
         nuevo_dataset_data = {
             "nombre": dataset_original_info["nombre"] + " (Limpio)",
             "archivo_url": archivo_url_limpio, "filas": filas_limpias,
-            "columnas": len(df_limpio.columns), "fecha_subida": datetime.utcnow().isoformat(),
+            "columnas": len(esquema_salida.names), "fecha_subida": datetime.utcnow().isoformat(),
             "usuario_id": dataset_original_info["usuario_id"], "es_limpio": True,
-            "dataset_original_id": dataset_id
+            "dataset_original_id": dataset_id, "perfil": serializar_perfil(perfil)
         }
         insert_response = supabase.table("datasets").insert(nuevo_dataset_data).execute()
         dataset_limpio_creado = insert_response.data[0]
-        
-        # Recalcular duplicados/nulos eliminados para el resumen (puede ser complejo si se aplican ambos)
-        # Simplificación: Usamos los conteos iniciales como referencia
-        duplicados_eliminados_count = duplicados_originales if operaciones.get('eliminar_duplicados') else 0
-        nulos_eliminados_count = nulos_originales if operaciones.get('eliminar_nulos') else 0
-        # Nota: Si se eliminan duplicados y luego nulos, el conteo de nulos eliminados podría ser menor que el original.
-        
+        invalidar_estadisticas()
+
+        # El Parquet recién escrito pasa a la caché: la primera lectura no lo descarga
+        dataset_cache.importar(dataset_limpio_creado["id"], archivo_url_limpio, ruta_salida)
+        ruta_salida = None
+
         estadisticas_resumen = {
             "filas_originales": filas_originales, "filas_limpias": filas_limpias,
             "filas_eliminadas": filas_eliminadas,
-            "duplicados_eliminados": duplicados_eliminados_count,
-            "nulos_eliminados": nulos_eliminados_count,
+            "porcentaje_datos_eliminados": (filas_eliminadas / filas_originales * 100) if filas_originales else 0.0,
+            # Filas realmente eliminadas por cada tipo de operación
+            "duplicados_eliminados": sum(op.filas_eliminadas for op in pipeline if isinstance(op, EliminarDuplicados)),
+            "nulos_eliminados": sum(op.filas_eliminadas for op in pipeline if isinstance(op, EliminarNulos)),
+            "operaciones": [op.resumen() for op in pipeline],
         }
         resultado_final = {
             "mensaje": "Limpieza completada exitosamente.",
@@ -90,4 +452,7 @@ def limpiar_dataset(dataset_id: str, operaciones: dict):
 
     except Exception as e:
         print(f"🔥🔥🔥 Error detallado en limpiar_dataset: {type(e).__name__} - {e}")
-        raise e
\ No newline at end of file
+        raise e
+    finally:
+        if ruta_salida and os.path.exists(ruta_salida):
+            os.remove(ruta_salida)
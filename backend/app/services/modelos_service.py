@@ -0,0 +1,176 @@
+# app/services/modelos_service.py
+
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+import torch
+
+from app.config import Config
+from app.services.supabase_service import supabase
+from app.services.red_neuronal_service import NeuralNet, predecir, salidas_a_etiquetas
+
+# =============================================================================
+# Registro de modelos entrenados
+# =============================================================================
+# Al terminar un entrenamiento se guarda en Storage (bucket "modelos",
+# <experimento_id>.joblib) todo lo necesario para puntuar filas nuevas: el
+# preprocesado (medias de imputación, layout del one-hot, columnas del modelo,
+# StandardScaler, clases del LabelEncoder) y el modelo. Las redes neuronales
+# se guardan como state_dict + argumentos del constructor; los modelos de
+# sklearn, tal cual con joblib.
+# Los modelos cargados se mantienen en una LRU en memoria. Las predicciones
+# corren en el proceso web, así que los modelos de sklearn predicen con un
+# solo hilo: n_jobs=1 aquí y BLAS/OpenMP limitados a 1 en create_app (el
+# límite es global al proceso; fijarlo en cada petición competiría entre hilos).
+
+BUCKET_MODELOS = "modelos"
+VERSION_ARTEFACTO = 1
+FILAS_POR_LOTE_PREDICCION = 50000
+
+
+def _ruta_modelo(experimento_id: str) -> str:
+    return f"{experimento_id}.joblib"
+
+
+def crear_artefacto(tipo_modelo: str, tipo_problema: str, modelo, columnas_entrada: list,
+                    medias_numericas: dict, dummies_por_feature: dict, columnas_modelo: list,
+                    scaler, clases: list = None, algoritmo: str = None) -> dict:
+    artefacto = {
+        'version': VERSION_ARTEFACTO,
+        'tipo_modelo': tipo_modelo,
+        'tipo_problema': tipo_problema,
+        'columnas_entrada': list(columnas_entrada),
+        'medias_numericas': {k: float(v) for k, v in medias_numericas.items() if pd.notna(v)},
+        'dummies_por_feature': dummies_por_feature,
+        'columnas_modelo': list(columnas_modelo),
+        'scaler': scaler,
+        'clases': clases,
+        'algoritmo': algoritmo,
+    }
+    if isinstance(modelo, NeuralNet):
+        salidas = modelo.output_layer.out_features
+        artefacto['red_neuronal'] = {
+            'input_size': modelo.network[0].in_features,
+            'num_classes': 2 if salidas == 1 and tipo_problema == 'clasificacion' else salidas,
+            'is_regression': tipo_problema != 'clasificacion',
+            'state_dict': {k: v.cpu() for k, v in modelo.state_dict().items()},
+        }
+    else:
+        artefacto['modelo'] = modelo
+    return artefacto
+
+
+def guardar_modelo(experimento_id: str, artefacto: dict):
+    fd, ruta_local = tempfile.mkstemp(suffix=".joblib")
+    os.close(fd)
+    try:
+        joblib.dump(artefacto, ruta_local, compress=3)
+        supabase.storage.from_(BUCKET_MODELOS).upload(_ruta_modelo(experimento_id), ruta_local)
+    finally:
+        os.remove(ruta_local)
+
+
+def eliminar_modelo(experimento_id: str):
+    supabase.storage.from_(BUCKET_MODELOS).remove([_ruta_modelo(experimento_id)])
+
+
+def _instanciar(artefacto: dict) -> dict:
+    """Reconstruye la red neuronal (si la hay) para dejar el artefacto listo para predecir."""
+    if 'red_neuronal' in artefacto and 'modelo' not in artefacto:
+        info = artefacto['red_neuronal']
+        modelo = NeuralNet(info['input_size'], info['num_classes'], is_regression=info['is_regression'])
+        modelo.load_state_dict(info['state_dict'])
+        modelo.eval()
+        artefacto = {**artefacto, 'modelo': modelo}
+    elif 'n_jobs' in getattr(artefacto['modelo'], 'get_params', dict)():
+        artefacto['modelo'].set_params(n_jobs=1)
+    return artefacto
+
+
+class ModelosCache:
+    """LRU de artefactos ya cargados; solo un hilo descarga cada modelo."""
+
+    def __init__(self, max_modelos: int):
+        self.max_modelos = max_modelos
+        self._modelos = OrderedDict()
+        self._lock = threading.Lock()
+        self._locks_carga = {}
+
+    def obtener(self, experimento_id: str) -> dict:
+        with self._lock:
+            if experimento_id in self._modelos:
+                self._modelos.move_to_end(experimento_id)
+                return self._modelos[experimento_id]
+            lock_carga = self._locks_carga.setdefault(experimento_id, threading.Lock())
+
+        with lock_carga:
+            with self._lock:
+                if experimento_id in self._modelos:
+                    return self._modelos[experimento_id]
+            contenido = supabase.storage.from_(BUCKET_MODELOS).download(_ruta_modelo(experimento_id))
+            artefacto = _instanciar(joblib.load(io.BytesIO(contenido)))
+            self.guardar(experimento_id, artefacto)
+            return artefacto
+
+    def guardar(self, experimento_id: str, artefacto: dict):
+        with self._lock:
+            self._modelos[experimento_id] = artefacto
+            self._modelos.move_to_end(experimento_id)
+            while len(self._modelos) > self.max_modelos:
+                self._modelos.popitem(last=False)
+
+    def invalidar(self, experimento_id: str):
+        with self._lock:
+            self._modelos.pop(experimento_id, None)
+            self._locks_carga.pop(experimento_id, None)
+
+
+modelos_cache = ModelosCache(Config.MODELOS_CACHE_MAX)
+
+
+def preparar_filas(artefacto: dict, df: pd.DataFrame) -> np.ndarray:
+    """Aplica a filas nuevas el mismo preprocesado que al entrenar y devuelve X escalada."""
+    faltantes = [c for c in artefacto['columnas_entrada'] if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas de entrada: {faltantes}")
+
+    df = df[artefacto['columnas_entrada']].copy()
+    for col, media in artefacto['medias_numericas'].items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(media)
+
+    bloques = [df.drop(columns=list(artefacto['dummies_por_feature']), errors='ignore')]
+    for col, dummies in artefacto['dummies_por_feature'].items():
+        if col in df.columns:
+            # Mismas columnas dummy que al entrenar; categorías nuevas quedan todo a 0
+            bloques.append(pd.get_dummies(df[col], prefix=col).reindex(columns=dummies, fill_value=0))
+    df = pd.concat(bloques, axis=1)
+
+    X = df.reindex(columns=artefacto['columnas_modelo'], fill_value=0).apply(pd.to_numeric, errors='coerce').fillna(0)
+    return artefacto['scaler'].transform(X)
+
+
+def predecir_filas(artefacto: dict, df: pd.DataFrame) -> list:
+    """Puntúa un DataFrame por lotes; en clasificación devuelve las clases originales."""
+    predicciones = []
+    for inicio in range(0, len(df), FILAS_POR_LOTE_PREDICCION):
+        X = preparar_filas(artefacto, df.iloc[inicio:inicio + FILAS_POR_LOTE_PREDICCION])
+        modelo = artefacto['modelo']
+        if isinstance(modelo, NeuralNet):
+            salidas = predecir(modelo, torch.from_numpy(X.astype(np.float32)))
+            lote = salidas_a_etiquetas(salidas).numpy() if artefacto['tipo_problema'] == 'clasificacion' else salidas.numpy().flatten()
+        else:
+            lote = np.asarray(modelo.predict(X))
+        predicciones.append(lote)
+
+    resultado = np.concatenate(predicciones) if predicciones else np.empty(0)
+    if artefacto['tipo_problema'] == 'clasificacion' and artefacto.get('clases') is not None:
+        clases = np.asarray(artefacto['clases'], dtype=object)
+        return clases[resultado.astype(int)].tolist()
+    return resultado.astype(float).tolist()
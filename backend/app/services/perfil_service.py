@@ -0,0 +1,331 @@
+# app/services/perfil_service.py
+
+import json
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from app.config import Config
+from app.services.supabase_service import supabase
+from app.services.cache_service import dataset_cache
+from app.services.analisis_service import (
+    CUANTILES_COLUMNA,
+    obtener_archivo_url,
+    obtener_dataframe_crudo,
+    calcular_correlacion,
+    resumen_correlacion,
+    distribucion_clases,
+    estadisticas_dataset,
+    obtener_columnas
+)
+from app.utils.correlacion_utils import AcumuladorCorrelacion
+from app.utils.file_utils import (
+    columnas_numericas_parquet,
+    contar_filas_parquet,
+    leer_parquet,
+    leer_parquet_en_bloques,
+)
+from app.utils.sketch_utils import (
+    ContadorDuplicados,
+    HyperLogLog,
+    TDigest,
+    error_relativo_hll,
+    hashes_de_filas,
+    hashes_de_valores,
+    normalizar_numeros,
+)
+
+# =============================================================================
+# Perfil precalculado de un dataset
+# =============================================================================
+# Los datasets no cambian después de subirse (limpiar crea uno nuevo), así que
+# sus estadísticas se calculan una sola vez al crearlos y se guardan en la
+# columna `perfil` de la tabla `datasets`. Las rutas de análisis lo sirven
+# desde ahí sin tocar el archivo.
+#
+# Dos modos:
+#   - exacto:     todos los análisis sobre el DataFrame completo.
+#   - aproximado: una sola pasada por bloques sobre el Parquet, con memoria
+#                 acotada. Filas, nulos, min/max/promedio y la distribución de
+#                 clases son exactos; los valores únicos salen de HyperLogLog,
+#                 los duplicados de un filtro de Bloom y los cuantiles de un
+#                 t-digest (cotas de error en app/utils/sketch_utils.py; se
+#                 guardan en la sección 'estadisticas').
+# 'auto' elige el aproximado a partir de Config.PERFIL_FILAS_APROXIMADO filas.
+#
+# La correlación de Pearson se calcula con el perfil (en el modo aproximado,
+# dentro de la misma pasada); la de Spearman, la primera vez que se pide, y se
+# añade al perfil guardado.
+
+VERSION_PERFIL = 3  # 2: 'tipo' con el esquema compacto; 3: 'correlaciones' por método, sin rellenar nulos
+
+MODO_EXACTO = "exacto"
+MODO_APROXIMADO = "aproximado"
+MODO_AUTO = "auto"
+MODOS_PERFIL = (MODO_EXACTO, MODO_APROXIMADO, MODO_AUTO)
+
+_perfiles = OrderedDict()  # dataset_id -> perfil ya leído de la base de datos (LRU)
+_lock = threading.Lock()
+
+
+def calcular_perfil(df: pd.DataFrame) -> dict:
+    """Ejecuta todos los análisis sobre el DataFrame y los agrupa en un solo dict."""
+    perfil = {
+        "version": VERSION_PERFIL,
+        "modo": MODO_EXACTO,
+        "columnas": obtener_columnas(df),
+        "estadisticas": {**estadisticas_dataset(df), "modo": MODO_EXACTO},
+        "distribucion_clases": distribucion_clases(df),
+        "correlaciones": {"pearson": calcular_correlacion(df)},
+    }
+    return _sin_nan(perfil)
+
+
+def calcular_perfil_archivo(ruta_parquet: str, esquema_compacto: dict, modo: str = None) -> dict:
+    """Perfil de un Parquet local en el modo pedido (por defecto, Config.PERFIL_MODO)."""
+    modo = modo or Config.PERFIL_MODO
+    if modo not in MODOS_PERFIL:
+        raise ValueError(f"Modo de perfil no válido: '{modo}'. Usa uno de {list(MODOS_PERFIL)}")
+    filas = contar_filas_parquet(ruta_parquet)
+    if modo == MODO_AUTO:
+        modo = MODO_APROXIMADO if filas >= Config.PERFIL_FILAS_APROXIMADO else MODO_EXACTO
+    if modo == MODO_EXACTO or filas == 0:
+        return calcular_perfil(leer_parquet(ruta_parquet, esquema_compacto=esquema_compacto))
+    return calcular_perfil_aproximado(ruta_parquet, esquema_compacto, filas)
+
+
+class _ResumenColumna:
+    """Acumula por bloques lo que obtener_columnas calcula sobre el DataFrame entero."""
+
+    def __init__(self):
+        self.tipos = []
+        self.numerica = True
+        self.nulos = 0
+        self.unicos = HyperLogLog(Config.PERFIL_HLL_PRECISION)
+        self.numericos = 0
+        self.suma = 0.0
+        self.minimo, self.maximo = math.inf, -math.inf
+        self.digest = TDigest(Config.PERFIL_TDIGEST_COMPRESION)
+
+    def actualizar(self, serie: pd.Series):
+        tipo = str(serie.dtype)
+        if tipo not in self.tipos:
+            self.tipos.append(tipo)
+        self.nulos += int(serie.isna().sum())
+        self.unicos.actualizar(hashes_de_valores(serie))
+        self.numerica = self.numerica and pd.api.types.is_numeric_dtype(serie)
+        if self.numerica:
+            valores = serie.dropna().to_numpy(dtype=np.float64)
+            if len(valores):
+                self.numericos += len(valores)
+                self.suma += float(valores.sum())
+                self.minimo = min(self.minimo, float(valores.min()))
+                self.maximo = max(self.maximo, float(valores.max()))
+                if not pd.api.types.is_bool_dtype(serie):
+                    self.digest.actualizar(valores)
+
+    def tipo(self) -> str:
+        # Un bloque sin nulos carga los enteros como int; con nulos, como float64
+        if len(self.tipos) > 1:
+            numericos = all(t.startswith(("int", "float")) for t in self.tipos)
+            return "float64" if numericos else "object"
+        return self.tipos[0] if self.tipos else "object"
+
+    def a_dict(self, nombre: str, total_filas: int) -> dict:
+        tipo = self.tipo()
+        info = {
+            "nombre": nombre,
+            "tipo": tipo,
+            "valores_nulos": self.nulos,
+            "valores_completos": total_filas - self.nulos,
+            "valores_unicos": self.unicos.estimar(),
+        }
+        if self.numerica and self.tipos:
+            info["min"] = self.minimo if self.numericos else float("nan")
+            info["max"] = self.maximo if self.numericos else float("nan")
+            info["promedio"] = self.suma / self.numericos if self.numericos else float("nan")
+            if tipo != "bool":
+                info["cuantiles"] = {f"p{int(q * 100)}": self.digest.cuantil(q) for q in CUANTILES_COLUMNA}
+        return info
+
+
+def calcular_perfil_aproximado(ruta_parquet: str, esquema_compacto: dict, total_filas: int) -> dict:
+    """Perfil en una pasada por bloques del Parquet; la memoria no depende del número de filas."""
+    columnas = {}
+    duplicados = ContadorDuplicados(
+        total_filas, Config.PERFIL_BLOOM_TASA_FALSOS_POSITIVOS, Config.PERFIL_BLOOM_MAX_MB * 1024 * 1024
+    )
+    clases = pd.Series(dtype=np.int64)
+    ultima = None
+    numericas = columnas_numericas_parquet(ruta_parquet)
+    correlacion = AcumuladorCorrelacion(len(numericas))
+
+    for bloque in leer_parquet_en_bloques(ruta_parquet, Config.PERFIL_FILAS_POR_BLOQUE, esquema_compacto):
+        for c in bloque.columns:
+            columnas.setdefault(c, _ResumenColumna()).actualizar(bloque[c])
+        duplicados.actualizar(hashes_de_filas(bloque))
+        if len(bloque.columns):
+            ultima = bloque.columns[-1]
+            conteos = normalizar_numeros(bloque[ultima]).astype(object).value_counts()
+            clases = clases.add(conteos, fill_value=0)
+        correlacion.actualizar(bloque[numericas].to_numpy(dtype=np.float64))
+
+    info_columnas = [resumen.a_dict(nombre, total_filas) for nombre, resumen in columnas.items()]
+    if ultima is not None and columnas[ultima].tipo().startswith("int"):
+        # Las clases se contaron como float64; sin nulos en ninguna parte, se muestran como enteros (igual que el exacto)
+        clases.index = [int(clase) for clase in clases.index]
+    total_columnas = len(info_columnas)
+    total_nulos = sum(c["valores_nulos"] for c in info_columnas)
+    denominador = total_filas * total_columnas
+
+    perfil = {
+        "version": VERSION_PERFIL,
+        "modo": MODO_APROXIMADO,
+        "columnas": info_columnas,
+        "estadisticas": {
+            "total_filas": total_filas,
+            "total_columnas": total_columnas,
+            "total_nulos": total_nulos,
+            "total_duplicados": duplicados.estimar(),
+            "porcentaje_nulos": round(total_nulos / denominador * 100, 2) if denominador else 0.0,
+            "modo": MODO_APROXIMADO,
+            "error_relativo_valores_unicos": round(error_relativo_hll(Config.PERFIL_HLL_PRECISION), 4),
+            "cota_error_duplicados": int(math.ceil(duplicados.cota_error)),
+        },
+        "distribucion_clases": [
+            {"clase": str(clase), "cantidad": int(cantidad)}
+            for clase, cantidad in clases.sort_values(ascending=False, kind="stable").items()
+        ],
+        "correlaciones": {"pearson": resumen_correlacion(numericas, correlacion)},
+    }
+    return _sin_nan(perfil)
+
+
+def calcular_correlacion_archivo(ruta_parquet: str, esquema_compacto: dict, metodo: str) -> dict:
+    """
+    Correlación leyendo por bloques solo las columnas numéricas del Parquet.
+    Para Spearman, una primera pasada construye el t-digest de cada columna y
+    la segunda correlaciona los rangos aproximados (su cdf).
+    """
+    numericas = columnas_numericas_parquet(ruta_parquet)
+    digests = None
+    if metodo == "spearman":
+        digests = [TDigest(Config.PERFIL_TDIGEST_COMPRESION) for _ in numericas]
+        for bloque in leer_parquet_en_bloques(ruta_parquet, Config.PERFIL_FILAS_POR_BLOQUE, esquema_compacto, numericas):
+            for digest, c in zip(digests, numericas):
+                digest.actualizar(bloque[c].to_numpy(dtype=np.float64))
+
+    acumulador = AcumuladorCorrelacion(len(numericas))
+    for bloque in leer_parquet_en_bloques(ruta_parquet, Config.PERFIL_FILAS_POR_BLOQUE, esquema_compacto, numericas):
+        valores = bloque[numericas].to_numpy(dtype=np.float64)
+        if digests:
+            valores = np.column_stack([digest.cdf(valores[:, i]) for i, digest in enumerate(digests)])
+        acumulador.actualizar(valores)
+    return resumen_correlacion(numericas, acumulador)
+
+
+def obtener_correlacion(dataset_id: str, metodo: str = "pearson", formato: str = "matriz", top: int = None, modo: str = None):
+    """
+    Matriz ({col: {col: r}}) o lista de los `top` pares más fuertes. Un método
+    que aún no está en el perfil se calcula (exacto si el perfil es exacto, por
+    bloques si es aproximado) y se guarda junto al resto.
+    """
+    dataset_id = str(dataset_id)
+    perfil = obtener_perfil(dataset_id, modo)
+    if metodo not in perfil["correlaciones"]:
+        print(f"-> Calculando correlación '{metodo}' del dataset {dataset_id}...")
+        if perfil.get("modo") == MODO_APROXIMADO:
+            archivo_url = obtener_archivo_url(dataset_id)
+            ruta = dataset_cache.obtener_ruta_columnar(dataset_id, archivo_url)
+            resultado = calcular_correlacion_archivo(ruta, dataset_cache.esquema_compacto(ruta), metodo)
+        else:
+            resultado = calcular_correlacion(obtener_dataframe_crudo(dataset_id), metodo)
+
+        # El perfil en memoria es compartido: se sustituye por una copia ampliada
+        perfil = {**perfil, "correlaciones": {**perfil["correlaciones"], metodo: _sin_nan(resultado)}}
+        supabase.table("datasets").update({"perfil": serializar_perfil(perfil)}).eq("id", dataset_id).execute()
+        _guardar_en_memoria(dataset_id, perfil)
+
+    correlacion = perfil["correlaciones"][metodo]
+    if formato == "pares":
+        return correlacion["pares"][:top or Config.CORRELACION_TOP_PARES]
+    return correlacion["matriz"]
+
+
+def serializar_perfil(perfil: dict) -> dict:
+    """Valor para la columna jsonb: el propio objeto, no una cadena JSON, para poder consultarlo."""
+    return perfil
+
+
+def _guardar_en_memoria(dataset_id: str, perfil: dict):
+    with _lock:
+        _perfiles[dataset_id] = perfil
+        _perfiles.move_to_end(dataset_id)
+        while len(_perfiles) > Config.PERFIL_CACHE_MAX:
+            _perfiles.popitem(last=False)
+
+
+def obtener_perfil(dataset_id: str, modo: str = None) -> dict:
+    """
+    Devuelve el perfil del dataset. Los datasets creados antes de existir el
+    perfil no lo tienen: se calcula la primera vez y se guarda en su registro.
+    Con modo='exacto', un perfil aproximado se recalcula exacto (y se guarda);
+    uno exacto sirve para cualquier modo.
+    """
+    dataset_id = str(dataset_id)
+    if modo is not None and modo not in MODOS_PERFIL:
+        raise ValueError(f"Modo de perfil no válido: '{modo}'. Usa uno de {list(MODOS_PERFIL)}")
+
+    with _lock:
+        perfil = _perfiles.get(dataset_id)
+        if perfil is not None:
+            _perfiles.move_to_end(dataset_id)
+
+    if perfil is None:
+        res = supabase.table("datasets").select("perfil").eq("id", dataset_id).single().execute()
+        if not res.data:
+            raise ValueError(f"❌ Dataset con ID '{dataset_id}' no encontrado.")
+
+        perfil = res.data.get("perfil")
+        if isinstance(perfil, str):  # guardado como cadena JSON antes de la migración 008
+            try:
+                perfil = json.loads(perfil)
+            except (json.JSONDecodeError, TypeError):
+                perfil = None
+
+    # Los perfiles anteriores a los modos son todos exactos
+    recalcular = not perfil or perfil.get("version") != VERSION_PERFIL
+    if not recalcular and modo == MODO_EXACTO and perfil.get("modo", MODO_EXACTO) != MODO_EXACTO:
+        recalcular = True
+
+    if recalcular:
+        print(f"-> Calculando perfil del dataset {dataset_id}...")
+        if modo == MODO_EXACTO:
+            perfil = calcular_perfil(obtener_dataframe_crudo(dataset_id))
+        else:
+            archivo_url = obtener_archivo_url(dataset_id)
+            ruta = dataset_cache.obtener_ruta_columnar(dataset_id, archivo_url)
+            perfil = calcular_perfil_archivo(ruta, dataset_cache.esquema_compacto(ruta), modo)
+        supabase.table("datasets").update({"perfil": serializar_perfil(perfil)}).eq("id", dataset_id).execute()
+
+    _guardar_en_memoria(dataset_id, perfil)
+    return perfil
+
+
+def invalidar_perfil(dataset_id: str):
+    with _lock:
+        _perfiles.pop(str(dataset_id), None)
+
+
+def _sin_nan(valor):
+    """Cambia NaN/inf por None: no son JSON válido ni caben en una columna jsonb."""
+    if isinstance(valor, dict):
+        return {k: _sin_nan(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_sin_nan(v) for v in valor]
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
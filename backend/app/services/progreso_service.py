@@ -0,0 +1,113 @@
+# app/services/progreso_service.py
+
+import json
+import queue
+import threading
+import time
+
+from app.config import Config
+from app.services.supabase_service import supabase
+
+# =============================================================================
+# Progreso de entrenamientos en vivo
+# =============================================================================
+# Los procesos del pool envían eventos (fase, época, estado) a una cola del
+# Manager; un hilo del proceso web los reenvía al `canal_progreso`, un pub/sub
+# en memoria al que se suscriben las conexiones SSE. A la base de datos solo
+# se escribe el progreso cada PROGRESO_GUARDADO_SEGUNDOS.
+#
+# Eventos (dicts):
+#   {'tipo': 'fase',   'fase': 'preparacion' | 'entrenamiento' | 'metricas' | 'importancia'}
+#   {'tipo': 'epoca',  'epoca': n, 'tiempo': s, 'metricas': {...} | None}
+#   {'tipo': 'estado', 'estado': 'en_cola' | 'entrenando' | 'completado' | 'error' | 'cancelado'}
+
+
+class CanalProgreso:
+    def __init__(self, estados_finales):
+        self.estados_finales = set(estados_finales)
+        self._historial = {}  # experimento_id -> eventos publicados (para quien se conecte tarde)
+        self._suscriptores = {}  # experimento_id -> [queue.Queue]
+        self._lock = threading.Lock()
+
+    def abrir(self, experimento_id: str):
+        with self._lock:
+            self._historial.setdefault(experimento_id, [])
+
+    def activo(self, experimento_id: str) -> bool:
+        with self._lock:
+            return experimento_id in self._historial
+
+    def publicar(self, experimento_id: str, evento: dict):
+        with self._lock:
+            if experimento_id not in self._historial:
+                return
+            self._historial[experimento_id].append(evento)
+            for suscripcion in self._suscriptores.get(experimento_id, []):
+                suscripcion.put(evento)
+            # Con el estado final ya entregado el canal se cierra
+            if evento.get('tipo') == 'estado' and evento.get('estado') in self.estados_finales:
+                del self._historial[experimento_id]
+                self._suscriptores.pop(experimento_id, None)
+
+    def suscribir(self, experimento_id: str):
+        """Devuelve una queue.Queue con el historial ya cargado, o None si el canal no existe."""
+        with self._lock:
+            if experimento_id not in self._historial:
+                return None
+            suscripcion = queue.Queue()
+            for evento in self._historial[experimento_id]:
+                suscripcion.put(evento)
+            self._suscriptores.setdefault(experimento_id, []).append(suscripcion)
+            return suscripcion
+
+    def desuscribir(self, experimento_id: str, suscripcion):
+        with self._lock:
+            suscripciones = self._suscriptores.get(experimento_id, [])
+            if suscripcion in suscripciones:
+                suscripciones.remove(suscripcion)
+
+
+class ReportadorProgreso:
+    """
+    Lo usa el trabajo dentro del proceso del pool. Envía cada evento al proceso
+    web por `cola_eventos` y guarda las métricas por época en la base de datos
+    como mucho una vez cada `intervalo_guardado` segundos.
+    """
+
+    def __init__(self, experimento_id: str, cola_eventos=None, intervalo_guardado: float = None):
+        self.experimento_id = experimento_id
+        self.cola_eventos = cola_eventos
+        self.intervalo_guardado = Config.PROGRESO_GUARDADO_SEGUNDOS if intervalo_guardado is None else intervalo_guardado
+        self.metricas_por_epoca = []
+        self.tiempos_por_epoca = []
+        self._ultimo_guardado = time.time()
+
+    def _enviar(self, evento: dict):
+        if self.cola_eventos is not None:
+            self.cola_eventos.put((self.experimento_id, evento))
+
+    def fase(self, nombre: str):
+        self._enviar({'tipo': 'fase', 'fase': nombre})
+
+    def estado(self, estado: str, **extra):
+        self._enviar({'tipo': 'estado', 'estado': estado, **extra})
+
+    def epoca(self, numero_epoca: int, tiempo: float, metricas: dict = None):
+        self.tiempos_por_epoca.append({'epoca': numero_epoca, 'tiempo': tiempo})
+        if metricas is not None:
+            self.metricas_por_epoca.append(metricas)
+        self._enviar({'tipo': 'epoca', 'epoca': numero_epoca, 'tiempo': tiempo, 'metricas': metricas})
+
+        if time.time() - self._ultimo_guardado >= self.intervalo_guardado:
+            self._guardar()
+
+    def _guardar(self):
+        self._ultimo_guardado = time.time()
+        try:
+            supabase.table('experimentos').update({
+                'metricas_por_epoca': json.dumps(self.metricas_por_epoca),
+                'tiempo_por_epoca': json.dumps(self.tiempos_por_epoca)
+            }).eq('id', self.experimento_id).execute()
+        except Exception as e:
+            # El progreso parcial es opcional: un fallo aquí no debe parar el entrenamiento
+            print(f"⚠️ No se pudo guardar el progreso del experimento {self.experimento_id}: {e}")
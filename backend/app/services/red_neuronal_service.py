@@ -0,0 +1,158 @@
+# app/services/red_neuronal_service.py
+
+import copy
+import time
+
+import torch
+import torch.nn as nn
+from torch.utils.data import BatchSampler, DataLoader, RandomSampler, TensorDataset
+
+from app.services.cola_service import verificar_cancelacion
+from app.utils.ml_utils import MatrizConfusion
+
+# =============================================================================
+# Motor de entrenamiento de la red neuronal
+# =============================================================================
+# Entrena por mini-lotes barajados en lugar de hacer descenso de gradiente con
+# todo el conjunto en cada época. La validación se evalúa solo cada
+# `evaluar_cada` épocas y por lotes, y la parada temprana restaura los pesos
+# de la mejor época (menor pérdida de validación).
+
+TAMANO_LOTE_POR_DEFECTO = 32
+TAMANO_LOTE_INFERENCIA = 4096  # sin gradientes se pueden usar lotes más grandes
+EVALUAR_CADA_POR_DEFECTO = 1
+PACIENCIA_POR_DEFECTO = 10  # épocas sin mejorar antes de parar (0 = sin parada temprana)
+MIN_DELTA_POR_DEFECTO = 1e-4
+
+
+class NeuralNet(nn.Module):
+    def __init__(self, input_size, num_classes, is_regression=False):
+        super(NeuralNet, self).__init__()
+        self.network = nn.Sequential(
+            nn.Linear(input_size, 128),
+            nn.ReLU(),
+            nn.Dropout(0.5),
+            nn.Linear(128, 64),
+            nn.ReLU(),
+            nn.Dropout(0.3),
+            nn.Linear(64, 32),
+            nn.ReLU()
+        )
+        if is_regression:
+            self.output_layer = nn.Linear(32, 1)
+        else:
+            # Para clasificación binaria, la salida es 1, para multiclase es num_classes
+            self.output_layer = nn.Linear(32, num_classes if num_classes > 2 else 1)
+
+    def forward(self, x):
+        x = self.network(x)
+        return self.output_layer(x)
+
+
+def salidas_a_etiquetas(outputs: torch.Tensor) -> torch.Tensor:
+    """Convierte logits en etiquetas: umbral 0.5 si hay una salida, argmax si hay varias."""
+    if outputs.shape[1] == 1:
+        return (torch.sigmoid(outputs) > 0.5).long().flatten()
+    return torch.argmax(outputs, dim=1)
+
+
+def predecir(modelo: nn.Module, X_t: torch.Tensor) -> torch.Tensor:
+    """Salidas del modelo en modo evaluación, calculadas por lotes."""
+    modelo.eval()
+    with torch.no_grad():
+        return torch.cat([modelo(lote) for lote in torch.split(X_t, TAMANO_LOTE_INFERENCIA)])
+
+
+def crear_dataloader(X_t: torch.Tensor, y_t: torch.Tensor, tamano_lote: int, semilla: int = 42) -> DataLoader:
+    """
+    DataLoader de mini-lotes barajados. El BatchSampler entrega los índices de
+    todo el lote de una vez, así TensorDataset indexa el tensor en bloque en
+    lugar de fila a fila y juntarlas después.
+    """
+    dataset = TensorDataset(X_t, y_t)
+    generador = torch.Generator().manual_seed(semilla)
+    sampler = BatchSampler(RandomSampler(dataset, generator=generador), batch_size=tamano_lote, drop_last=False)
+    return DataLoader(dataset, sampler=sampler, batch_size=None)
+
+
+def entrenar_red_neuronal(modelo, criterion, optimizer, X_train_t, y_train_t, X_val_t, y_val_t,
+                          es_clasificacion: bool, tamano_lote: int = TAMANO_LOTE_POR_DEFECTO,
+                          epocas: int = 100, evaluar_cada: int = EVALUAR_CADA_POR_DEFECTO,
+                          paciencia: int = PACIENCIA_POR_DEFECTO, min_delta: float = MIN_DELTA_POR_DEFECTO,
+                          cancelacion=None, al_terminar_epoca=None, semilla: int = 42):
+    """
+    Entrena `modelo` in-place y al terminar le carga los pesos de la mejor época.
+    `al_terminar_epoca(numero_epoca, tiempo, metricas)` se llama tras cada
+    época; `metricas` es None en las épocas que no se evalúan. Si devuelve
+    True el entrenamiento se detiene igual que con la parada temprana.
+    Devuelve (metricas_por_epoca, tiempos_por_epoca, mejores_metricas):
+    `metricas_por_epoca` solo tiene las épocas evaluadas y `tiempos_por_epoca`
+    todas, como {'epoca', 'tiempo'}: con evaluar_cada > 1 las dos listas no
+    tienen la misma longitud y se cruzan por 'epoca', no por posición. La
+    pérdida y la precisión de entrenamiento salen de los mini-lotes de la
+    propia época, sin una pasada extra sobre todo el conjunto. `semilla` fija
+    el orden en que se barajan los mini-lotes.
+    """
+    dataloader = crear_dataloader(X_train_t, y_train_t, max(1, tamano_lote), semilla)
+    evaluar_cada = max(1, evaluar_cada)
+    y_val_etiquetas = y_val_t.flatten().long() if es_clasificacion else None
+    # Con una sola salida la red es binaria; si no, hay tantas salidas como clases
+    num_clases = None
+    if es_clasificacion:
+        num_salidas = modelo.output_layer.out_features
+        num_clases = 2 if num_salidas == 1 else num_salidas
+
+    metricas_por_epoca, tiempos_por_epoca = [], []
+    mejor_perdida, mejor_estado, mejores_metricas, mejor_epoca = float('inf'), None, None, 0
+
+    for epoch in range(epocas):
+        verificar_cancelacion(cancelacion)
+        epoch_start_time = time.time()
+
+        modelo.train()
+        suma_perdida, n_filas = 0.0, 0
+        matriz_entrenamiento = MatrizConfusion(num_clases) if es_clasificacion else None
+        for X_lote, y_lote in dataloader:
+            outputs = modelo(X_lote); loss = criterion(outputs, y_lote)
+            optimizer.zero_grad(); loss.backward(); optimizer.step()
+
+            suma_perdida += loss.item() * len(X_lote); n_filas += len(X_lote)
+            if es_clasificacion:
+                matriz_entrenamiento.actualizar(y_lote, salidas_a_etiquetas(outputs.detach()))
+
+        numero_epoca = epoch + 1
+        es_ultima = numero_epoca == epocas
+        epoca_metrics, parar = None, False
+        if numero_epoca % evaluar_cada == 0 or es_ultima:
+            val_outputs = predecir(modelo, X_val_t)
+            val_loss = criterion(val_outputs, y_val_t).item()
+            epoca_metrics = {
+                'epoca': numero_epoca,
+                'perdida_validacion': float(val_loss),
+                'perdida_entrenamiento': float(suma_perdida / max(n_filas, 1))
+            }
+            if es_clasificacion:
+                epoca_metrics['precision_entrenamiento'] = matriz_entrenamiento.precision()
+                epoca_metrics['precision_validacion'] = MatrizConfusion.desde_etiquetas(y_val_etiquetas, salidas_a_etiquetas(val_outputs), num_clases).precision()
+            metricas_por_epoca.append(epoca_metrics)
+
+            if val_loss < mejor_perdida - min_delta:
+                mejor_perdida, mejor_epoca, mejores_metricas = val_loss, numero_epoca, epoca_metrics
+                mejor_estado = copy.deepcopy(modelo.state_dict())
+            elif paciencia and numero_epoca - mejor_epoca >= paciencia:
+                parar = True
+
+        tiempo_epoca = time.time() - epoch_start_time
+        tiempos_por_epoca.append({'epoca': numero_epoca, 'tiempo': tiempo_epoca})
+        if al_terminar_epoca is not None and al_terminar_epoca(numero_epoca, tiempo_epoca, epoca_metrics):
+            print(f"-> Entrenamiento detenido en la época {numero_epoca} (mejor: {mejor_epoca}).")
+            break
+
+        if parar:
+            print(f"-> Parada temprana en la época {numero_epoca} (mejor: {mejor_epoca}).")
+            break
+
+    if mejor_estado is not None:
+        modelo.load_state_dict(mejor_estado)
+    modelo.eval()
+    return metricas_por_epoca, tiempos_por_epoca, mejores_metricas
@@ -0,0 +1,81 @@
+# app/services/resultados_service.py
+
+import io
+import os
+import tempfile
+
+import numpy as np
+
+from app.config import Config
+from app.services.supabase_service import supabase
+
+# =============================================================================
+# Resultados detallados de un experimento
+# =============================================================================
+# En la fila del experimento solo se guardan resúmenes de tamaño fijo:
+#   - distribucion_errores:   histograma {'bordes', 'frecuencias'}
+#   - predicciones_vs_reales: muestra estratificada por el valor real
+#   - curva_roc:              fpr/tpr en una rejilla fija de fpr (el AUC se
+#                             calcula con la curva completa)
+# Los arrays completos van comprimidos (.npz) al bucket "resultados" y solo se
+# descargan si se piden.
+
+BUCKET_RESULTADOS = "resultados"
+
+
+def _ruta_resultados(experimento_id: str) -> str:
+    return f"{experimento_id}.npz"
+
+
+def histograma_errores(errores, bins: int = None) -> dict:
+    bins = bins or Config.RESULTADOS_BINS_ERRORES
+    frecuencias, bordes = np.histogram(np.asarray(errores, dtype=float), bins=bins)
+    return {'bordes': bordes.tolist(), 'frecuencias': frecuencias.tolist()}
+
+
+def muestrear_predicciones(reales, predicciones, max_puntos: int = None, semilla: int = 42) -> list:
+    """
+    Como mucho `max_puntos` pares {'real', 'prediccion'}: las filas se ordenan
+    por valor real, se parten en tramos iguales y se toma una al azar de cada
+    tramo, así las colas quedan representadas igual que el centro.
+    """
+    max_puntos = max_puntos or Config.RESULTADOS_MAX_PUNTOS_DISPERSION
+    reales, predicciones = np.asarray(reales, dtype=float), np.asarray(predicciones, dtype=float)
+    n = len(reales)
+    if n > max_puntos:
+        rng = np.random.default_rng(semilla)
+        orden = np.argsort(reales, kind='stable')
+        indices = orden[((np.arange(max_puntos) + rng.random(max_puntos)) * n / max_puntos).astype(int)]
+        reales, predicciones = reales[indices], predicciones[indices]
+    return [{'real': float(r), 'prediccion': float(p)} for r, p in zip(reales, predicciones)]
+
+
+def reducir_curva_roc(fpr, tpr, puntos: int = None) -> dict:
+    """Curva ROC en `puntos` valores de fpr equiespaciados (tpr máxima alcanzada en cada uno)."""
+    puntos = puntos or Config.RESULTADOS_PUNTOS_ROC
+    fpr, tpr = np.asarray(fpr, dtype=float), np.asarray(tpr, dtype=float)
+    if len(fpr) <= puntos:
+        return {'fpr': fpr.tolist(), 'tpr': tpr.tolist()}
+    rejilla = np.linspace(0.0, 1.0, puntos)
+    # fpr es no decreciente: el último punto con fpr <= x da la tpr de la curva escalonada en x
+    posiciones = np.searchsorted(fpr, rejilla, side='right') - 1
+    return {'fpr': rejilla.tolist(), 'tpr': tpr[np.clip(posiciones, 0, None)].tolist()}
+
+
+def guardar_resultados(experimento_id: str, **arrays):
+    """Sube los arrays completos (np.savez_compressed) al bucket de resultados."""
+    fd, ruta_local = tempfile.mkstemp(suffix=".npz")
+    os.close(fd)
+    try:
+        np.savez_compressed(ruta_local, **{nombre: np.asarray(valores) for nombre, valores in arrays.items()})
+        supabase.storage.from_(BUCKET_RESULTADOS).upload(_ruta_resultados(experimento_id), ruta_local)
+    finally:
+        os.remove(ruta_local)
+
+
+def descargar_resultados(experimento_id: str) -> io.BytesIO:
+    return io.BytesIO(supabase.storage.from_(BUCKET_RESULTADOS).download(_ruta_resultados(experimento_id)))
+
+
+def eliminar_resultados(experimento_id: str):
+    supabase.storage.from_(BUCKET_RESULTADOS).remove([_ruta_resultados(experimento_id)])
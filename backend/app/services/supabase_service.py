@@ -1,6 +1,9 @@
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
 import os
+import threading
 from dotenv import load_dotenv
+from app.config import Config
 
 # Carga las variables del archivo .env
 load_dotenv()
@@ -9,5 +12,42 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-# Crea el cliente Supabase
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+def crear_cliente() -> Client:
+    """Cliente Supabase con timeouts acotados para la base de datos y Storage."""
+    opciones = ClientOptions(
+        postgrest_client_timeout=Config.SUPABASE_TIMEOUT_DB,
+        storage_client_timeout=Config.SUPABASE_TIMEOUT_STORAGE,
+    )
+    return create_client(SUPABASE_URL, SUPABASE_KEY, options=opciones)
+
+
+class _ClienteCompartido:
+    """
+    Se usa igual que un Client (`supabase.table(...)`, `supabase.storage...`).
+    Hay un solo cliente por proceso, creado bajo un lock la primera vez que se
+    usa y compartido por todos los hilos: los clientes HTTP de PostgREST y
+    Storage (httpx) son seguros entre hilos y así todas las peticiones reparten
+    un único pool de conexiones keep-alive. Un cliente por hilo abría un pool
+    nuevo en cada petición con servidores que crean un hilo por petición. El
+    backend usa la clave de servicio y nunca cambia la sesión de auth, que es
+    el único estado del cliente que varía.
+    """
+
+    def __init__(self):
+        self._cliente = None
+        self._lock = threading.Lock()
+
+    def cliente(self) -> Client:
+        if self._cliente is None:
+            with self._lock:
+                if self._cliente is None:
+                    self._cliente = crear_cliente()
+        return self._cliente
+
+    def __getattr__(self, nombre):
+        return getattr(self.cliente(), nombre)
+
+
+# Cliente Supabase compartido por rutas y servicios
+supabase: Client = _ClienteCompartido()
@@ -0,0 +1,88 @@
+# app/utils/correlacion_utils.py
+
+import numpy as np
+
+# =============================================================================
+# Correlación por bloques
+# =============================================================================
+# En vez de copiar todas las columnas numéricas y llamar a .corr(), se acumulan
+# bloque a bloque los estadísticos suficientes de cada par de columnas sobre
+# las filas en las que ambas tienen valor (como .corr() de pandas, que usa
+# pares completos; rellenar con 0 sesgaba el resultado):
+#   n_ij, sum x_i, sum x_j, sum x_i^2, sum x_j^2, sum x_i x_j
+# Todo sale de productos de matrices (p x p) por bloque, así que la memoria
+# depende del número de columnas y del tamaño del bloque, no de las filas.
+# Spearman es Pearson sobre rangos: con el DataFrame en memoria se usan los
+# rangos exactos; por bloques, rangos aproximados con el t-digest de cada
+# columna (cdf), lo que exige una pasada previa para construirlo.
+# En los dos casos cada columna se ordena una sola vez, sobre todos sus
+# valores no nulos, y luego se correlacionan los pares completos. pandas, en
+# cambio, vuelve a ordenar cada par solo con sus filas completas: sin nulos da
+# lo mismo, pero con nulos los resultados difieren algo. Ordenar por par
+# costaría una ordenación por par de columnas en vez de una por columna.
+
+METODOS_CORRELACION = ("pearson", "spearman")
+
+
+class AcumuladorCorrelacion:
+    def __init__(self, num_columnas: int):
+        p = num_columnas
+        self.n = np.zeros((p, p))        # filas con valor en i y en j
+        self.suma = np.zeros((p, p))     # [i, j]: suma de x_i donde también hay x_j
+        self.suma_cuad = np.zeros((p, p))
+        self.suma_prod = np.zeros((p, p))
+        self.desplazamiento = None       # se resta a cada columna para evitar cancelaciones
+
+    def actualizar(self, valores: np.ndarray):
+        """Suma un bloque (filas x columnas, float, NaN = nulo)."""
+        valores = np.asarray(valores, dtype=np.float64)
+        if valores.shape[0] == 0:
+            return self
+        if self.desplazamiento is None:
+            with np.errstate(all="ignore"):
+                medias = np.nanmean(valores, axis=0)
+            self.desplazamiento = np.nan_to_num(medias)
+
+        presentes = ~np.isnan(valores)
+        mascara = presentes.astype(np.float64)
+        x = np.where(presentes, valores - self.desplazamiento, 0.0)
+        self.n += mascara.T @ mascara
+        self.suma += x.T @ mascara
+        self.suma_cuad += (x * x).T @ mascara
+        self.suma_prod += x.T @ x
+        return self
+
+    def matriz(self) -> np.ndarray:
+        """Matriz de correlación (NaN donde no hay al menos dos filas o la varianza es 0)."""
+        n, sx, sy = self.n, self.suma, self.suma.T
+        with np.errstate(all="ignore"):
+            covarianza = n * self.suma_prod - sx * sy
+            varianza_x = n * self.suma_cuad - sx * sx
+            varianza_y = n * self.suma_cuad.T - sy * sy
+            r = covarianza / np.sqrt(varianza_x * varianza_y)
+        r[(n < 2) | ~(varianza_x > 0) | ~(varianza_y > 0)] = np.nan
+        return np.clip(r, -1.0, 1.0)
+
+
+def matriz_a_dict(columnas: list, r: np.ndarray) -> dict:
+    """Mismo formato que DataFrame.corr().round(4).to_dict(): {columna: {columna: valor}}."""
+    return {
+        cj: {ci: float(round(r[i, j], 4)) for i, ci in enumerate(columnas)}
+        for j, cj in enumerate(columnas)
+    }
+
+
+def pares_mas_fuertes(columnas: list, r: np.ndarray, n: np.ndarray, k: int) -> list:
+    """Los k pares de columnas distintas con mayor |correlación|, de mayor a menor."""
+    i, j = np.triu_indices(len(columnas), k=1)
+    valores = r[i, j]
+    validos = ~np.isnan(valores)
+    i, j, valores = i[validos], j[validos], valores[validos]
+    if len(valores) > k:
+        mejores = np.argpartition(-np.abs(valores), k - 1)[:k]
+        i, j, valores = i[mejores], j[mejores], valores[mejores]
+    orden = np.argsort(-np.abs(valores), kind="stable")
+    return [
+        {"columna_a": columnas[a], "columna_b": columnas[b], "correlacion": float(round(v, 4)), "filas": int(n[a, b])}
+        for a, b, v in zip(i[orden], j[orden], valores[orden])
+    ]
@@ -0,0 +1,294 @@
+# app/utils/file_utils.py
+
+import os
+import re
+from urllib.parse import urlparse, unquote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+# =============================================================================
+# Rutas dentro del bucket de Supabase Storage
+# =============================================================================
+BUCKET_DATASETS = "datasets"
+EXTENSION_COLUMNAR = ".parquet"
+
+
+def ruta_en_storage(archivo_url: str, bucket: str = BUCKET_DATASETS) -> str:
+    """
+    Extrae la ruta del objeto dentro del bucket a partir de su URL pública.
+    Ej: .../storage/v1/object/public/datasets/<usuario>/<archivo>.csv -> <usuario>/<archivo>.csv
+    """
+    ruta = unquote(urlparse(archivo_url).path)
+    marcador = f"/{bucket}/"
+    if marcador in ruta:
+        return ruta.split(marcador, 1)[1]
+    return ruta.rsplit("/", 1)[-1]
+
+
+def es_columnar(ruta_o_url: str) -> bool:
+    return urlparse(ruta_o_url).path.lower().endswith(EXTENSION_COLUMNAR)
+
+
+def url_columnar(archivo_url: str) -> str:
+    """URL de la copia columnar que se guarda junto al archivo original."""
+    if es_columnar(archivo_url):
+        return archivo_url
+    url = urlparse(archivo_url)
+    base, _ = os.path.splitext(url.path)
+    return url._replace(path=base + EXTENSION_COLUMNAR).geturl()
+
+
+# =============================================================================
+# Conversión y lectura en formato columnar (Parquet)
+# =============================================================================
+FILAS_POR_GRUPO = 65536
+
+
+def dataframe_a_tabla_arrow(df: pd.DataFrame) -> pa.Table:
+    """
+    Convierte un DataFrame a tabla Arrow. Las columnas de texto con tipos
+    mezclados (habituales en CSVs leídos con low_memory) se pasan a string
+    conservando los nulos, porque Arrow exige un tipo por columna.
+    """
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        df = df.copy()
+        for col in df.select_dtypes(include=["object"]).columns:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def dataframe_a_parquet(df: pd.DataFrame, destino: str):
+    pq.write_table(dataframe_a_tabla_arrow(df), destino, row_group_size=FILAS_POR_GRUPO)
+
+
+def leer_parquet(ruta: str, columnas: list = None, esquema_compacto: dict = None) -> pd.DataFrame:
+    """Lee un Parquet local cargando solo las columnas pedidas (con tipos compactos si se indican)."""
+    tabla = pq.read_table(ruta, columns=columnas)
+    if esquema_compacto:
+        return tabla_compacta_a_pandas(tabla, esquema_compacto)
+    return tabla.to_pandas()
+
+
+def leer_parquet_en_bloques(ruta: str, filas_por_bloque: int = FILAS_POR_GRUPO, esquema_compacto: dict = None,
+                            columnas: list = None):
+    """Generador de DataFrames de como mucho `filas_por_bloque` filas, sin cargar el archivo entero."""
+    archivo = pq.ParquetFile(ruta)
+    for lote in archivo.iter_batches(batch_size=filas_por_bloque, columns=columnas):
+        if esquema_compacto:
+            yield tabla_compacta_a_pandas(pa.Table.from_batches([lote]), esquema_compacto)
+        else:
+            yield lote.to_pandas()
+
+
+def columnas_numericas_parquet(ruta: str) -> list:
+    """Columnas que pandas carga como número (enteros y float; no booleanos), en orden."""
+    return [c.name for c in pq.read_schema(ruta) if pa.types.is_integer(c.type) or pa.types.is_floating(c.type)]
+
+
+def contar_filas_parquet(ruta: str) -> int:
+    """Número de filas, leído de los metadatos."""
+    return pq.ParquetFile(ruta).metadata.num_rows
+
+
+def leer_pagina_parquet(ruta: str, inicio: int, cantidad: int):
+    """
+    Lee las filas [inicio, inicio + cantidad) sin cargar el archivo: el número de
+    filas de cada grupo está en los metadatos, así que solo se leen los grupos
+    que contienen la página. Devuelve (DataFrame de la página, total de filas).
+    """
+    archivo = pq.ParquetFile(ruta)
+    total_filas = archivo.metadata.num_rows
+    fin = min(inicio + cantidad, total_filas)
+
+    grupos, offset_primer_grupo, offset = [], None, 0
+    for i in range(archivo.num_row_groups):
+        filas_grupo = archivo.metadata.row_group(i).num_rows
+        if offset < fin and offset + filas_grupo > inicio:
+            if offset_primer_grupo is None:
+                offset_primer_grupo = offset
+            grupos.append(i)
+        offset += filas_grupo
+
+    if not grupos:
+        return archivo.schema_arrow.empty_table().to_pandas(), total_filas
+    tabla = archivo.read_row_groups(grupos)
+    return tabla.slice(inicio - offset_primer_grupo, fin - inicio).to_pandas(), total_filas
+
+
+# =============================================================================
+# Conversión de CSV por bloques
+# =============================================================================
+# El CSV se lee en streaming con Arrow: cada bloque se parsea, se valida y se
+# escribe en el Parquet antes de leer el siguiente, así la memoria no depende
+# del tamaño del archivo. Arrow infiere los tipos con el primer bloque; si un
+# bloque posterior no encaja (un entero que resulta tener decimales o texto) se
+# ensancha el tipo de esa columna y se vuelve a convertir desde el principio.
+
+BYTES_POR_BLOQUE_CSV = 16 * 1024 * 1024
+_COLUMNA_CON_ERROR = re.compile(r"In CSV column #(\d+)")
+
+
+def _abrir_csv(ruta_csv: str, tipos: dict):
+    return pv.open_csv(
+        ruta_csv,
+        read_options=pv.ReadOptions(block_size=BYTES_POR_BLOQUE_CSV),
+        # Igual que pandas.read_csv: los campos vacíos de texto son nulos
+        convert_options=pv.ConvertOptions(column_types=tipos, strings_can_be_null=True),
+    )
+
+
+def _tipo_mas_ancho(campo: pa.Field):
+    if pa.types.is_integer(campo.type) or pa.types.is_null(campo.type):
+        return pa.float64()
+    if not pa.types.is_string(campo.type):
+        return pa.string()
+    return None
+
+
+def _tipo_a_ensanchar(error: pa.ArrowInvalid, esquema: pa.Schema = None) -> tuple:
+    """(columna, tipo nuevo) que corrige el error de conversión, o ValueError si el CSV no es válido."""
+    mensaje = str(error)
+    if "UTF8" in mensaje:
+        raise ValueError("El archivo no está codificado en UTF-8") from error
+    coincidencia = _COLUMNA_CON_ERROR.search(mensaje)
+    if coincidencia and esquema is not None:
+        campo = esquema.field(int(coincidencia.group(1)))
+        tipo = _tipo_mas_ancho(campo)
+        if tipo is not None:
+            return campo.name, tipo
+    raise ValueError(f"El archivo no es un CSV válido: {mensaje}") from error
+
+
+def _escribir_bloques_csv(ruta_csv: str, destino: str, tipos: dict):
+    """
+    Una pasada de conversión. Devuelve (filas, columnas), o None si ha habido
+    que cambiar el tipo de alguna columna (ya anotado en `tipos`) y hay que repetirla.
+    """
+    try:
+        lector = _abrir_csv(ruta_csv, tipos)
+    except pa.ArrowInvalid as e:
+        _tipo_a_ensanchar(e)
+
+    esquema = lector.schema
+    # Las fechas se quedan como texto, igual que con pandas.read_csv sin parse_dates
+    temporales = [c.name for c in esquema if pa.types.is_temporal(c.type) and c.name not in tipos]
+    if temporales:
+        tipos.update({nombre: pa.string() for nombre in temporales})
+        return None
+
+    repetidas = {n for n in esquema.names if esquema.names.count(n) > 1}
+    if repetidas:
+        raise ValueError(f"El CSV tiene columnas repetidas: {sorted(repetidas)}")
+
+    filas = 0
+    with pq.ParquetWriter(destino, esquema) as writer:
+        try:
+            for lote in lector:
+                writer.write_table(pa.Table.from_batches([lote], schema=esquema), row_group_size=FILAS_POR_GRUPO)
+                filas += lote.num_rows
+        except pa.ArrowInvalid as e:
+            nombre, tipo = _tipo_a_ensanchar(e, esquema)
+            tipos[nombre] = tipo
+            return None
+    return filas, len(esquema.names)
+
+
+def csv_a_parquet(ruta_csv: str, destino: str) -> tuple:
+    """
+    Convierte un CSV local a Parquet por bloques (escritura atómica) y devuelve
+    (filas, columnas). Lanza ValueError si el archivo no es un CSV válido en
+    UTF-8 (filas con distinto número de campos, archivo vacío, etc.).
+    """
+    temporal = destino + ".tmp"
+    tipos = {}  # columna -> tipo Arrow forzado tras un error de conversión
+    try:
+        forma = None
+        while forma is None:
+            forma = _escribir_bloques_csv(ruta_csv, temporal, tipos)
+        os.replace(temporal, destino)
+        return forma
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+# =============================================================================
+# Esquema compacto (tipos pequeños al cargar en pandas)
+# =============================================================================
+# Por defecto los enteros se cargan como int64 y el texto como objetos Python.
+# El esquema compacto guarda, por columna, el entero más pequeño que cubre su
+# rango y qué columnas de texto tienen pocos valores distintos y se cargan como
+# `category`. Se aplica en Arrow, antes de crear el DataFrame, así que nunca se
+# llegan a crear los arrays grandes. Los float no se reducen: pandas acumula la
+# media de un float32 en float32 y cambiarían las estadísticas.
+
+CATEGORIA = "category"
+ENTEROS_COMPACTOS = ["int8", "int16", "int32"]
+
+
+def _tipo_compacto(columna: pa.ChunkedArray, num_filas: int, max_proporcion_categorias: float):
+    tipo = columna.type
+    if num_filas == 0:
+        return None
+    if pa.types.is_integer(tipo) and columna.null_count == 0:
+        # Con nulos pandas los carga como float64 de todas formas
+        extremos = pc.min_max(columna)
+        minimo, maximo = extremos["min"].as_py(), extremos["max"].as_py()
+        for nombre in ENTEROS_COMPACTOS:
+            limites = np.iinfo(nombre)
+            if limites.bits < tipo.bit_width and limites.min <= minimo and maximo <= limites.max:
+                return nombre
+    elif pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        if pc.count_distinct(columna).as_py() <= max_proporcion_categorias * num_filas:
+            return CATEGORIA
+    return None
+
+
+def inferir_esquema_compacto(ruta: str, max_proporcion_categorias: float) -> dict:
+    """{columna: tipo compacto} de un Parquet, leyendo las columnas de una en una."""
+    archivo = pq.ParquetFile(ruta)
+    num_filas = archivo.metadata.num_rows
+    esquema = {}
+    for nombre in archivo.schema_arrow.names:
+        tipo = _tipo_compacto(archivo.read(columns=[nombre]).column(0), num_filas, max_proporcion_categorias)
+        if tipo:
+            esquema[nombre] = tipo
+    return esquema
+
+
+def tabla_compacta_a_pandas(tabla: pa.Table, esquema_compacto: dict) -> pd.DataFrame:
+    categoricas = []
+    for i, nombre in enumerate(tabla.column_names):
+        tipo = esquema_compacto.get(nombre)
+        if tipo == CATEGORIA:
+            tabla = tabla.set_column(i, nombre, pc.dictionary_encode(tabla.column(i)))
+            categoricas.append(nombre)
+        elif tipo:
+            tabla = tabla.set_column(i, nombre, tabla.column(i).cast(tipo))
+    df = tabla.to_pandas()
+    for nombre in categoricas:
+        # Categorías en el mismo orden que unique()/get_dummies sobre el texto original
+        df[nombre] = df[nombre].cat.reorder_categories(sorted(df[nombre].cat.categories))
+    return df
+
+
+def leer_esquema(ruta: str) -> pa.Schema:
+    """Lee solo los metadatos del archivo, sin tocar los datos."""
+    return pq.read_schema(ruta)
+
+
+def parquet_a_csv_en_bloques(ruta: str):
+    """Generador que convierte un Parquet a CSV grupo por grupo, sin cargarlo entero."""
+    archivo = pq.ParquetFile(ruta)
+    for i in range(archivo.num_row_groups):
+        bloque = archivo.read_row_group(i).to_pandas()
+        yield bloque.to_csv(index=False, header=(i == 0)).encode("utf-8")
+    if archivo.num_row_groups == 0:
+        yield ",".join(archivo.schema_arrow.names).encode("utf-8") + b"\n"
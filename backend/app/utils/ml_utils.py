@@ -0,0 +1,72 @@
+# app/utils/ml_utils.py
+
+import numpy as np
+import torch
+
+# =============================================================================
+# Métricas de clasificación sobre tensores
+# =============================================================================
+# Todo sale de una matriz de confusión que se acumula con bincount, lote a
+# lote, sin pasar por sklearn. Los promedios 'weighted' y el zero_division=0
+# reproducen los de sklearn.metrics.
+
+
+def _a_tensor(valores) -> torch.Tensor:
+    if isinstance(valores, torch.Tensor):
+        return valores.detach().flatten().long()
+    return torch.as_tensor(np.asarray(valores)).flatten().long()
+
+
+def _dividir(numerador: torch.Tensor, denominador: torch.Tensor) -> torch.Tensor:
+    # Divisiones 0/0 valen 0, como zero_division=0 en sklearn
+    return torch.where(denominador > 0, numerador / denominador.clamp(min=1), torch.zeros_like(numerador))
+
+
+class MatrizConfusion:
+    def __init__(self, num_clases: int):
+        self.num_clases = num_clases
+        self.conteos = torch.zeros((num_clases, num_clases), dtype=torch.long)  # filas: real, columnas: predicción
+
+    def actualizar(self, y_real, y_pred):
+        """Suma un lote de etiquetas (enteros 0..num_clases-1, tensores o arrays)."""
+        y_real, y_pred = _a_tensor(y_real), _a_tensor(y_pred)
+        indices = y_real * self.num_clases + y_pred
+        self.conteos += torch.bincount(indices, minlength=self.num_clases ** 2).reshape(self.num_clases, self.num_clases)
+        return self
+
+    @classmethod
+    def desde_etiquetas(cls, y_real, y_pred, num_clases: int):
+        return cls(num_clases).actualizar(y_real, y_pred)
+
+    def _por_clase(self):
+        conteos = self.conteos.double()
+        aciertos = torch.diagonal(conteos)
+        soporte = conteos.sum(dim=1)
+        predichos = conteos.sum(dim=0)
+        return aciertos, soporte, predichos
+
+    def _ponderado(self, valores: torch.Tensor, soporte: torch.Tensor) -> float:
+        total = soporte.sum()
+        return float((valores * soporte).sum() / total) if total > 0 else 0.0
+
+    def accuracy(self) -> float:
+        total = self.conteos.sum()
+        return float(torch.diagonal(self.conteos).sum().double() / total) if total > 0 else 0.0
+
+    def precision(self) -> float:
+        aciertos, soporte, predichos = self._por_clase()
+        return self._ponderado(_dividir(aciertos, predichos), soporte)
+
+    def recall(self) -> float:
+        aciertos, soporte, _ = self._por_clase()
+        return self._ponderado(_dividir(aciertos, soporte), soporte)
+
+    def f1(self) -> float:
+        aciertos, soporte, predichos = self._por_clase()
+        # 2·tp / (2·tp + fp + fn) == 2·tp / (predichos + soporte)
+        return self._ponderado(_dividir(2 * aciertos, predichos + soporte), soporte)
+
+    def como_lista(self) -> list:
+        """Matriz como lista, solo con las clases que aparecen (igual que sklearn.confusion_matrix)."""
+        presentes = (self.conteos.sum(dim=1) + self.conteos.sum(dim=0)) > 0
+        return self.conteos[presentes][:, presentes].tolist()
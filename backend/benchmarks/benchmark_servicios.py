@@ -0,0 +1,287 @@
+# benchmarks/benchmark_servicios.py
+"""
+Benchmarks de los servicios de análisis, limpieza y entrenamiento.
+
+Genera datasets sintéticos (ver datos_sinteticos.py), ejecuta cada caso en un
+proceso nuevo contra un Supabase local (supabase_local.py) y guarda, por caso,
+tiempo de reloj, pico de memoria (RSS) y filas por segundo en un JSON.
+
+Uso, desde backend/:
+    python -m benchmarks.benchmark_servicios --filas 10000 100000 1000000 --salida resultados.json
+    python -m benchmarks.benchmark_servicios --filas 10000 --casos entrenamiento --modelos red_neuronal
+    python -m benchmarks.benchmark_servicios --comparar base.json resultados.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+VERSION_FORMATO = 1
+
+CASOS_ANALISIS = [
+    "analisis.cargar_dataset",
+    "analisis.estadisticas_dataset",
+    "analisis.obtener_columnas",
+    "analisis.calcular_correlacion",
+    "analisis.distribucion_clases",
+    "perfil.calcular_perfil",
+    "perfil.calcular_perfil_aproximado",
+]
+CASOS_LIMPIEZA = ["limpieza.limpiar_dataset"]
+MODELOS = ["clasificacion", "regresion", "red_neuronal"]
+
+PIPELINE_LIMPIEZA = {"pipeline": [
+    {"op": "strip"},
+    {"op": "imputar", "columnas": ["edad_victima"], "estrategia": "media"},
+    {"op": "eliminar_duplicados"},
+    {"op": "eliminar_nulos"},
+]}
+
+
+# =============================================================================
+# Dentro del proceso de cada caso
+# =============================================================================
+def _rss_pico_mb() -> float:
+    import resource
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB; macOS en bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def _preparar_entorno(dataset: dict, directorio: str):
+    from benchmarks.supabase_local import SupabaseLocal, instalar
+    from app.config import Config
+    import app.services.perfil_service  # noqa: F401  (se importan para instalar el cliente local en ellos)
+    import app.services.limpieza_service  # noqa: F401
+    import app.services.entrenamiento_service  # noqa: F401
+
+    cliente = SupabaseLocal(os.path.join(directorio, "storage"))
+    instalar(cliente)
+    cliente.table("datasets").insert({
+        "id": dataset["id"], "nombre": f"sintetico_{dataset['filas']}.parquet",
+        "archivo_url": dataset["archivo_url"], "usuario_id": "benchmark", "es_limpio": False
+    }).execute()
+
+    # Cada caso prepara sus propias features: no se reutilizan las de otro modelo
+    directorio_features = os.path.join(Config.DATASET_CACHE_DIR, "features")
+    shutil.rmtree(directorio_features, ignore_errors=True)
+    os.makedirs(directorio_features, exist_ok=True)
+    return cliente
+
+
+def _ejecutar_caso(caso: str, dataset: dict, modelo: str, opciones: dict) -> dict:
+    from benchmarks.datos_sinteticos import COLUMNAS_ENTRADA, OBJETIVO_CLASIFICACION, OBJETIVO_REGRESION
+
+    directorio = tempfile.mkdtemp(dir=opciones["directorio"])
+    resultado = {"caso": caso, "filas": dataset["filas"], "modelo": modelo, "error": None}
+    try:
+        cliente = _preparar_entorno(dataset, directorio)
+        from app.services import analisis_service, perfil_service
+        from app.services.limpieza_service import limpiar_dataset
+        from app.services.entrenamiento_service import ejecutar_entrenamiento
+
+        # Se construye la función a medir; lo previo (p. ej. cargar el DataFrame) no cuenta
+        dataset_id = dataset["id"]
+        if caso == "analisis.cargar_dataset":
+            funcion = lambda: analisis_service.obtener_dataframe_crudo(dataset_id)
+        elif caso == "perfil.calcular_perfil_aproximado":
+            # Lee el Parquet por bloques: no se carga el DataFrame antes
+            from app.services.cache_service import dataset_cache
+            from app.utils.file_utils import contar_filas_parquet
+            ruta = dataset_cache.obtener_ruta_columnar(dataset_id, dataset["archivo_url"])
+            esquema = dataset_cache.esquema_compacto(ruta)
+            funcion = lambda: perfil_service.calcular_perfil_aproximado(ruta, esquema, contar_filas_parquet(ruta))
+        elif caso.startswith("analisis.") or caso.startswith("perfil."):
+            df = analisis_service.obtener_dataframe_crudo(dataset_id)
+            modulo = perfil_service if caso.startswith("perfil.") else analisis_service
+            analisis = getattr(modulo, caso.split(".", 1)[1])
+            funcion = lambda: analisis(df)
+        elif caso == "limpieza.limpiar_dataset":
+            funcion = lambda: limpiar_dataset(dataset_id, PIPELINE_LIMPIEZA)
+        elif caso == "entrenamiento":
+            experimento = cliente.table("experimentos").insert({"estado": "en_cola", "dataset_id": dataset_id}).execute().data[0]
+            config = {
+                "dataset_id": dataset_id,
+                "tipo_modelo": modelo,
+                "columnas_entrada": COLUMNAS_ENTRADA,
+                "columna_objetivo": OBJETIVO_REGRESION if modelo == "regresion" else OBJETIVO_CLASIFICACION,
+                "validacion_split": 0.2,
+                "epocas": opciones["epocas"],
+                "tamano_lote": opciones["tamano_lote"],
+                "tasa_aprendizaje": 0.001,
+            }
+            funcion = lambda: ejecutar_entrenamiento(experimento["id"], config)
+        else:
+            raise ValueError(f"Caso desconocido: {caso}")
+
+        resultado["rss_inicial_mb"] = round(_rss_pico_mb(), 1)
+        inicio = time.perf_counter()
+        with open(os.devnull, "w") as nulo:
+            salida_original, sys.stdout = sys.stdout, nulo  # los servicios imprimen su progreso
+            try:
+                funcion()
+            finally:
+                sys.stdout = salida_original
+        segundos = time.perf_counter() - inicio
+
+        if caso == "entrenamiento":
+            fila = cliente.table("experimentos").select("estado, metricas").eq("id", experimento["id"]).single().execute().data
+            if fila["estado"] != "completado":
+                resultado["error"] = json.loads(fila.get("metricas") or "{}").get("error", fila["estado"])
+
+        resultado.update({
+            "segundos": round(segundos, 4),
+            "filas_por_segundo": round(dataset["filas"] / segundos, 1) if segundos > 0 else None,
+            "rss_pico_mb": round(_rss_pico_mb(), 1),
+        })
+    except Exception as e:
+        resultado["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+    return resultado
+
+
+# =============================================================================
+# Proceso principal
+# =============================================================================
+def _preparar_dataset(filas: int, semilla: int, directorio: str) -> dict:
+    """Genera el dataset y lo deja en la caché local de datasets (con su esquema compacto ya inferido)."""
+    from benchmarks.datos_sinteticos import escribir_dataset
+    from benchmarks.supabase_local import URL_STORAGE
+    from app.services.cache_service import dataset_cache
+
+    dataset = {
+        "id": f"sintetico-{filas}-{semilla}",
+        "filas": filas,
+        "archivo_url": f"{URL_STORAGE}/datasets/benchmark/sintetico_{filas}_{semilla}.parquet",
+    }
+    ruta = dataset_cache.ruta_en_cache(dataset["id"], dataset["archivo_url"])
+    if ruta is None:
+        print(f"-> Generando dataset sintético de {filas:,} filas...")
+        fd, temporal = tempfile.mkstemp(dir=directorio, suffix=".parquet")
+        os.close(fd)
+        escribir_dataset(temporal, filas, semilla)
+        dataset_cache.importar(dataset["id"], dataset["archivo_url"], temporal)
+        ruta = dataset_cache.obtener_ruta_local(dataset["id"], dataset["archivo_url"])
+    dataset_cache.esquema_compacto(ruta)
+    return dataset
+
+
+def _version() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def ejecutar(args) -> dict:
+    os.makedirs(args.directorio, exist_ok=True)
+    # La caché de datasets se comparte entre casos (los archivos); la memoria es de cada proceso
+    os.environ["DATASET_CACHE_DIR"] = os.path.join(args.directorio, "cache")
+    contexto = multiprocessing.get_context("spawn")
+
+    casos = []
+    if "analisis" in args.casos:
+        casos += [(c, None) for c in CASOS_ANALISIS]
+    if "limpieza" in args.casos:
+        casos += [(c, None) for c in CASOS_LIMPIEZA]
+
+    resultados = []
+    for filas in args.filas:
+        dataset = _preparar_dataset(filas, args.semilla, args.directorio)
+        casos_tamano = list(casos)
+        if "entrenamiento" in args.casos and filas <= args.max_filas_entrenamiento:
+            casos_tamano += [("entrenamiento", modelo) for modelo in args.modelos]
+
+        for caso, modelo in casos_tamano:
+            opciones = {"directorio": args.directorio, "epocas": args.epocas, "tamano_lote": args.tamano_lote}
+            # Un proceso nuevo por caso: memoria y cachés en frío, y un pico de RSS propio
+            with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+                try:
+                    resultado = executor.submit(_ejecutar_caso, caso, dataset, modelo, opciones).result()
+                except Exception as e:  # p. ej. el proceso murió por falta de memoria
+                    resultado = {"caso": caso, "filas": filas, "modelo": modelo, "error": f"{type(e).__name__}: {e}"}
+            resultados.append(resultado)
+            _imprimir(resultado)
+
+    return {
+        "version_formato": VERSION_FORMATO,
+        "version": _version(),
+        "fecha": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parametros": {"semilla": args.semilla, "epocas": args.epocas, "tamano_lote": args.tamano_lote},
+        "resultados": resultados,
+    }
+
+
+def _nombre(resultado: dict) -> str:
+    return resultado["caso"] + (f"[{resultado['modelo']}]" if resultado.get("modelo") else "")
+
+
+def _imprimir(resultado: dict):
+    if resultado.get("error"):
+        print(f"{_nombre(resultado):45} {resultado['filas']:>11,}  ERROR: {resultado['error']}")
+        return
+    print(f"{_nombre(resultado):45} {resultado['filas']:>11,}  {resultado['segundos']:>10.3f} s"
+          f"  {resultado['filas_por_segundo'] or 0:>14,.0f} filas/s  {resultado['rss_pico_mb']:>9.1f} MB")
+
+
+def comparar(ruta_base: str, ruta_nueva: str):
+    """Imprime, por caso y tamaño, el cambio de tiempo y de pico de memoria entre dos ejecuciones."""
+    with open(ruta_base) as f:
+        base = json.load(f)
+    with open(ruta_nueva) as f:
+        nueva = json.load(f)
+    clave = lambda r: (r["caso"], r.get("modelo"), r["filas"])
+    anteriores = {clave(r): r for r in base["resultados"] if not r.get("error")}
+
+    print(f"{'caso':45} {'filas':>11}  {'tiempo':>8}  {'memoria':>8}   ({base.get('version')} -> {nueva.get('version')})")
+    for r in nueva["resultados"]:
+        anterior = anteriores.get(clave(r))
+        if anterior is None or r.get("error"):
+            continue
+        print(f"{_nombre(r):45} {r['filas']:>11,}  {r['segundos'] / anterior['segundos']:>7.2f}x"
+              f"  {r['rss_pico_mb'] / anterior['rss_pico_mb']:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de los servicios de análisis, limpieza y entrenamiento.")
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--casos", nargs="+", choices=["analisis", "limpieza", "entrenamiento"],
+                        default=["analisis", "limpieza", "entrenamiento"])
+    parser.add_argument("--modelos", nargs="+", choices=MODELOS, default=MODELOS)
+    parser.add_argument("--max-filas-entrenamiento", type=int, default=1_000_000,
+                        help="Los tamaños mayores se omiten en los casos de entrenamiento")
+    parser.add_argument("--epocas", type=int, default=5)
+    parser.add_argument("--tamano-lote", type=int, default=256)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--directorio", default=os.path.join(tempfile.gettempdir(), "criminality_benchmarks"),
+                        help="Datasets generados y caché; se reutilizan entre ejecuciones")
+    parser.add_argument("--salida", help="Ruta del JSON de resultados")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"), help="Compara dos JSON de resultados")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+
+    informe = ejecutar(args)
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(informe, f, indent=2)
+        print(f"-> Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
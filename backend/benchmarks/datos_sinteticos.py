@@ -0,0 +1,96 @@
+# benchmarks/datos_sinteticos.py
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.utils.file_utils import FILAS_POR_GRUPO
+
+# =============================================================================
+# Datasets sintéticos con forma de datos de criminalidad
+# =============================================================================
+# Columnas numéricas y de texto con pocas categorías, nulos y filas duplicadas.
+# Se generan y escriben por bloques, así que se pueden crear datasets de
+# decenas de millones de filas sin tenerlos enteros en memoria. Con la misma
+# semilla el archivo es idéntico entre ejecuciones.
+
+FILAS_POR_BLOQUE = 1_000_000
+PROPORCION_DUPLICADOS = 0.02
+
+DISTRITOS = [f"Distrito {i:02d}" for i in range(1, 26)]
+TIPOS_DELITO = [
+    "Robo", "Hurto", "Asalto", "Vandalismo", "Fraude", "Homicidio", "Secuestro", "Extorsión",
+    "Narcotráfico", "Violencia doméstica", "Robo de vehículo", "Allanamiento", "Estafa",
+    "Amenazas", "Lesiones", "Contrabando", "Falsificación", "Receptación", "Tráfico de armas",
+    "Ciberdelito", "Abuso sexual", "Acoso", "Desorden público", "Daños", "Trata de personas",
+    "Usurpación", "Corrupción", "Lavado de dinero", "Evasión", "Resistencia a la autoridad"
+]
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+ARMAS = ["Ninguna", "Arma blanca", "Arma de fuego", "Objeto contundente", "Otra"]
+
+COLUMNAS_ENTRADA = ["distrito", "tipo_delito", "dia_semana", "hora", "latitud", "longitud",
+                    "edad_victima", "num_implicados", "arma"]
+OBJETIVO_CLASIFICACION = "arrestado"
+OBJETIVO_REGRESION = "gravedad"
+
+
+def generar_bloque(filas: int, rng: np.random.Generator) -> pd.DataFrame:
+    tipo = rng.integers(0, len(TIPOS_DELITO), filas)
+    hora = rng.integers(0, 24, filas)
+    arma = rng.choice(len(ARMAS), filas, p=[0.6, 0.15, 0.1, 0.1, 0.05])
+    num_implicados = rng.integers(1, 7, filas)
+
+    # Objetivos con algo de señal para que los modelos tengan qué aprender
+    gravedad = tipo * 0.3 + arma * 1.5 + num_implicados * 0.4 + (hora >= 22) * 1.0 + rng.normal(0, 1, filas)
+    logit = -1.5 + arma * 0.6 + (num_implicados > 3) * 0.8 + rng.normal(0, 1, filas)
+    arrestado = (logit > 0).astype(np.int64)
+
+    df = pd.DataFrame({
+        "fecha": pd.to_datetime("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, filas), unit="D"),
+        "distrito": np.asarray(DISTRITOS, dtype=object)[rng.integers(0, len(DISTRITOS), filas)],
+        "tipo_delito": np.asarray(TIPOS_DELITO, dtype=object)[tipo],
+        "dia_semana": np.asarray(DIAS_SEMANA, dtype=object)[rng.integers(0, 7, filas)],
+        "hora": hora,
+        "latitud": rng.normal(-12.05, 0.08, filas),
+        "longitud": rng.normal(-77.04, 0.08, filas),
+        "edad_victima": rng.normal(35, 14, filas).clip(0, 99).round(),
+        "num_implicados": num_implicados,
+        "arma": np.asarray(ARMAS, dtype=object)[arma],
+        OBJETIVO_REGRESION: gravedad,
+        OBJETIVO_CLASIFICACION: arrestado,
+    })
+    df["fecha"] = df["fecha"].dt.strftime("%Y-%m-%d")
+
+    # Nulos
+    df.loc[rng.random(filas) < 0.05, "edad_victima"] = np.nan
+    df.loc[rng.random(filas) < 0.03, "distrito"] = None
+    df.loc[rng.random(filas) < 0.01, "latitud"] = np.nan
+
+    # Duplicados exactos de otras filas del bloque
+    n_duplicados = int(filas * PROPORCION_DUPLICADOS)
+    if n_duplicados:
+        destino = rng.choice(filas, n_duplicados, replace=False)
+        origen = rng.choice(filas, n_duplicados)
+        for col in df.columns:
+            valores = df[col].to_numpy(copy=True)
+            valores[destino] = valores[origen]
+            df[col] = valores
+    return df
+
+
+def escribir_dataset(ruta: str, filas: int, semilla: int = 42) -> str:
+    """Escribe un Parquet de `filas` filas bloque a bloque y devuelve su ruta."""
+    rng = np.random.default_rng(semilla)
+    writer = None
+    try:
+        for inicio in range(0, filas, FILAS_POR_BLOQUE):
+            bloque = generar_bloque(min(FILAS_POR_BLOQUE, filas - inicio), rng)
+            tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(ruta, tabla.schema)
+            writer.write_table(tabla.cast(writer.schema), row_group_size=FILAS_POR_GRUPO)
+    finally:
+        if writer is not None:
+            writer.close()
+    return ruta
@@ -0,0 +1,172 @@
+# benchmarks/supabase_local.py
+
+import copy
+import os
+import shutil
+import sys
+import threading
+import uuid
+from urllib.parse import quote
+
+# =============================================================================
+# Sustituto local de Supabase para los benchmarks
+# =============================================================================
+# Implementa la parte del cliente que usan los servicios: tablas en memoria
+# (select/insert/update/delete con eq, in_, not_, order, limit, single y
+# count) y Storage sobre un directorio local. Así se mide el código del
+# backend sin red ni base de datos de por medio.
+
+URL_STORAGE = "http://supabase.local/storage/v1/object/public"
+
+
+class _Respuesta:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class _Consulta:
+    def __init__(self, filas: list, lock: threading.Lock):
+        self._filas = filas
+        self._lock = lock
+        self._accion, self._valores = "select", None
+        self._columnas, self._contar = None, False
+        self._filtros, self._orden, self._limite = [], [], None
+        self._unica, self._negar = False, False
+
+    # --- Acciones ---
+    def select(self, columnas: str = "*", count: str = None):
+        self._columnas = None if columnas.strip() == "*" else [c.strip() for c in columnas.split(",")]
+        self._contar = count is not None
+        return self
+
+    def insert(self, valores):
+        self._accion, self._valores = "insert", valores
+        return self
+
+    def update(self, valores: dict):
+        self._accion, self._valores = "update", valores
+        return self
+
+    def delete(self):
+        self._accion = "delete"
+        return self
+
+    # --- Filtros y modificadores ---
+    @property
+    def not_(self):
+        self._negar = True
+        return self
+
+    def _filtro(self, condicion):
+        negar, self._negar = self._negar, False
+        self._filtros.append((lambda fila: not condicion(fila)) if negar else condicion)
+        return self
+
+    def eq(self, columna: str, valor):
+        return self._filtro(lambda fila: str(fila.get(columna)) == str(valor))
+
+    def in_(self, columna: str, valores: list):
+        return self._filtro(lambda fila: fila.get(columna) in valores)
+
+    def order(self, columna: str, desc: bool = False):
+        self._orden.append((columna, desc))
+        return self
+
+    def limit(self, n: int):
+        self._limite = n
+        return self
+
+    def single(self):
+        self._unica = True
+        return self
+
+    # --- Ejecución ---
+    def _coinciden(self) -> list:
+        return [fila for fila in self._filas if all(f(fila) for f in self._filtros)]
+
+    def execute(self) -> _Respuesta:
+        with self._lock:
+            if self._accion == "insert":
+                nuevas = self._valores if isinstance(self._valores, list) else [self._valores]
+                nuevas = [{"id": str(uuid.uuid4()), **copy.deepcopy(fila)} for fila in nuevas]
+                self._filas.extend(nuevas)
+                return _Respuesta(nuevas)
+
+            filas = self._coinciden()
+            if self._accion == "update":
+                for fila in filas:
+                    fila.update(copy.deepcopy(self._valores))
+                return _Respuesta([dict(f) for f in filas])
+            if self._accion == "delete":
+                for fila in filas:
+                    self._filas.remove(fila)
+                return _Respuesta(filas)
+
+            total = len(filas)
+            for columna, desc in reversed(self._orden):
+                filas = sorted(filas, key=lambda f: (f.get(columna) is None, f.get(columna)), reverse=desc)
+            if self._limite is not None:
+                filas = filas[:self._limite]
+            if self._columnas is not None:
+                filas = [{c: f.get(c) for c in self._columnas} for f in filas]
+            else:
+                filas = [dict(f) for f in filas]
+            if self._unica:
+                return _Respuesta(filas[0] if filas else None)
+            return _Respuesta(filas, total if self._contar else None)
+
+
+class _Bucket:
+    def __init__(self, directorio: str, nombre: str):
+        self.nombre = nombre
+        self.directorio = os.path.join(directorio, nombre)
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def _ruta(self, ruta: str) -> str:
+        return os.path.join(self.directorio, ruta.replace("/", os.sep))
+
+    def upload(self, ruta: str, archivo):
+        destino = self._ruta(ruta)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        if isinstance(archivo, (bytes, bytearray)):
+            with open(destino, "wb") as f:
+                f.write(archivo)
+        else:
+            shutil.copyfile(archivo, destino)
+
+    def download(self, ruta: str) -> bytes:
+        with open(self._ruta(ruta), "rb") as f:
+            return f.read()
+
+    def get_public_url(self, ruta: str) -> str:
+        return f"{URL_STORAGE}/{self.nombre}/{quote(ruta)}"
+
+
+class _Storage:
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+
+    def from_(self, bucket: str) -> _Bucket:
+        return _Bucket(self.directorio, bucket)
+
+
+class SupabaseLocal:
+    def __init__(self, directorio_storage: str):
+        self._tablas = {}
+        self._lock = threading.Lock()
+        self.storage = _Storage(directorio_storage)
+
+    def table(self, nombre: str) -> _Consulta:
+        with self._lock:
+            filas = self._tablas.setdefault(nombre, [])
+        return _Consulta(filas, self._lock)
+
+
+def instalar(cliente: SupabaseLocal):
+    """Sustituye el cliente `supabase` en todos los módulos de la app ya importados."""
+    from app.services import supabase_service
+    original = supabase_service.supabase
+    for modulo in list(sys.modules.values()):
+        if getattr(modulo, "__name__", "").startswith("app.") and getattr(modulo, "supabase", None) is original:
+            modulo.supabase = cliente
@@ -0,0 +1,3 @@
+-- Perfil precalculado de cada dataset (columnas, estadísticas, distribución
+-- de clases y correlación). Lo escribe el backend al crear el dataset.
+ALTER TABLE datasets ADD COLUMN IF NOT EXISTS perfil jsonb;
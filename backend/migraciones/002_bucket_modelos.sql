@@ -0,0 +1,5 @@
+-- Bucket de Storage donde el backend guarda los modelos entrenados
+-- (<experimento_id>.joblib) que usa /api/experimentos/<id>/predecir.
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('modelos', 'modelos', false)
+ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,12 @@
+-- Barridos de hiperparámetros: cada prueba es un experimento enlazado a su
+-- barrido por `barrido_id`.
+CREATE TABLE IF NOT EXISTS barridos (
+    id uuid PRIMARY KEY,
+    nombre text NOT NULL,
+    dataset_id uuid,
+    configuracion jsonb,
+    fecha_creacion timestamptz DEFAULT now()
+);
+
+ALTER TABLE experimentos ADD COLUMN IF NOT EXISTS barrido_id uuid REFERENCES barridos(id) ON DELETE CASCADE;
+CREATE INDEX IF NOT EXISTS experimentos_barrido_id_idx ON experimentos (barrido_id);
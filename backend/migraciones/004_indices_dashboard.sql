@@ -0,0 +1,4 @@
+-- Índices para las consultas agregadas del dashboard (/api/estadisticas):
+-- el último experimento por fecha y el conteo de experimentos activos.
+CREATE INDEX IF NOT EXISTS experimentos_fecha_creacion_idx ON experimentos (fecha_creacion DESC);
+CREATE INDEX IF NOT EXISTS experimentos_estado_idx ON experimentos (estado);
@@ -0,0 +1,3 @@
+-- Paginación por cursor del listado de experimentos: orden y filtro por
+-- (fecha_creacion, id) sin OFFSET.
+CREATE INDEX IF NOT EXISTS experimentos_fecha_id_idx ON experimentos (fecha_creacion DESC, id DESC);
@@ -0,0 +1,5 @@
+-- Bucket de Storage con los resultados a resolución completa de cada
+-- experimento (<experimento_id>.npz); en la tabla solo se guardan resúmenes.
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('resultados', 'resultados', false)
+ON CONFLICT (id) DO NOTHING;
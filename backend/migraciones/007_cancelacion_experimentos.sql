@@ -0,0 +1,3 @@
+-- Cancelación pedida para un experimento. La escribe el worker web que recibe
+-- la petición y la consulta el entrenamiento, esté en el pool que esté.
+ALTER TABLE experimentos ADD COLUMN IF NOT EXISTS cancelacion_solicitada boolean NOT NULL DEFAULT false;
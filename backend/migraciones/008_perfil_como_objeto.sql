@@ -0,0 +1,3 @@
+-- Los perfiles se guardaban como una cadena JSON dentro de la columna jsonb.
+-- Ahora se guarda el objeto; se convierten los existentes para poder consultarlos.
+UPDATE datasets SET perfil = (perfil #>> '{}')::jsonb WHERE jsonb_typeof(perfil) = 'string';
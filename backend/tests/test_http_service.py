@@ -0,0 +1,146 @@
+# tests/test_http_service.py
+
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+requests = pytest.importorskip("requests")
+
+from app.config import Config  # noqa: E402
+from app.services import http_service  # noqa: E402
+
+# =============================================================================
+# descargar_a_archivo contra un servidor HTTP local
+# =============================================================================
+# Cada ruta del servidor tiene un comportamiento que recibe el número de
+# petición (1, 2...) a esa ruta, para fallar las primeras veces y responder
+# bien después.
+
+CUERPO = bytes(range(256)) * 1024  # 256 KB
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+def _manejador(comportamientos: dict, visitas: dict):
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            visitas[self.path] = visitas.get(self.path, 0) + 1
+            try:
+                comportamientos[self.path](self, visitas[self.path])
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # el cliente ya dio la petición por fallida
+
+    return Manejador
+
+
+def _responder(manejador, cuerpo: bytes = CUERPO, cortar_en: int = None, espera: float = 0):
+    if espera:
+        time.sleep(espera)
+    manejador.send_response(200)
+    manejador.send_header("Content-Length", str(len(cuerpo)))
+    manejador.end_headers()
+    manejador.wfile.write(cuerpo if cortar_en is None else cuerpo[:cortar_en])
+    manejador.wfile.flush()
+    if cortar_en is not None:
+        manejador.close_connection = True  # corta el cuerpo a medias
+
+
+def _estado(manejador, codigo: int):
+    manejador.send_response(codigo)
+    manejador.send_header("Content-Length", "0")
+    manejador.end_headers()
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    monkeypatch.setattr(Config, "HTTP_REINTENTOS", 2)
+    monkeypatch.setattr(Config, "HTTP_BACKOFF_SEGUNDOS", 0)
+    monkeypatch.setattr(Config, "HTTP_TIMEOUT_LECTURA", 0.3)
+    # Sesiones nuevas, con la configuración de arriba
+    monkeypatch.setattr(http_service, "_local", threading.local())
+
+    comportamientos, visitas = {}, {}
+    srv = _Servidor(("127.0.0.1", 0), _manejador(comportamientos, visitas))
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}", comportamientos, visitas
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_descarga_completa(servidor, tmp_path):
+    url, comportamientos, visitas = servidor
+    comportamientos["/ok"] = lambda m, n: _responder(m)
+    destino = tmp_path / "ok.bin"
+
+    sha = http_service.descargar_a_archivo(f"{url}/ok", str(destino))
+
+    assert destino.read_bytes() == CUERPO
+    assert sha == hashlib.sha256(CUERPO).hexdigest()
+    assert visitas["/ok"] == 1
+
+
+def test_reintenta_estados_transitorios(servidor, tmp_path):
+    url, comportamientos, visitas = servidor
+    comportamientos["/503"] = lambda m, n: _estado(m, 503) if n <= 2 else _responder(m)
+    destino = tmp_path / "503.bin"
+
+    http_service.descargar_a_archivo(f"{url}/503", str(destino))
+
+    assert destino.read_bytes() == CUERPO
+    assert visitas["/503"] == 3
+
+
+def test_no_reintenta_errores_del_cliente(servidor, tmp_path):
+    url, comportamientos, visitas = servidor
+    comportamientos["/404"] = lambda m, n: _estado(m, 404)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        http_service.descargar_a_archivo(f"{url}/404", str(tmp_path / "404.bin"))
+    assert visitas["/404"] == 1
+
+
+def test_reinicia_descarga_cortada_a_medias(servidor, tmp_path):
+    url, comportamientos, visitas = servidor
+    comportamientos["/cortada"] = lambda m, n: _responder(m, cortar_en=len(CUERPO) // 3) if n == 1 else _responder(m)
+    destino = tmp_path / "cortada.bin"
+
+    sha = http_service.descargar_a_archivo(f"{url}/cortada", str(destino))
+
+    # El archivo se reescribe desde cero: ni restos del primer intento ni bytes repetidos
+    assert destino.read_bytes() == CUERPO
+    assert sha == hashlib.sha256(CUERPO).hexdigest()
+    assert visitas["/cortada"] == 2
+
+
+def test_reintenta_tras_timeout_de_lectura(servidor, tmp_path):
+    url, comportamientos, visitas = servidor
+    comportamientos["/lenta"] = lambda m, n: _responder(m, espera=1.0) if n == 1 else _responder(m)
+    destino = tmp_path / "lenta.bin"
+
+    inicio = time.monotonic()
+    http_service.descargar_a_archivo(f"{url}/lenta", str(destino))
+
+    assert destino.read_bytes() == CUERPO
+    assert visitas["/lenta"] >= 2
+    assert time.monotonic() - inicio < 1.0  # no esperó a la respuesta lenta
+
+
+def test_falla_al_agotar_los_reintentos(servidor, tmp_path):
+    url, comportamientos, visitas = servidor
+    comportamientos["/siempre_cortada"] = lambda m, n: _responder(m, cortar_en=100)
+
+    with pytest.raises((requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError)):
+        http_service.descargar_a_archivo(f"{url}/siempre_cortada", str(tmp_path / "cortada.bin"))
+    assert visitas["/siempre_cortada"] == Config.HTTP_REINTENTOS + 1
@@ -0,0 +1,52 @@
+# tests/test_ml_utils.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+metrics = pytest.importorskip("sklearn.metrics")
+
+from app.utils.ml_utils import MatrizConfusion  # noqa: E402
+
+# MatrizConfusion debe dar los mismos números que sklearn.metrics con
+# average='weighted' y zero_division=0, también con clases que no aparecen.
+
+NUM_CLASES = 6
+
+
+def _etiquetas(semilla: int, n: int = 500):
+    rng = np.random.default_rng(semilla)
+    # La clase 5 no aparece nunca; la 4 solo en las predicciones; la 3 solo en las reales
+    y_real = rng.choice([0, 1, 2, 3], size=n, p=[0.5, 0.3, 0.15, 0.05])
+    y_pred = np.where(rng.random(n) < 0.7, y_real, rng.choice([0, 1, 2, 4], size=n))
+    y_pred[y_pred == 3] = 0
+    return y_real, y_pred
+
+
+@pytest.mark.parametrize("semilla", [0, 1, 2])
+def test_metricas_ponderadas_como_sklearn(semilla):
+    y_real, y_pred = _etiquetas(semilla)
+    matriz = MatrizConfusion.desde_etiquetas(y_real, y_pred, NUM_CLASES)
+
+    assert matriz.accuracy() == pytest.approx(metrics.accuracy_score(y_real, y_pred))
+    assert matriz.precision() == pytest.approx(metrics.precision_score(y_real, y_pred, average="weighted", zero_division=0))
+    assert matriz.recall() == pytest.approx(metrics.recall_score(y_real, y_pred, average="weighted", zero_division=0))
+    assert matriz.f1() == pytest.approx(metrics.f1_score(y_real, y_pred, average="weighted", zero_division=0))
+
+
+def test_matriz_solo_con_clases_presentes():
+    y_real, y_pred = _etiquetas(3)
+    matriz = MatrizConfusion.desde_etiquetas(y_real, y_pred, NUM_CLASES)
+
+    assert matriz.como_lista() == metrics.confusion_matrix(y_real, y_pred).tolist()
+
+
+def test_acumular_por_lotes_da_lo_mismo():
+    y_real, y_pred = _etiquetas(4)
+    por_lotes = MatrizConfusion(NUM_CLASES)
+    for inicio in range(0, len(y_real), 64):
+        por_lotes.actualizar(y_real[inicio:inicio + 64], y_pred[inicio:inicio + 64])
+    completa = MatrizConfusion.desde_etiquetas(y_real, y_pred, NUM_CLASES)
+
+    assert por_lotes.conteos.tolist() == completa.conteos.tolist()
+    assert por_lotes.f1() == completa.f1()
@@ -5,12 +5,16 @@ import { LineChart, Line, BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, L
 import type { Experimento, MetricasEpoca } from '../tipos'
 import { useVoiceGuideContext } from '../contextos/VoiceGuideContext'
 
+const ESTADOS_TERMINALES = ['completado', 'error', 'cancelado']
+const INTERVALO_ESTADO_MS = 2000
+
 export default function Resultados() {
   const [searchParams, setSearchParams] = useSearchParams()
   const experimentoId = searchParams.get('experimento')
   const [experimento, setExperimento] = useState<Experimento | null>(null)
   const [metricas, setMetricas] = useState<MetricasEpoca[]>([])
   const [experimentos, setExperimentos] = useState<Experimento[]>([])
+  const [siguienteCursor, setSiguienteCursor] = useState<string | null>(null)
   const [vistaActiva, setVistaActiva] = useState<'metricas' | 'comparacion' | 'avanzado'>('metricas')
   const [eliminando, setEliminando] = useState<string | null>(null)
   const [modalEliminar, setModalEliminar] = useState<Experimento | null>(null)
@@ -24,6 +28,28 @@ export default function Resultados() {
     cargarTodosExperimentos()
   }, [experimentoId])
 
+  // Mientras el entrenamiento está en cola o entrenando se consulta su estado
+  // (lo lee de la base de datos, así que responde cualquier worker del backend);
+  // al terminar se recarga el experimento con sus resultados
+  useEffect(() => {
+    if (!experimentoId || !experimento || ESTADOS_TERMINALES.includes(experimento.estado)) return
+    const intervalo = setInterval(async () => {
+      try {
+        const { data } = await axios.get(`http://localhost:5000/api/entrenamientos/${experimentoId}`)
+        if (data.terminado) {
+          clearInterval(intervalo)
+          cargarExperimento(experimentoId)
+          cargarTodosExperimentos()
+        } else {
+          setExperimento(previo => previo && previo.estado !== data.estado ? { ...previo, estado: data.estado } : previo)
+        }
+      } catch (error) {
+        console.error('Error al consultar el estado del entrenamiento:', error)
+      }
+    }, INTERVALO_ESTADO_MS)
+    return () => clearInterval(intervalo)
+  }, [experimentoId, experimento?.estado])
+
   const cargarExperimento = async (id: string) => {
     try {
       const { data } = await axios.get(`http://localhost:5000/api/experimentos/${id}`)
@@ -34,10 +60,14 @@ export default function Resultados() {
     }
   }
 
-  const cargarTodosExperimentos = async () => {
+  // El listado llega paginado; la cabecera X-Siguiente-Cursor indica si hay más
+  const cargarTodosExperimentos = async (cursor?: string) => {
     try {
-      const { data } = await axios.get('http://localhost:5000/api/experimentos')
-      setExperimentos(data)
+      const { data, headers } = await axios.get('http://localhost:5000/api/experimentos', {
+        params: cursor ? { cursor } : {}
+      })
+      setExperimentos(previos => cursor ? [...previos, ...data] : data)
+      setSiguienteCursor(headers['x-siguiente-cursor'] || null)
     } catch (error) {
       console.error('Error al cargar experimentos:', error)
     }
@@ -90,10 +120,24 @@ export default function Resultados() {
     return datos
   }
 
+  const tieneDistribucionErrores = () => {
+    const distribucion = experimento?.distribucion_errores
+    if (!distribucion) return false
+    return Array.isArray(distribucion) ? distribucion.length > 0 : distribucion.frecuencias.length > 0
+  }
+
   const prepararDatosDistribucionErrores = () => {
-    if (!experimento?.distribucion_errores || experimento.distribucion_errores.length === 0) return []
-    
-    const errores = experimento.distribucion_errores
+    if (!experimento?.distribucion_errores || !tieneDistribucionErrores()) return []
+
+    // Los experimentos nuevos guardan el histograma ya calculado
+    const distribucion = experimento.distribucion_errores
+    if (!Array.isArray(distribucion)) {
+      return distribucion.frecuencias
+        .map((frecuencia, i) => ({ rango: distribucion.bordes[i].toFixed(0), frecuencia }))
+        .filter(h => h.frecuencia > 0)
+    }
+
+    const errores = distribucion
     const min = Math.min(...errores)
     const max = Math.max(...errores)
     const bins = 12
@@ -122,7 +166,7 @@ export default function Resultados() {
           metricaPrincipal: esClasificacion 
             ? Number((e.metricas.precision * 100).toFixed(2))
             : Number((e.metricas.r2_score * 100).toFixed(2)),
-          tiempo: e.tiempo_por_epoca ? Number(e.tiempo_por_epoca.reduce((a, b) => a + b, 0).toFixed(2)) : 0
+          tiempo: e.tiempo_total ? Number(e.tiempo_total.toFixed(2)) : 0
         }
       })
   }
@@ -223,7 +267,7 @@ export default function Resultados() {
               <div className="flex items-center gap-3">
                 <span className={`badge text-base px-5 py-2 ${
                   experimento.estado === 'completado' ? 'badge-success' :
-                  experimento.estado === 'entrenando' ? 'badge-warning' : 'badge-error'
+                  experimento.estado === 'entrenando' || experimento.estado === 'en_cola' ? 'badge-warning' : 'badge-error'
                 }`}>
                   {experimento.estado}
                 </span>
@@ -315,7 +359,9 @@ export default function Resultados() {
                     <span>Tiempo por Época</span>
                   </h3>
                   <ResponsiveContainer width="100%" height={300}>
-                    <BarChart data={experimento.tiempo_por_epoca.map((t, i) => ({ epoca: i + 1, tiempo: Number(t.toFixed(2)) }))}>
+                    <BarChart data={experimento.tiempo_por_epoca.map((t, i) => typeof t === 'number'
+                      ? { epoca: i + 1, tiempo: Number(t.toFixed(2)) }
+                      : { epoca: t.epoca, tiempo: Number(t.tiempo.toFixed(2)) })}>
                       <CartesianGrid strokeDasharray="3 3" stroke="#e2e8f0" />
                       <XAxis dataKey="epoca" stroke="#64748b" />
                       <YAxis stroke="#64748b" label={{ value: 'Segundos', angle: -90, position: 'insideLeft' }} />
@@ -416,7 +462,7 @@ export default function Resultados() {
             </div>
           )}
 
-          {experimento.distribucion_errores && experimento.distribucion_errores.length > 0 && (
+          {tieneDistribucionErrores() && (
             <div className="card p-6">
               <h3 className="text-2xl font-bold text-slate-900 mb-6 flex items-center space-x-2">
                 <svg className="w-7 h-7 text-orange-600" fill="none" viewBox="0 0 24 24" stroke="currentColor">
@@ -561,7 +607,7 @@ export default function Resultados() {
               <div className="flex items-center gap-3">
                 <span className={`badge ${
                   exp.estado === 'completado' ? 'badge-success' :
-                  exp.estado === 'entrenando' ? 'badge-warning' : 'badge-error'
+                  exp.estado === 'entrenando' || exp.estado === 'en_cola' ? 'badge-warning' : 'badge-error'
                 }`}>
                   {exp.estado}
                 </span>
@@ -581,6 +627,15 @@ export default function Resultados() {
             </div>
           ))}
 
+          {siguienteCursor && (
+            <button
+              onClick={() => cargarTodosExperimentos(siguienteCursor)}
+              className="w-full py-3 rounded-xl bg-slate-100 hover:bg-slate-200 text-slate-700 font-semibold transition-all"
+            >
+              Cargar más experimentos
+            </button>
+          )}
+
           {experimentos.length === 0 && (
             <div className="text-center py-12">
               <div className="w-20 h-20 mx-auto mb-4 rounded-full bg-slate-100 flex items-center justify-center">
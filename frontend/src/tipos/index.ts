@@ -19,6 +19,7 @@ export interface ColumnaStat {
   min?: number
   max?: number
   desviacion?: number
+  cuantiles?: { p25: number | null; p50: number | null; p75: number | null }
 }
 
 export interface ConfiguracionEntrenamiento {
@@ -30,6 +31,13 @@ export interface ConfiguracionEntrenamiento {
   epocas: number
   tamano_lote: number
   validacion_split: number
+  // Solo clasificacion/regresion: algoritmo de sklearn, hilos y warm start desde otro experimento
+  algoritmo?: 'logistica' | 'sgd_logistica' | 'lineal' | 'sgd' | 'bosque_aleatorio' | 'gradient_boosting'
+  n_jobs?: number
+  n_estimadores?: number
+  profundidad_maxima?: number
+  max_iteraciones?: number
+  continuar_desde?: string
 }
 
 export interface Experimento {
@@ -38,15 +46,19 @@ export interface Experimento {
   dataset_id: string
   configuracion: ConfiguracionEntrenamiento
   metricas: any
-  estado: 'entrenando' | 'completado' | 'error'
+  estado: 'en_cola' | 'entrenando' | 'completado' | 'error' | 'cancelado'
   fecha_creacion: string
+  tipo_problema?: string
+  tiempo_total?: number | null
   metricas_por_epoca?: MetricasEpoca[]
   matriz_confusion?: number[][]
   importancia_features?: FeatureImportance[]
   curva_roc?: CurvaROC
-  distribucion_errores?: number[]
+  distribucion_errores?: number[] | HistogramaErrores
   predicciones_vs_reales?: PrediccionReal[]
-  tiempo_por_epoca?: number[]
+  // Una entrada por época entrenada; los experimentos antiguos guardan solo los segundos
+  tiempo_por_epoca?: (TiempoEpoca | number)[]
+  barrido_id?: string | null
 }
 
 export interface MetricasEpoca {
@@ -58,6 +70,11 @@ export interface MetricasEpoca {
   tiempo?: number
 }
 
+export interface TiempoEpoca {
+  epoca: number
+  tiempo: number
+}
+
 export interface FeatureImportance {
   feature: string
   importancia: number
@@ -69,6 +86,11 @@ export interface CurvaROC {
   auc: number
 }
 
+export interface HistogramaErrores {
+  bordes: number[]
+  frecuencias: number[]
+}
+
 export interface PrediccionReal {
   real: number
   prediccion: number
@@ -95,6 +117,14 @@ export interface EstadisticasLimpieza {
   columnas_eliminadas: string[]
   nulos_eliminados: number
   duplicados_eliminados: number
+  operaciones?: ResumenOperacionLimpieza[]
+}
+
+export interface ResumenOperacionLimpieza {
+  op: 'strip' | 'convertir_tipo' | 'imputar' | 'recortar_atipicos' | 'eliminar_nulos' | 'eliminar_duplicados'
+  columnas: string[] | null
+  filas_eliminadas: number
+  celdas_modificadas: number
 }
 
 export interface EstadisticasDatos {
@@ -103,6 +133,18 @@ export interface EstadisticasDatos {
   total_nulos: number
   total_duplicados: number
   porcentaje_nulos: number
+  // Perfil aproximado (datasets grandes): valores únicos y duplicados son estimaciones
+  modo?: 'exacto' | 'aproximado'
+  error_relativo_valores_unicos?: number
+  cota_error_duplicados?: number
+}
+
+// GET /datasets/:id/correlacion?formato=pares
+export interface ParCorrelacion {
+  columna_a: string
+  columna_b: string
+  correlacion: number
+  filas: number
 }
 
 export interface ResultadoLimpieza {